@@ -1,63 +1,213 @@
-from flask import Blueprint, request, jsonify, send_file
-from flask_jwt_extended import get_jwt_identity
+from flask import Blueprint, request, jsonify, Response, stream_with_context, current_app
 from datetime import datetime, timedelta
-from io import BytesIO, StringIO
+from io import StringIO
 import csv
-import pandas as pd
-from models import db, User, DesignRequest, Portfolio, Service, ContactMessage, AuditLog, SystemSettings
-from utils.auth import admin_required, log_user_action
+from models import db, User, DesignRequest, ContactMessage, AuditLog
+from utils.auth import admin_required, log_user_action, current_user_id
+from utils.pagination import keyset_paginate, cached_count, MAX_PER_PAGE
+from utils.cache import response_cache
+from utils.user_search import user_search
+from utils.query_counter import query_budget
+from utils.settings import settings_store
+from utils.revocation import token_revocations
+from utils.serializers import Projection, isoformat, or_default, or_empty_list
 
 admin_bp = Blueprint('admin', __name__, url_prefix='/api/admin')
 
+# Rows fetched and flushed per chunk when streaming CSV exports
+EXPORT_BATCH_SIZE = 500
+
+# Dashboard snapshot is rebuilt after writes to the tables it counts
+response_cache.watch(User, 'dashboard_stats')
+response_cache.watch(DesignRequest, 'dashboard_stats')
+response_cache.watch(ContactMessage, 'dashboard_stats')
+
+# Admin user search runs against an indexed, normalized search_text column
+user_search.register(User)
+
+# Columns the admin endpoints can return
+USER_FIELDS = Projection(User, {
+    'id': User.id,
+    'email': User.email,
+    'username': User.username,
+    'user_role': User.user_role,
+    'is_admin': User.is_admin,
+    'is_active': User.is_active,
+    'full_name': User.full_name,
+    'created_at': (User.created_at, isoformat),
+    'last_login': (User.last_login, isoformat),
+    'phone': User.phone,
+    'phone_visible': User.phone_visible,
+    'is_banned': User.is_banned,
+})
+
+DESIGN_REQUEST_FIELDS = Projection(DesignRequest, {
+    'id': DesignRequest.id,
+    'user_id': DesignRequest.user_id,
+    'name': DesignRequest.name,
+    'email': DesignRequest.email,
+    'phone': DesignRequest.phone,
+    'company': DesignRequest.company,
+    'service_type': DesignRequest.service_type,
+    'project_description': DesignRequest.project_description,
+    'budget_range': DesignRequest.budget_range,
+    'deadline': (DesignRequest.deadline, isoformat),
+    'status': DesignRequest.status,
+    'notes': DesignRequest.notes,
+    'reference_files': (DesignRequest.reference_files, or_empty_list),
+    'created_at': (DesignRequest.created_at, isoformat),
+    'updated_at': (DesignRequest.updated_at, isoformat),
+    'user': User.username,
+}, joins={'user': (User, DesignRequest.user_id == User.id)})
+
+CONTACT_MESSAGE_FIELDS = Projection(ContactMessage, {
+    'id': ContactMessage.id,
+    'name': ContactMessage.name,
+    'email': ContactMessage.email,
+    'phone': ContactMessage.phone,
+    'subject': ContactMessage.subject,
+    'message': ContactMessage.message,
+    'is_read': ContactMessage.is_read,
+    'is_replied': ContactMessage.is_replied,
+    'created_at': (ContactMessage.created_at, isoformat),
+})
+
+AUDIT_LOG_FIELDS = Projection(AuditLog, {
+    'id': AuditLog.id,
+    'user': (User.username, or_default('System')),
+    'action': AuditLog.action,
+    'resource_type': AuditLog.resource_type,
+    'resource_id': AuditLog.resource_id,
+    'details': AuditLog.details,
+    'ip_address': AuditLog.ip_address,
+    'created_at': (AuditLog.created_at, isoformat),
+}, joins={'user': (User, AuditLog.user_id == User.id)})
+
+def _paginate(query, items_key, projection, default_per_page=20):
+    """Paginate query by page number, or by cursor when ?cursor= is given.
+
+    Cursor mode seeks on (created_at, id) instead of using OFFSET. Pass
+    ?with_total=0 to skip counting; in cursor mode the total comes from a
+    short-lived cached count. Only the columns of projection named in
+    ?fields= (default: all) are selected. Raises ValueError for unknown
+    fields.
+    """
+    per_page = request.args.get('per_page', default_per_page, type=int)
+    with_total = request.args.get('with_total', 1, type=int)
+    model = projection.model
+    names = projection.parse(request.args.get('fields', ''))
+    serialize = projection.serializer(names)
+    rows = projection.apply(query, names)
+    
+    if 'cursor' in request.args:
+        per_page = max(1, min(per_page, MAX_PER_PAGE))
+        items, next_cursor = keyset_paginate(
+            rows, model.created_at, model.id, per_page, request.args.get('cursor')
+        )
+        result = {
+            items_key: [serialize(item) for item in items],
+            'per_page': per_page,
+            'next_cursor': next_cursor
+        }
+        if with_total:
+            filters = tuple(sorted(
+                (k, v) for k, v in request.args.items(multi=True)
+                if k not in ('cursor', 'page', 'per_page', 'with_total', 'fields')
+            ))
+            result['total'] = cached_count(query, (request.path,) + filters)
+        return result
+    
+    page = request.args.get('page', 1, type=int)
+    pagination = rows.paginate(page=page, per_page=per_page, error_out=False, count=bool(with_total))
+    
+    return {
+        items_key: [serialize(item) for item in pagination.items],
+        'total': pagination.total,
+        'page': page,
+        'per_page': per_page,
+        'total_pages': pagination.pages
+    }
+
+def _filter_users(query, ranked=False):
+    """Apply the search, role and status filters from the request args.
+    
+    With ranked=True a search orders results by relevance.
+    """
+    search = request.args.get('search', '')
+    role_filter = request.args.get('role', '')
+    status_filter = request.args.get('status', '')
+    
+    # Apply search filter
+    if search:
+        query, rank = user_search.filter(query, search, db)
+        if ranked and rank is not None:
+            query = query.order_by(rank, User.id)
+    
+    # Apply role filter
+    if role_filter:
+        query = query.filter_by(user_role=role_filter)
+    
+    # Apply status filter
+    # Rows added before is_active/is_banned existed hold NULL, which counts as the default
+    if status_filter == 'active':
+        query = query.filter(User.is_active.isnot(False), User.is_banned.isnot(True))
+    elif status_filter == 'banned':
+        query = query.filter_by(is_banned=True)
+    elif status_filter == 'inactive':
+        query = query.filter(User.is_active == False)
+    
+    return query
+
 @admin_bp.route('/dashboard/stats', methods=['GET'])
 @admin_required
+@query_budget(3)
+@response_cache.cached('dashboard_stats', ttl=lambda: current_app.config['DASHBOARD_STATS_TTL'], private=True)
 def get_dashboard_stats():
-    """Get dashboard statistics."""
+    """Get dashboard statistics.
+    
+    Served from a snapshot refreshed at most every DASHBOARD_STATS_TTL
+    seconds or after a write to the counted tables; the Age header and
+    generated_at report how old it is.
+    """
     try:
-        # User statistics
-        total_users = User.query.count()
-        new_users_this_month = User.query.filter(
-            User.created_at >= datetime.utcnow() - timedelta(days=30)
-        ).count()
-        
-        users_by_role = db.session.query(
-            User.user_role, 
-            db.func.count(User.id)
-        ).group_by(User.user_role).all()
-        
-        # Design request statistics
-        total_requests = DesignRequest.query.count()
-        new_requests = DesignRequest.query.filter_by(status='new').count()
-        in_progress_requests = DesignRequest.query.filter_by(status='in_progress').count()
-        completed_requests = DesignRequest.query.filter_by(status='completed').count()
-        
-        # Revenue statistics (if applicable)
-        total_revenue = db.session.query(
-            db.func.sum(DesignRequest.final_price)
-        ).filter(DesignRequest.is_paid == True).scalar() or 0
+        # User statistics: one grouped pass yields totals, new users and roles
+        new_since = datetime.utcnow() - timedelta(days=30)
+        role = db.func.coalesce(User.user_role, 'other')
+        user_rows = db.session.query(
+            role,
+            db.func.count(User.id),
+            db.func.sum(db.case((User.created_at >= new_since, 1), else_=0))
+        ).group_by(role).all()
+        
+        # Design request statistics in one GROUP BY status
+        request_rows = db.session.query(
+            DesignRequest.status,
+            db.func.count(DesignRequest.id)
+        ).group_by(DesignRequest.status).all()
+        requests_by_status = {status: count for status, count in request_rows}
         
         # Contact messages
-        unread_messages = ContactMessage.query.filter_by(is_read=False).count()
+        unread_messages = db.session.query(db.func.count(ContactMessage.id)).filter(
+            ContactMessage.is_read == False
+        ).scalar()
         
         stats = {
             'users': {
-                'total': total_users,
-                'new_this_month': new_users_this_month,
-                'by_role': dict(users_by_role)
+                'total': sum(count for _, count, _ in user_rows),
+                'new_this_month': sum(new or 0 for _, _, new in user_rows),
+                'by_role': {role: count for role, count, _ in user_rows}
             },
             'design_requests': {
-                'total': total_requests,
-                'new': new_requests,
-                'in_progress': in_progress_requests,
-                'completed': completed_requests
-            },
-            'revenue': {
-                'total': float(total_revenue),
-                'currency': 'USD'
+                'total': sum(requests_by_status.values()),
+                'pending': requests_by_status.get('pending', 0),
+                'in_progress': requests_by_status.get('in_progress', 0),
+                'completed': requests_by_status.get('completed', 0),
+                'cancelled': requests_by_status.get('cancelled', 0)
             },
             'messages': {
                 'unread': unread_messages
-            }
+            },
+            'generated_at': datetime.utcnow().isoformat()
         }
         
         return jsonify(stats), 200
@@ -67,81 +217,52 @@ def get_dashboard_stats():
 
 @admin_bp.route('/users', methods=['GET'])
 @admin_required
+@query_budget(2)
 def get_users():
     """Get all users with filtering and pagination."""
     try:
-        # Get query parameters
-        page = request.args.get('page', 1, type=int)
-        per_page = request.args.get('per_page', 20, type=int)
-        search = request.args.get('search', '')
-        role_filter = request.args.get('role', '')
-        status_filter = request.args.get('status', '')
-        
         # Build query
-        query = User.query
-        
-        # Apply search filter
-        if search:
-            query = query.filter(
-                db.or_(
-                    User.email.contains(search),
-                    User.username.contains(search),
-                    User.full_name.contains(search)
-                )
-            )
-        
-        # Apply role filter
-        if role_filter:
-            query = query.filter_by(user_role=role_filter)
-        
-        # Apply status filter
-        if status_filter == 'active':
-            query = query.filter_by(is_active=True, is_banned=False)
-        elif status_filter == 'banned':
-            query = query.filter_by(is_banned=True)
-        elif status_filter == 'inactive':
-            query = query.filter_by(is_active=False)
+        # Cursor pages are ordered by (created_at, id), so only rank page mode
+        query = _filter_users(User.query, ranked='cursor' not in request.args)
         
         # Paginate results
-        pagination = query.paginate(page=page, per_page=per_page, error_out=False)
-        
-        users = [user.to_dict(is_admin_view=True) for user in pagination.items]
+        result = _paginate(query, 'users', USER_FIELDS)
         
-        return jsonify({
-            'users': users,
-            'total': pagination.total,
-            'page': page,
-            'per_page': per_page,
-            'total_pages': pagination.pages
-        }), 200
+        return jsonify(result), 200
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @admin_bp.route('/users/<int:user_id>', methods=['GET'])
 @admin_required
+@query_budget(3)
 def get_user_details(user_id):
     """Get detailed user information including phone number."""
     try:
-        user = User.query.get_or_404(user_id)
+        users = USER_FIELDS.fetch(User.query.filter_by(id=user_id))
+        if not users:
+            return jsonify({'error': 'User not found'}), 404
+        user_data = users[0]
         
         # Get user's design requests
-        requests = DesignRequest.query.filter_by(user_id=user_id).all()
-        
-        # Get user's messages
-        messages = ContactMessage.query.filter_by(user_id=user_id).all()
+        user_data['design_requests'] = DESIGN_REQUEST_FIELDS.fetch(
+            DesignRequest.query.filter_by(user_id=user_id).order_by(DesignRequest.created_at.desc())
+        )
         
-        user_data = user.to_dict(is_admin_view=True)
-        user_data['design_requests'] = [req.to_dict() for req in requests]
-        user_data['contact_messages'] = [msg.to_dict(include_private=True) for msg in messages]
+        # Contact messages are not linked to accounts; match them by email
+        user_data['contact_messages'] = CONTACT_MESSAGE_FIELDS.fetch(
+            ContactMessage.query.filter_by(email=user_data['email']).order_by(ContactMessage.created_at.desc())
+        )
         
         # Log the action
         log_user_action(
-            get_jwt_identity(),
+            current_user_id(),
             'view_user_details',
             'user',
             user_id,
-            {'viewed_user': user.username},
+            {'viewed_user': user_data['username']},
             request
         )
         
@@ -165,14 +286,27 @@ def update_user(user_id):
             user.is_banned = data['is_banned']
         if 'phone_visible' in data:
             user.phone_visible = data['phone_visible']
+        role_changed = 'user_role' in data and data['user_role'] != user.user_role
         if 'user_role' in data:
             user.user_role = data['user_role']
         
+        # Tokens issued before a role change carry stale claims
+        if role_changed:
+            token_revocations.revoke_user_tokens(user)
+        
         db.session.commit()
         
+        # Cut off this user's tokens in this worker now; other workers pick
+        # up bans and cut-offs on their next revocation refresh
+        if 'is_banned' in data:
+            if user.is_banned:
+                token_revocations.ban(user.id)
+            else:
+                token_revocations.unban(user.id)
+        
         # Log the action
         log_user_action(
-            get_jwt_identity(),
+            current_user_id(),
             'update_user',
             'user',
             user_id,
@@ -182,7 +316,7 @@ def update_user(user_id):
         
         return jsonify({
             'message': 'User updated successfully',
-            'user': user.to_dict(is_admin_view=True)
+            'user': USER_FIELDS.fetch(User.query.filter_by(id=user_id))[0]
         }), 200
         
     except Exception as e:
@@ -192,71 +326,71 @@ def update_user(user_id):
 @admin_bp.route('/users/export', methods=['GET'])
 @admin_required
 def export_users():
-    """Export users to CSV."""
+    """Stream users to CSV, honouring the same filters as get_users."""
     try:
-        # Get all users
-        users = User.query.all()
-        
-        # Create CSV
-        output = StringIO()
-        writer = csv.writer(output)
+        query = _filter_users(User.query).order_by(User.id)
         
-        # Write header
-        writer.writerow([
+        header = [
             'ID', 'Username', 'Email', 'Full Name', 'Role', 'Phone',
-            'Languages', 'Profile Completed', 'Created At', 'Last Login'
-        ])
-        
-        # Write user data
-        for user in users:
-            writer.writerow([
-                user.id,
-                user.username,
-                user.email,
-                user.full_name or '',
-                user.user_role,
-                user.phone or '',  # Phone included for admin
-                ', '.join(user.languages or []),
-                'Yes' if user.profile_completed else 'No',
-                user.created_at.strftime('%Y-%m-%d') if user.created_at else '',
-                user.last_login.strftime('%Y-%m-%d') if user.last_login else ''
-            ])
-        
-        # Create response
-        output.seek(0)
-        response = send_file(
-            BytesIO(output.getvalue().encode()),
-            mimetype='text/csv',
-            as_attachment=True,
-            download_name=f'users_export_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv'
-        )
+            'Status', 'Created At', 'Last Login'
+        ]
         
-        # Log the action
+        def generate():
+            buffer = StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(header)
+            
+            # Rows are fetched EXPORT_BATCH_SIZE at a time and flushed to the
+            # client in chunks of the same size, so memory stays flat
+            for count, user in enumerate(query.yield_per(EXPORT_BATCH_SIZE), 1):
+                writer.writerow([
+                    user.id,
+                    user.username,
+                    user.email,
+                    user.full_name or '',
+                    user.user_role or '',
+                    user.phone or '',  # Phone included for admin
+                    'Banned' if user.is_banned else 'Inactive' if user.is_active == False else 'Active',
+                    user.created_at.strftime('%Y-%m-%d') if user.created_at else '',
+                    user.last_login.strftime('%Y-%m-%d') if user.last_login else ''
+                ])
+                if count % EXPORT_BATCH_SIZE == 0:
+                    yield buffer.getvalue()
+                    buffer.seek(0)
+                    buffer.truncate()
+            
+            yield buffer.getvalue()
+        
+        # Log the action before streaming; the row count is not known up front
         log_user_action(
-            get_jwt_identity(),
+            current_user_id(),
             'export_users',
             'user',
             None,
-            {'count': len(users)},
+            {'filters': {k: request.args[k] for k in ('search', 'role', 'status') if request.args.get(k)}},
             request
         )
         
-        return response
+        filename = f'users_export_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv'
+        return Response(
+            stream_with_context(generate()),
+            mimetype='text/csv',
+            headers={'Content-Disposition': f'attachment; filename={filename}'}
+        )
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @admin_bp.route('/design-requests', methods=['GET'])
 @admin_required
+@query_budget(2)
 def get_design_requests():
     """Get all design requests with filtering."""
     try:
         # Get query parameters
-        page = request.args.get('page', 1, type=int)
-        per_page = request.args.get('per_page', 20, type=int)
         status_filter = request.args.get('status', '')
         
-        # Build query
+        # Build query; the requester's username is joined in by the projection
         query = DesignRequest.query
         
         # Apply status filter
@@ -267,18 +401,12 @@ def get_design_requests():
         query = query.order_by(DesignRequest.created_at.desc())
         
         # Paginate results
-        pagination = query.paginate(page=page, per_page=per_page, error_out=False)
-        
-        requests = [req.to_dict(include_private=True) for req in pagination.items]
+        result = _paginate(query, 'requests', DESIGN_REQUEST_FIELDS)
         
-        return jsonify({
-            'requests': requests,
-            'total': pagination.total,
-            'page': page,
-            'per_page': per_page,
-            'total_pages': pagination.pages
-        }), 200
+        return jsonify(result), 200
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -293,31 +421,14 @@ def update_design_request(request_id):
         # Update fields
         if 'status' in data:
             design_request.status = data['status']
-            
-            # Update timestamps based on status
-            if data['status'] == 'in_progress':
-                design_request.started_at = datetime.utcnow()
-            elif data['status'] == 'completed':
-                design_request.completed_at = datetime.utcnow()
-            elif data['status'] == 'delivered':
-                design_request.delivered_at = datetime.utcnow()
-        
-        if 'assigned_to' in data:
-            design_request.assigned_to = data['assigned_to']
-        if 'priority' in data:
-            design_request.priority = data['priority']
-        if 'admin_notes' in data:
-            design_request.admin_notes = data['admin_notes']
-        if 'estimated_price' in data:
-            design_request.estimated_price = data['estimated_price']
-        if 'final_price' in data:
-            design_request.final_price = data['final_price']
+        if 'notes' in data:
+            design_request.notes = data['notes']
         
         db.session.commit()
         
         # Log the action
         log_user_action(
-            get_jwt_identity(),
+            current_user_id(),
             'update_design_request',
             'design_request',
             request_id,
@@ -327,7 +438,7 @@ def update_design_request(request_id):
         
         return jsonify({
             'message': 'Design request updated successfully',
-            'request': design_request.to_dict(include_private=True)
+            'request': DESIGN_REQUEST_FIELDS.fetch(DesignRequest.query.filter_by(id=request_id))[0]
         }), 200
         
     except Exception as e:
@@ -339,34 +450,8 @@ def update_design_request(request_id):
 def get_settings():
     """Get system settings."""
     try:
-        settings = SystemSettings.query.all()
-        
-        settings_dict = {
-            setting.key: {
-                'value': setting.value,
-                'description': setting.description
-            }
-            for setting in settings
-        }
-        
-        # Add default settings if not present
-        default_settings = {
-            'particles_enabled': True,
-            'particles_max': 150,
-            'particles_per_second': 20,
-            'particles_decay_time': 5,
-            'registration_enabled': True,
-            'google_auth_enabled': True,
-            'email_notifications': True,
-            'contact_email': 'nawicompany@gmail.com',
-            'reply_within_hours': 48
-        }
-        
-        for key, value in default_settings.items():
-            if key not in settings_dict:
-                settings_dict[key] = {'value': value, 'description': ''}
-        
-        return jsonify(settings_dict), 200
+        # Served from the settings cache, already merged with the defaults
+        return jsonify(settings_store.all()), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -378,12 +463,12 @@ def update_settings():
     try:
         data = request.get_json()
         
-        for key, value in data.items():
-            SystemSettings.set_setting(key, value)
+        # One transaction for every key; other workers reload on the new version
+        settings_store.update(data)
         
         # Log the action
         log_user_action(
-            get_jwt_identity(),
+            current_user_id(),
             'update_settings',
             'settings',
             None,
@@ -396,22 +481,23 @@ def update_settings():
             'settings': data
         }), 200
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
 @admin_bp.route('/audit-logs', methods=['GET'])
 @admin_required
+@query_budget(2)
 def get_audit_logs():
     """Get audit logs."""
     try:
         # Get query parameters
-        page = request.args.get('page', 1, type=int)
-        per_page = request.args.get('per_page', 50, type=int)
         user_id = request.args.get('user_id', type=int)
         action = request.args.get('action')
         
-        # Build query
+        # Build query; the acting user's username is joined in by the projection
         query = AuditLog.query
         
         if user_id:
@@ -423,17 +509,11 @@ def get_audit_logs():
         query = query.order_by(AuditLog.created_at.desc())
         
         # Paginate results
-        pagination = query.paginate(page=page, per_page=per_page, error_out=False)
-        
-        logs = [log.to_dict() for log in pagination.items]
+        result = _paginate(query, 'logs', AUDIT_LOG_FIELDS, default_per_page=50)
         
-        return jsonify({
-            'logs': logs,
-            'total': pagination.total,
-            'page': page,
-            'per_page': per_page,
-            'total_pages': pagination.pages
-        }), 200
+        return jsonify(result), 200
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
\ No newline at end of file
@@ -1,24 +1,77 @@
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, request, jsonify
 from flask_cors import CORS
-from flask_jwt_extended import JWTManager, jwt_required, get_jwt_identity, get_jwt
+from flask_jwt_extended import JWTManager, jwt_required, get_jwt, verify_jwt_in_request
 from datetime import datetime
 import os
+from werkzeug.middleware.proxy_fix import ProxyFix
 from werkzeug.utils import secure_filename
 
 from config import Config
-from models import db, User, Service, Portfolio, DesignRequest, Design, ContactMessage
-from utils.auth import hash_password, verify_password, generate_tokens, admin_required, user_required
+from models import db, User, Service, Portfolio, Tag, DesignRequest, Design, ContactMessage, StoredFile
+from utils.auth import hash_password, generate_tokens, admin_required, user_required, current_user_id
 from utils.email import mail, send_contact_form_email, send_design_request_confirmation
+from utils.cache import response_cache
+from utils.migrations import ensure_columns, ensure_indexes, migrate_portfolio_tags
+from utils.audit import audit_writer
+from utils.outbox import outbox_worker
+from utils.email_templates import email_templates
+from utils.images import PROCESSABLE_EXTENSIONS, variant_names, submit_image_processing, strip_metadata
+from utils.storage import stream_to_storage, register_stored_file, track_file_references, stored_url_digest
+from utils.chunked_upload import ChunkedUpload, UploadLimitExceeded, expire_uploads
+from utils.static import static_files
+from utils.compression import response_compressor
+from utils.search import catalog_index
+from utils.tags import get_or_create_tags, filter_by_tags, tag_counts
+from utils.serializers import ORJSONProvider
+from utils.settings import settings_store
+from utils.passwords import password_hasher, HasherBusy
+from utils.ratelimit import rate_limiter, account_from_body
+from utils.revocation import token_revocations
+from utils.google_certs import google_certs
+from utils.query_counter import query_budget
+from api.admin import admin_bp
+from utils.user_search import user_search
 
-app = Flask(__name__, static_folder='build', static_url_path='')
+# The SPA build and uploads are served by static_files rather than Flask's static route
+app = Flask(__name__, static_folder=None)
 app.config.from_object(Config)
+# jsonify encodes with orjson when it is installed
+app.json = ORJSONProvider(app)
+# Behind the reverse proxy remote_addr is the proxy's; rate limits and audit
+# logs need the client address it forwards
+app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['PROXY_FIX_X_FOR'], x_proto=app.config['PROXY_FIX_X_PROTO'])
 
 # Initialize extensions
 db.init_app(app)
 mail.init_app(app)
+outbox_worker.init_app(app)
+email_templates.init_app(app)
+response_cache.init_app(app)
+audit_writer.init_app(app)
+static_files.init_app(app)
+response_compressor.init_app(app)
+catalog_index.init_app(app)
+settings_store.init_app(app)
+password_hasher.init_app(app)
+rate_limiter.init_app(app)
 jwt = JWTManager(app)
+token_revocations.init_app(app)
+google_certs.init_app(app)
 CORS(app)
 
+# Public catalog responses are invalidated on writes
+response_cache.watch(Service, 'services')
+response_cache.watch(Portfolio, 'portfolio')
+response_cache.watch(Tag, 'portfolio')
+
+# Stored uploads are reference counted through the URLs that point at them
+track_file_references(Portfolio, 'image_url', 'thumbnail_url', 'images')
+track_file_references(Design, 'file_url', 'preview_url')
+track_file_references(DesignRequest, 'reference_files')
+
+# User management, dashboard, settings and audit log endpoints under /api/admin
+app.register_blueprint(admin_bp)
+
 # Create upload directory
 os.makedirs(os.path.join(app.root_path, app.config['UPLOAD_FOLDER']), exist_ok=True)
 
@@ -26,6 +79,11 @@ os.makedirs(os.path.join(app.root_path, app.config['UPLOAD_FOLDER']), exist_ok=T
 def init_db():
     with app.app_context():
         db.create_all()
+        ensure_columns(db)
+        ensure_indexes(db)
+        migrate_portfolio_tags(db)
+        # Backfills user.search_text and builds the admin search index
+        user_search.ensure_index(db)
         
         # Create admin user if not exists
         admin = User.query.filter_by(email=app.config['ADMIN_EMAIL']).first()
@@ -113,19 +171,60 @@ def init_db():
             ]
             
             for item_data in portfolio_items:
+                tags = get_or_create_tags(item_data.pop('tags'))
                 portfolio = Portfolio(**item_data)
+                portfolio.tags = tags
                 db.session.add(portfolio)
         
         db.session.commit()
+        
+        # Built now rather than by the first search
+        catalog_index.build()
 
 # API Routes
 
 @app.route('/api/health')
 def health_check():
-    return jsonify({'status': 'healthy', 'timestamp': datetime.utcnow().isoformat()})
+    return jsonify({
+        'status': 'healthy',
+        'timestamp': datetime.utcnow().isoformat(),
+        'cache': response_cache.stats(),
+        'audit': audit_writer.metrics(),
+        'outbox': outbox_worker.metrics(),
+        'search': catalog_index.stats(),
+        'settings': settings_store.stats(),
+        'passwords': password_hasher.metrics(),
+        'ratelimit': rate_limiter.stats(),
+        'revocations': token_revocations.stats(),
+        'google_certs': google_certs.stats()
+    })
+
+# Settings the frontend reads on load, e.g. particle animation limits
+@app.route('/api/settings/public')
+def get_public_settings():
+    response = jsonify(settings_store.public())
+    response.set_etag(settings_store.etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = app.config['SETTINGS_PUBLIC_MAX_AGE']
+    return response.make_conditional(request)
+
+# Search Routes
+@app.route('/api/search')
+def search():
+    verify_jwt_in_request(optional=True)
+    kinds = [k for k in request.args.get('type', '').split(',') if k]
+    
+    return jsonify(catalog_index.search(
+        request.args.get('q', ''),
+        kinds=kinds,
+        tags=request.args.getlist('tag'),
+        include_private=bool(get_jwt().get('is_admin')),
+        limit=max(1, min(request.args.get('limit', app.config['SEARCH_MAX_RESULTS'], type=int), 100))
+    ))
 
 # Authentication Routes
 @app.route('/api/auth/register', methods=['POST'])
+@rate_limiter.limit(app.config['RATELIMIT_REGISTER'])
 def register():
     try:
         data = request.get_json()
@@ -162,10 +261,15 @@ def register():
             **tokens
         }), 201
         
+    except HasherBusy:
+        db.session.rollback()
+        return jsonify({'message': 'Server busy, please retry'}), 503, {'Retry-After': '1'}
     except Exception as e:
         return jsonify({'message': str(e)}), 500
 
 @app.route('/api/auth/login', methods=['POST'])
+@rate_limiter.limit(app.config['RATELIMIT_LOGIN_IP'])
+@rate_limiter.limit(app.config['RATELIMIT_LOGIN_ACCOUNT'], key=account_from_body('email'))
 def login():
     try:
         data = request.get_json()
@@ -176,9 +280,22 @@ def login():
         # Find user by email
         user = User.query.filter_by(email=data['email']).first()
         
-        if not user or not verify_password(user.password_hash, data['password']):
+        if not user or not user.password_hash:
+            return jsonify({'message': 'Invalid email or password'}), 401
+        
+        valid, new_hash = password_hasher.verify_and_upgrade(user.password_hash, data['password'])
+        if not valid:
             return jsonify({'message': 'Invalid email or password'}), 401
         
+        if user.is_banned:
+            return jsonify({'message': 'This account has been suspended'}), 403
+        
+        # Upgrade hashes made with older PASSWORD_HASH_METHOD parameters
+        if new_hash:
+            user.password_hash = new_hash
+        user.last_login = datetime.utcnow()
+        db.session.commit()
+        
         # Generate tokens
         tokens = generate_tokens(user)
         
@@ -187,25 +304,33 @@ def login():
             **tokens
         }), 200
         
+    except HasherBusy:
+        return jsonify({'message': 'Server busy, please retry'}), 503, {'Retry-After': '1'}
     except Exception as e:
         return jsonify({'message': str(e)}), 500
 
 @app.route('/api/auth/refresh', methods=['POST'])
 @jwt_required(refresh=True)
 def refresh():
-    current_user = get_jwt_identity()
-    user = User.query.get(current_user)
-    if not user:
-        return jsonify({'message': 'User not found'}), 404
+    # Claims are rebuilt from the user row, so a demoted admin's refresh
+    # token only ever yields tokens with the current role
+    user = db.session.get(User, current_user_id())
+    if not user or user.is_banned:
+        return jsonify({'message': 'Account not available'}), 401
     
     tokens = generate_tokens(user)
     return jsonify(tokens), 200
 
 # Services Routes
 @app.route('/api/services')
+@query_budget(1)
+@response_cache.cached('services')
 def get_services():
     services = Service.query.filter_by(is_active=True).order_by(Service.order_num).all()
-    return jsonify([{
+    return jsonify([serialize_service(s) for s in services])
+
+def serialize_service(s):
+    return {
         'id': s.id,
         'title': s.title,
         'title_ar': s.title_ar,
@@ -213,7 +338,7 @@ def get_services():
         'description_ar': s.description_ar,
         'icon': s.icon,
         'price_range': s.price_range
-    } for s in services])
+    }
 
 @app.route('/api/services', methods=['POST'])
 @admin_required
@@ -226,6 +351,8 @@ def create_service():
 
 # Portfolio Routes
 @app.route('/api/portfolio')
+@query_budget(2)
+@response_cache.cached('portfolio')
 def get_portfolio():
     category = request.args.get('category')
     query = Portfolio.query.filter_by(is_active=True)
@@ -233,9 +360,17 @@ def get_portfolio():
     if category:
         query = query.filter_by(category=category)
     
+    # ?tag=a&tag=b (or ?tag=a,b) matches items with every tag; ?match=any relaxes to either
+    tags = [name for value in request.args.getlist('tag') for name in value.split(',')]
+    if tags:
+        query = filter_by_tags(query, tags, match_all=request.args.get('match', 'all') != 'any')
+    
     portfolio = query.order_by(Portfolio.order_num, Portfolio.created_at.desc()).all()
     
-    return jsonify([{
+    return jsonify([serialize_portfolio(p) for p in portfolio])
+
+def serialize_portfolio(p):
+    return {
         'id': p.id,
         'title': p.title,
         'title_ar': p.title_ar,
@@ -244,22 +379,35 @@ def get_portfolio():
         'category': p.category,
         'image_url': p.image_url,
         'thumbnail_url': p.thumbnail_url or p.image_url,
+        'images': p.images or [],
         'client_name': p.client_name,
-        'tags': p.tags.split(',') if p.tags else [],
+        'tags': portfolio_tag_names(p),
         'is_featured': p.is_featured
-    } for p in portfolio])
+    }
+
+def portfolio_tag_names(p):
+    return [tag.name for tag in p.tags]
+
+@app.route('/api/portfolio/tags')
+@response_cache.cached('portfolio')
+def get_portfolio_tags():
+    return jsonify(tag_counts())
 
 @app.route('/api/portfolio', methods=['POST'])
 @admin_required
 def create_portfolio():
     data = request.get_json()
+    tags = get_or_create_tags(data.pop('tags', None))
     portfolio = Portfolio(**data)
+    portfolio.tags = tags
     db.session.add(portfolio)
     db.session.commit()
     return jsonify({'message': 'Portfolio item created', 'id': portfolio.id}), 201
 
 # Contact Routes
 @app.route('/api/contact', methods=['POST'])
+@rate_limiter.limit(app.config['RATELIMIT_CONTACT'])
+@rate_limiter.limit(app.config['RATELIMIT_CONTACT'], key=account_from_body('email'))
 def contact():
     try:
         data = request.get_json()
@@ -277,16 +425,19 @@ def contact():
             message=data['message']
         )
         db.session.add(contact_msg)
-        db.session.commit()
+        db.session.flush()
         
-        # Send email
+        # Queue email in the same transaction; delivered by the outbox worker
         send_contact_form_email(
             name=data['name'],
             email=data['email'],
             phone=data.get('phone'),
             subject=data.get('subject'),
-            message=data['message']
+            message=data['message'],
+            dedup_key=f'contact-message:{contact_msg.id}'
         )
+        db.session.commit()
+        outbox_worker.notify()
         
         return jsonify({
             'message': 'Thank you for your message. We will get back to you soon!',
@@ -299,8 +450,12 @@ def contact():
 
 # Design Request Routes
 @app.route('/api/requests', methods=['POST'])
+@rate_limiter.limit(app.config['RATELIMIT_DESIGN_REQUEST'])
+@rate_limiter.limit(app.config['RATELIMIT_DESIGN_REQUEST'], key=account_from_body('email'))
 def create_design_request():
     try:
+        # Signed-in users get the request linked to their account
+        verify_jwt_in_request(optional=True)
         data = request.get_json()
         
         # Validate required fields
@@ -309,6 +464,13 @@ def create_design_request():
             if field not in data:
                 return jsonify({'message': f'{field} is required'}), 400
         
+        # Reference files must be URLs returned by the upload endpoints
+        reference_files = data.get('reference_files') or []
+        # under this app's upload folder, for content that is actually stored
+        digests = {stored_upload_digest(url) for url in reference_files} if isinstance(reference_files, list) else {None}
+        if None in digests or (digests and StoredFile.query.filter(StoredFile.sha256.in_(digests)).count() != len(digests)):
+            return jsonify({'message': 'reference_files must be uploaded file URLs'}), 400
+        
         # Create request
         design_request = DesignRequest(
             name=data['name'],
@@ -319,18 +481,23 @@ def create_design_request():
             project_description=data['project_description'],
             budget_range=data.get('budget_range'),
             deadline=datetime.fromisoformat(data['deadline']) if data.get('deadline') else None,
-            user_id=get_jwt_identity() if request.headers.get('Authorization') else None
+            user_id=current_user_id(),
+            reference_files=reference_files
         )
         
         db.session.add(design_request)
-        db.session.commit()
+        db.session.flush()
         
-        # Send confirmation email
+        # Queue confirmation email in the same transaction
         send_design_request_confirmation(
             name=data['name'],
             email=data['email'],
-            service_type=data['service_type']
+            service_type=data['service_type'],
+            dedup_key=f'design-request:{design_request.id}',
+            language=data.get('language') or request.accept_languages.best_match(email_templates.languages)
         )
+        db.session.commit()
+        outbox_worker.notify()
         
         return jsonify({
             'message': 'Your design request has been submitted successfully!',
@@ -343,8 +510,9 @@ def create_design_request():
 
 @app.route('/api/requests')
 @user_required
+@query_budget(1)
 def get_my_requests():
-    user_id = get_jwt_identity()
+    user_id = current_user_id()
     requests = DesignRequest.query.filter_by(user_id=user_id).order_by(DesignRequest.created_at.desc()).all()
     
     return jsonify([{
@@ -352,6 +520,7 @@ def get_my_requests():
         'service_type': r.service_type,
         'project_description': r.project_description,
         'status': r.status,
+        'reference_files': r.reference_files or [],
         'created_at': r.created_at.isoformat(),
         'deadline': r.deadline.isoformat() if r.deadline else None
     } for r in requests])
@@ -359,6 +528,7 @@ def get_my_requests():
 # Admin Routes
 @app.route('/api/admin/requests')
 @admin_required
+@query_budget(1)
 def get_all_requests():
     requests = DesignRequest.query.order_by(DesignRequest.created_at.desc()).all()
     
@@ -374,6 +544,7 @@ def get_all_requests():
         'deadline': r.deadline.isoformat() if r.deadline else None,
         'status': r.status,
         'notes': r.notes,
+        'reference_files': r.reference_files or [],
         'created_at': r.created_at.isoformat()
     } for r in requests])
 
@@ -395,6 +566,7 @@ def update_request_status(request_id):
 
 @app.route('/api/admin/messages')
 @admin_required
+@query_budget(1)
 def get_contact_messages():
     messages = ContactMessage.query.order_by(ContactMessage.created_at.desc()).all()
     
@@ -430,32 +602,204 @@ def upload_file():
         return jsonify({'message': 'No file selected'}), 400
     
     if file and allowed_file(file.filename):
-        filename = secure_filename(file.filename)
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = f"{timestamp}_{filename}"
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        file.save(os.path.join(app.root_path, filepath))
+        extension = secure_filename(file.filename).rsplit('.', 1)[1].lower()
+        upload_root = os.path.join(app.root_path, app.config['UPLOAD_FOLDER'])
         
-        return jsonify({
+        # Streamed to disk and stored by content hash; re-uploads reuse the existing file.
+        # Images lose their EXIF/GPS metadata before they are hashed and stored
+        sanitize = image_sanitizer() if extension in PROCESSABLE_EXTENSIONS else None
+        try:
+            path, digest, size, created = stream_to_storage(file.stream, upload_root, extension, sanitize)
+        except ValueError as e:
+            return jsonify({'message': str(e)}), 400
+        register_stored_file(path, digest, size)
+        
+        result = {
             'message': 'File uploaded successfully',
-            'filename': filename,
-            'url': f'/static/uploads/{filename}'
-        }), 200
+            'filename': path,
+            'url': upload_url(path),
+            'duplicate': not created
+        }
+        
+        # Thumbnails and responsive variants are encoded in the process pool
+        if extension in PROCESSABLE_EXTENSIONS:
+            directory = os.path.dirname(path)
+            portfolio_id = request.form.get('portfolio_id', type=int)
+            if created or portfolio_id:
+                submit_image_processing(
+                    app,
+                    os.path.join(upload_root, path),
+                    digest,
+                    on_done=(lambda names: attach_image_variants(portfolio_id, directory, names)) if portfolio_id else None
+                )
+            names = variant_names(digest, app.config['IMAGE_WIDTHS'])
+            result['processing'] = created
+            result['thumbnail_url'] = upload_url(f"{directory}/{names['thumbnail']}")
+        
+        return jsonify(result), 200
     
     return jsonify({'message': 'Invalid file type'}), 400
 
+# Chunked Upload Routes
+def chunked_upload_root():
+    return os.path.join(app.instance_path, 'chunked_uploads')
+
+@app.route('/api/uploads', methods=['POST'])
+@user_required
+def start_chunked_upload():
+    data = request.get_json() or {}
+    filename = secure_filename(data.get('filename') or '')
+    size = data.get('size')
+    
+    if '.' not in filename or filename.rsplit('.', 1)[1].lower() not in app.config['REFERENCE_FILE_EXTENSIONS']:
+        return jsonify({'message': 'Invalid file type'}), 400
+    if not isinstance(size, int) or not 0 < size <= app.config['UPLOAD_MAX_SIZE']:
+        return jsonify({'message': f"size must be between 1 and {app.config['UPLOAD_MAX_SIZE']} bytes"}), 400
+    
+    # Abandoned sessions are swept whenever a new one starts
+    expire_uploads(chunked_upload_root(), app.config['UPLOAD_SESSION_TTL'])
+    
+    try:
+        upload = ChunkedUpload.create(
+            chunked_upload_root(),
+            current_user_id(),
+            filename,
+            size,
+            app.config['UPLOAD_CHUNK_SIZE'],
+            sha256=data.get('sha256'),
+            max_sessions=app.config['UPLOAD_MAX_SESSIONS'],
+            max_bytes=app.config['UPLOAD_MAX_RESERVED']
+        )
+    except UploadLimitExceeded as e:
+        return jsonify({'message': str(e)}), 429
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    
+    return jsonify(upload.status()), 201
+
+@app.route('/api/uploads/<upload_id>', methods=['GET'])
+@user_required
+def get_chunked_upload(upload_id):
+    try:
+        upload = ChunkedUpload.load(chunked_upload_root(), upload_id, current_user_id())
+    except LookupError as e:
+        return jsonify({'message': str(e)}), 404
+    
+    return jsonify(upload.status())
+
+@app.route('/api/uploads/<upload_id>/chunks/<int:index>', methods=['PUT'])
+@user_required
+def put_upload_chunk(upload_id, index):
+    try:
+        upload = ChunkedUpload.load(chunked_upload_root(), upload_id, current_user_id())
+        upload.write_chunk(index, request.stream, request.headers.get('X-Chunk-SHA256'))
+    except LookupError as e:
+        return jsonify({'message': str(e)}), 404
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    
+    return jsonify({'index': index, 'received': len(upload.received()), 'chunk_count': upload.chunk_count})
+
+@app.route('/api/uploads/<upload_id>/complete', methods=['POST'])
+@user_required
+def complete_chunked_upload(upload_id):
+    try:
+        upload = ChunkedUpload.load(chunked_upload_root(), upload_id, current_user_id())
+        sanitize = image_sanitizer() if upload.meta['extension'] in PROCESSABLE_EXTENSIONS else None
+        path, digest, size, created = upload.complete(os.path.join(app.root_path, app.config['UPLOAD_FOLDER']), sanitize)
+    except LookupError as e:
+        return jsonify({'message': str(e)}), 404
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    
+    register_stored_file(path, digest, size)
+    
+    return jsonify({
+        'message': 'File uploaded successfully',
+        'filename': path,
+        'url': upload_url(path),
+        'size': size,
+        'sha256': digest
+    }), 200
+
+def upload_url(filename):
+    return f"/{app.config['UPLOAD_FOLDER'].strip('/')}/{filename}"
+
+def stored_upload_digest(url):
+    """Digest of a URL into this app's upload storage, or None for any other URL."""
+    prefix = upload_url('')
+    if not isinstance(url, str) or not url.startswith(prefix):
+        return None
+    digest = stored_url_digest(url)
+    if digest is None or not url[len(prefix):].startswith(f'{digest[:2]}/{digest[2:4]}/{digest}'):
+        return None
+    return digest
+
+def attach_image_variants(portfolio_id, directory, names):
+    """Point a portfolio item at the variants generated for its image."""
+    portfolio = Portfolio.query.get(portfolio_id)
+    if not portfolio:
+        return
+    
+    images = []
+    for size in names['sizes']:
+        if size['avif']:
+            images.append({'url': upload_url(f"{directory}/{size['avif']}"), 'width': size['width'], 'type': 'image/avif'})
+        images.append({'url': upload_url(f"{directory}/{size['webp']}"), 'width': size['width'], 'type': 'image/webp'})
+    
+    portfolio.thumbnail_url = upload_url(f"{directory}/{names['thumbnail']}")
+    portfolio.images = images
+    db.session.commit()
+
+def image_sanitizer():
+    """strip_metadata bound to the image process pool size."""
+    return lambda path: strip_metadata(path, app.config['IMAGE_WORKERS'])
+
 def allowed_file(filename):
     return '.' in filename and \
            filename.rsplit('.', 1)[1].lower() in app.config['ALLOWED_EXTENSIONS']
 
+# Catalog search index; design requests are only searchable by admins
+catalog_index.register(
+    'portfolio',
+    Portfolio,
+    {'title': 3, 'title_ar': 3, 'category': 2, 'client_name': 1, 'description': 1, 'description_ar': 1},
+    serialize_portfolio,
+    tags=portfolio_tag_names,
+    visible=lambda p: p.is_active
+)
+catalog_index.register(
+    'service',
+    Service,
+    {'title': 3, 'title_ar': 3, 'description': 1, 'description_ar': 1},
+    serialize_service,
+    visible=lambda s: s.is_active
+)
+catalog_index.register(
+    'design_request',
+    DesignRequest,
+    {'name': 3, 'company': 2, 'service_type': 2, 'email': 1, 'project_description': 1},
+    lambda r: {
+        'id': r.id,
+        'name': r.name,
+        'company': r.company,
+        'service_type': r.service_type,
+        'status': r.status,
+        'created_at': r.created_at.isoformat() if r.created_at else None
+    },
+    private=True
+)
+
+# Serve uploaded files
+@app.route('/static/uploads/<path:path>')
+def serve_upload(path):
+    return static_files.send_upload(path)
+
 # Serve React App
 @app.route('/', defaults={'path': ''})
 @app.route('/<path:path>')
 def serve(path):
-    if path != "" and os.path.exists(os.path.join(app.static_folder, path)):
-        return send_from_directory(app.static_folder, path)
-    else:
-        return send_from_directory(app.static_folder, 'index.html')
+    return static_files.send_build_file(path)
 
 if __name__ == '__main__':
     init_db()
@@ -14,6 +14,17 @@ class Config:
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=24)
     JWT_REFRESH_TOKEN_EXPIRES = timedelta(days=30)
     
+    # Google OAuth Config
+    GOOGLE_CLIENT_ID = os.environ.get('GOOGLE_CLIENT_ID')
+    GOOGLE_CLIENT_SECRET = os.environ.get('GOOGLE_CLIENT_SECRET')
+    GOOGLE_CERTS_URL = os.environ.get('GOOGLE_CERTS_URL') or 'https://www.googleapis.com/oauth2/v1/certs'
+    GOOGLE_TOKEN_URL = os.environ.get('GOOGLE_TOKEN_URL') or 'https://oauth2.googleapis.com/token'
+    GOOGLE_HTTP_TIMEOUT = float(os.environ.get('GOOGLE_HTTP_TIMEOUT') or 5)  # seconds
+    GOOGLE_CERTS_DEFAULT_TTL = int(os.environ.get('GOOGLE_CERTS_DEFAULT_TTL') or 3600)  # seconds, when Google sends no max-age
+    GOOGLE_CERTS_REFRESH_AHEAD = int(os.environ.get('GOOGLE_CERTS_REFRESH_AHEAD') or 300)  # seconds before expiry to refetch in the background
+    GOOGLE_CERTS_MAX_STALE = int(os.environ.get('GOOGLE_CERTS_MAX_STALE') or 86400)  # seconds expired certs may be used while Google is unreachable
+    GOOGLE_CLOCK_SKEW = int(os.environ.get('GOOGLE_CLOCK_SKEW') or 10)  # seconds of leeway on iat/exp
+    
     # Mail Config
     MAIL_SERVER = os.environ.get('MAIL_SERVER') or 'smtp.gmail.com'
     MAIL_PORT = int(os.environ.get('MAIL_PORT') or 587)
@@ -21,12 +32,92 @@ class Config:
     MAIL_USERNAME = os.environ.get('MAIL_USERNAME')
     MAIL_PASSWORD = os.environ.get('MAIL_PASSWORD')
     MAIL_DEFAULT_SENDER = os.environ.get('MAIL_DEFAULT_SENDER') or 'nawycompany@gmail.com'
+    EMAIL_DEFAULT_LANGUAGE = os.environ.get('EMAIL_DEFAULT_LANGUAGE') or 'en'  # 'ar' or 'en'
+    ADMIN_EMAIL_LANGUAGE = os.environ.get('ADMIN_EMAIL_LANGUAGE') or 'en'
+    MAIL_MAX_RETRIES = int(os.environ.get('MAIL_MAX_RETRIES') or 3)
+    MAIL_RETRY_BACKOFF = float(os.environ.get('MAIL_RETRY_BACKOFF') or 2.0)  # seconds, doubled per retry
+    MAIL_IDLE_TIMEOUT = int(os.environ.get('MAIL_IDLE_TIMEOUT') or 30)  # seconds before closing SMTP
+    MAIL_OUTBOX_POLL_INTERVAL = int(os.environ.get('MAIL_OUTBOX_POLL_INTERVAL') or 10)  # seconds
+    MAIL_OUTBOX_BATCH_SIZE = int(os.environ.get('MAIL_OUTBOX_BATCH_SIZE') or 50)
+    MAIL_OUTBOX_MAX_ATTEMPTS = int(os.environ.get('MAIL_OUTBOX_MAX_ATTEMPTS') or 8)
+    MAIL_OUTBOX_LEASE = int(os.environ.get('MAIL_OUTBOX_LEASE') or 300)  # seconds a claimed row stays locked
     
     # Upload Config
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
     UPLOAD_FOLDER = 'static/uploads'
     ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
+    REFERENCE_FILE_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp', 'pdf', 'ai', 'psd', 'eps', 'zip'}
+    UPLOAD_CHUNK_SIZE = int(os.environ.get('UPLOAD_CHUNK_SIZE') or 4 * 1024 * 1024)  # must stay below MAX_CONTENT_LENGTH
+    UPLOAD_MAX_SIZE = int(os.environ.get('UPLOAD_MAX_SIZE') or 512 * 1024 * 1024)  # per chunked upload
+    UPLOAD_SESSION_TTL = int(os.environ.get('UPLOAD_SESSION_TTL') or 24 * 3600)  # seconds before abandoned uploads are removed
+    UPLOAD_MAX_SESSIONS = int(os.environ.get('UPLOAD_MAX_SESSIONS') or 5)  # open chunked uploads per user
+    UPLOAD_MAX_RESERVED = int(os.environ.get('UPLOAD_MAX_RESERVED') or 1024 * 1024 * 1024)  # bytes reserved by a user's open uploads
+    IMAGE_WORKERS = int(os.environ.get('IMAGE_WORKERS') or 2)  # Processes encoding variants
+    IMAGE_WIDTHS = [int(w) for w in (os.environ.get('IMAGE_WIDTHS') or '480,960,1600').split(',')]
+    IMAGE_THUMBNAIL_SIZE = int(os.environ.get('IMAGE_THUMBNAIL_SIZE') or 400)  # px, longest side
+    IMAGE_QUALITY = int(os.environ.get('IMAGE_QUALITY') or 80)
+    
+    # Static File Config
+    STATIC_BUILD_FOLDER = 'build'
+    STATIC_REFRESH_INTERVAL = float(os.environ.get('STATIC_REFRESH_INTERVAL') or 2.0)  # seconds between build folder checks
+    STATIC_MAX_AGE = int(os.environ.get('STATIC_MAX_AGE') or 3600)  # seconds, for unhashed build files and legacy uploads
+    USE_X_SENDFILE = os.environ.get('USE_X_SENDFILE', 'False').lower() == 'true'  # let the proxy send files
+    
+    # Compression Config
+    COMPRESS_ENABLED = os.environ.get('COMPRESS_ENABLED', 'True').lower() == 'true'
+    COMPRESS_MIN_SIZE = int(os.environ.get('COMPRESS_MIN_SIZE') or 1024)  # bytes; smaller JSON is sent as is
+    COMPRESS_LEVEL = int(os.environ.get('COMPRESS_LEVEL') or 6)  # gzip, 1-9
+    COMPRESS_BR_QUALITY = int(os.environ.get('COMPRESS_BR_QUALITY') or 4)  # brotli, 0-11
     
     # Admin Config
     ADMIN_EMAIL = os.environ.get('ADMIN_EMAIL') or 'nawycompany@gmail.com'
-    ADMIN_PASSWORD = os.environ.get('ADMIN_PASSWORD') or 'admin123'  # Change in production!
\ No newline at end of file
+    ADMIN_PASSWORD = os.environ.get('ADMIN_PASSWORD') or 'admin123'  # Change in production!
+    
+    # Response Cache Config
+    RESPONSE_CACHE_ENABLED = os.environ.get('RESPONSE_CACHE_ENABLED', 'True').lower() == 'true'
+    RESPONSE_CACHE_TTL = int(os.environ.get('RESPONSE_CACHE_TTL') or 300)  # seconds
+    RESPONSE_CACHE_MAX_BYTES = int(os.environ.get('RESPONSE_CACHE_MAX_BYTES') or 8 * 1024 * 1024)
+    DASHBOARD_STATS_TTL = int(os.environ.get('DASHBOARD_STATS_TTL') or 30)  # seconds
+    
+    # Search Config
+    SEARCH_INDEX_REFRESH = int(os.environ.get('SEARCH_INDEX_REFRESH') or 300)  # seconds between full rebuilds
+    SEARCH_MAX_RESULTS = int(os.environ.get('SEARCH_MAX_RESULTS') or 50)
+    
+    # Password Hashing Config
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD') or 'pbkdf2:sha256:600000'  # Werkzeug method string; login rehashes on change
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS') or 2)  # hashes running at once
+    PASSWORD_HASH_QUEUE = int(os.environ.get('PASSWORD_HASH_QUEUE') or 16)  # hashes allowed to wait for a worker
+    PASSWORD_HASH_TIMEOUT = float(os.environ.get('PASSWORD_HASH_TIMEOUT') or 5.0)  # seconds to wait for a slot before 503
+    
+    # Proxy Config
+    PROXY_FIX_X_FOR = int(os.environ.get('PROXY_FIX_X_FOR') or 1)  # proxies in front whose X-Forwarded-For is trusted; 0 when clients connect directly
+    PROXY_FIX_X_PROTO = int(os.environ.get('PROXY_FIX_X_PROTO') or 1)  # same for X-Forwarded-Proto
+    
+    # Rate Limit Config
+    RATELIMIT_ENABLED = os.environ.get('RATELIMIT_ENABLED', 'True').lower() == 'true'
+    RATELIMIT_STORAGE_URL = os.environ.get('RATELIMIT_STORAGE_URL')  # database shared by workers; in-process when unset
+    RATELIMIT_MAX_KEYS = int(os.environ.get('RATELIMIT_MAX_KEYS') or 10000)  # in-process buckets kept before LRU eviction
+    RATELIMIT_PRUNE_INTERVAL = int(os.environ.get('RATELIMIT_PRUNE_INTERVAL') or 60)  # seconds between deletes of refilled database buckets
+    RATELIMIT_LOGIN_IP = os.environ.get('RATELIMIT_LOGIN_IP') or '20/minute'
+    RATELIMIT_LOGIN_ACCOUNT = os.environ.get('RATELIMIT_LOGIN_ACCOUNT') or '5/minute'  # per email address
+    RATELIMIT_REGISTER = os.environ.get('RATELIMIT_REGISTER') or '5/hour'  # per IP
+    RATELIMIT_CONTACT = os.environ.get('RATELIMIT_CONTACT') or '5/hour'  # per IP and per email address
+    RATELIMIT_DESIGN_REQUEST = os.environ.get('RATELIMIT_DESIGN_REQUEST') or '10/hour'  # per IP and per email address
+    
+    # System Settings Config
+    SETTINGS_REFRESH_INTERVAL = float(os.environ.get('SETTINGS_REFRESH_INTERVAL') or 5)  # seconds between version checks
+    SETTINGS_PUBLIC_MAX_AGE = int(os.environ.get('SETTINGS_PUBLIC_MAX_AGE') or 60)  # seconds
+    
+    # Query Budget Config
+    QUERY_BUDGET_STRICT = os.environ.get('QUERY_BUDGET_STRICT', 'False').lower() == 'true'  # raise instead of log when exceeded
+    
+    # Pagination Config
+    PAGINATION_COUNT_TTL = int(os.environ.get('PAGINATION_COUNT_TTL') or 60)  # seconds
+    
+    # Audit Log Config
+    AUDIT_ASYNC = os.environ.get('AUDIT_ASYNC', 'True').lower() == 'true'
+    AUDIT_QUEUE_SIZE = int(os.environ.get('AUDIT_QUEUE_SIZE') or 10000)
+    AUDIT_BATCH_SIZE = int(os.environ.get('AUDIT_BATCH_SIZE') or 100)
+    AUDIT_FLUSH_INTERVAL = float(os.environ.get('AUDIT_FLUSH_INTERVAL') or 2.0)  # seconds
+    AUDIT_QUEUE_POLICY = os.environ.get('AUDIT_QUEUE_POLICY') or 'block'  # block, sync or drop
+    AUDIT_BLOCK_TIMEOUT = float(os.environ.get('AUDIT_BLOCK_TIMEOUT') or 1.0)  # seconds
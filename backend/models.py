@@ -17,6 +17,9 @@ class UserRole(Enum):
 # User model with enhanced fields
 class User(db.Model):
     __tablename__ = 'users'
+    __table_args__ = (
+        db.Index('ix_users_created_at_id', 'created_at', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     email = db.Column(db.String(120), unique=True, nullable=False)
@@ -28,7 +31,7 @@ class User(db.Model):
     oauth_provider = db.Column(db.String(50))  # 'google', 'facebook', etc.
     
     # Role and permissions
-    user_role = db.Column(db.String(50), default=UserRole.OTHER.value)
+    user_role = db.Column(db.String(50), default=UserRole.OTHER.value, index=True)
     is_admin = db.Column(db.Boolean, default=False)
     is_active = db.Column(db.Boolean, default=True)
     is_banned = db.Column(db.Boolean, default=False)
@@ -62,6 +65,9 @@ class User(db.Model):
     language_preference = db.Column(db.String(5), default='ar')  # 'ar' or 'en'
     reduce_motion = db.Column(db.Boolean, default=False)
     
+    # Normalized email/username/full_name, maintained by utils.user_search
+    search_text = db.Column(db.Text)
+    
     # Timestamps
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -106,6 +112,9 @@ class User(db.Model):
 # Service model
 class Service(db.Model):
     __tablename__ = 'services'
+    __table_args__ = (
+        db.Index('ix_services_active_order', 'is_active', 'order_num'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(100), nullable=False)
@@ -131,9 +140,35 @@ class Service(db.Model):
             'is_active': self.is_active,
         }
 
+# Tag model
+class Tag(db.Model):
+    __tablename__ = 'tags'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(50), nullable=False)
+    slug = db.Column(db.String(50), unique=True, nullable=False)  # Normalized name, see utils.tags
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'name': self.name,
+            'slug': self.slug,
+        }
+
+# Portfolio <-> Tag association
+portfolio_tags = db.Table(
+    'portfolio_tags',
+    db.Column('portfolio_id', db.Integer, db.ForeignKey('portfolio.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('tag_id', db.Integer, db.ForeignKey('tags.id', ondelete='CASCADE'), primary_key=True),
+    db.Index('ix_portfolio_tags_tag_portfolio', 'tag_id', 'portfolio_id')
+)
+
 # Portfolio model
 class Portfolio(db.Model):
     __tablename__ = 'portfolio'
+    __table_args__ = (
+        db.Index('ix_portfolio_active_category_order', 'is_active', 'category', 'order_num'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(150), nullable=False)
@@ -142,15 +177,19 @@ class Portfolio(db.Model):
     description_ar = db.Column(db.Text)
     category = db.Column(db.String(50))
     image_url = db.Column(db.String(255))
-    images = db.Column(db.JSON, default=[])  # Multiple images
+    thumbnail_url = db.Column(db.String(255))
+    images = db.Column(db.JSON, default=[])  # Multiple images / responsive variants
     client_name = db.Column(db.String(100))
     project_date = db.Column(db.Date)
-    tags = db.Column(db.String(255))
+    legacy_tags = db.Column('tags', db.String(255))  # Comma-separated, superseded by tags
     is_featured = db.Column(db.Boolean, default=False)
     is_active = db.Column(db.Boolean, default=True)
     order_num = db.Column(db.Integer, default=0)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
+    # Relationships
+    tags = db.relationship('Tag', secondary=portfolio_tags, lazy='selectin', order_by='Tag.name')
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -160,10 +199,11 @@ class Portfolio(db.Model):
             'description_ar': self.description_ar,
             'category': self.category,
             'image_url': self.image_url,
+            'thumbnail_url': self.thumbnail_url or self.image_url,
             'images': self.images or [],
             'client_name': self.client_name,
             'project_date': self.project_date.isoformat() if self.project_date else None,
-            'tags': self.tags.split(',') if self.tags else [],
+            'tags': [tag.name for tag in self.tags],
             'is_featured': self.is_featured,
         }
 
@@ -178,9 +218,13 @@ class RequestStatus(Enum):
 # Design Request model with enhanced fields
 class DesignRequest(db.Model):
     __tablename__ = 'design_requests'
+    __table_args__ = (
+        db.Index('ix_design_requests_status_created', 'status', 'created_at'),
+        db.Index('ix_design_requests_created_at_id', 'created_at', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
     
     # Request details
     title = db.Column(db.String(200), nullable=False)
@@ -292,7 +336,7 @@ class ContactMessage(db.Model):
     __tablename__ = 'contact_messages'
     
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True, index=True)
     
     # Contact info
     name = db.Column(db.String(100), nullable=False)
@@ -305,13 +349,13 @@ class ContactMessage(db.Model):
     attachments = db.Column(db.JSON, default=[])
     
     # Status
-    is_read = db.Column(db.Boolean, default=False)
+    is_read = db.Column(db.Boolean, default=False, index=True)
     is_replied = db.Column(db.Boolean, default=False)
     replied_at = db.Column(db.DateTime)
     reply_message = db.Column(db.Text)
     
     # Timestamps
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     
     def to_dict(self, include_private=False):
         data = {
@@ -343,27 +387,26 @@ class SystemSettings(db.Model):
     description = db.Column(db.String(255))
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    # Reads and writes go through the per-process cache in utils.settings
     @classmethod
     def get_setting(cls, key, default=None):
-        setting = cls.query.filter_by(key=key).first()
-        return setting.value if setting else default
+        from utils.settings import settings_store
+        return settings_store.get(key, default)
     
     @classmethod
     def set_setting(cls, key, value, description=None):
-        setting = cls.query.filter_by(key=key).first()
-        if setting:
-            setting.value = value
-            if description:
-                setting.description = description
-        else:
-            setting = cls(key=key, value=value, description=description)
-            db.session.add(setting)
-        db.session.commit()
-        return setting
+        from utils.settings import settings_store
+        settings_store.update({key: value}, {key: description})
+        return cls.query.filter_by(key=key).first()
 
 # Audit Log model (for tracking admin actions)
 class AuditLog(db.Model):
     __tablename__ = 'audit_logs'
+    __table_args__ = (
+        db.Index('ix_audit_logs_user_created', 'user_id', 'created_at'),
+        db.Index('ix_audit_logs_action_created', 'action', 'created_at'),
+        db.Index('ix_audit_logs_created_at_id', 'created_at', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'))
@@ -387,4 +430,41 @@ class AuditLog(db.Model):
             'details': self.details,
             'ip_address': self.ip_address,
             'created_at': self.created_at.isoformat() if self.created_at else None,
-        }
\ No newline at end of file
+        }
+
+# Stored File model (content-addressed uploads)
+class StoredFile(db.Model):
+    __tablename__ = 'stored_files'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    sha256 = db.Column(db.String(64), unique=True, nullable=False)
+    path = db.Column(db.String(255), nullable=False)  # Relative to UPLOAD_FOLDER
+    size = db.Column(db.Integer, nullable=False)
+    ref_count = db.Column(db.Integer, default=0, nullable=False)  # Rows referencing this file
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+# Email Outbox model (durable queue of outbound emails)
+class EmailOutbox(db.Model):
+    __tablename__ = 'email_outbox'
+    __table_args__ = (
+        db.Index('ix_email_outbox_status_next_attempt', 'status', 'next_attempt_at'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    dedup_key = db.Column(db.String(150), unique=True, nullable=False)
+    recipients = db.Column(db.JSON, nullable=False)
+    subject = db.Column(db.String(255), nullable=False)
+    body_text = db.Column(db.Text)
+    body_html = db.Column(db.Text)
+    
+    # Delivery tracking
+    status = db.Column(db.String(20), default='pending')  # pending, sending, sent, failed
+    attempts = db.Column(db.Integer, default=0)
+    last_error = db.Column(db.Text)
+    claim_token = db.Column(db.String(32), index=True)  # Worker currently sending
+    locked_until = db.Column(db.DateTime)  # Claim expires; row is retried after
+    next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    # Timestamps
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime)
@@ -4,19 +4,36 @@ from datetime import datetime
 db = SQLAlchemy()
 
 class User(db.Model):
+    __table_args__ = (
+        db.Index('ix_user_created_at_id', 'created_at', 'id'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     email = db.Column(db.String(120), unique=True, nullable=False)
     username = db.Column(db.String(80), unique=True, nullable=False)
     password_hash = db.Column(db.String(255), nullable=False)
+    user_role = db.Column(db.String(50), default='other', index=True)  # student, teacher, content_creator, company, other
     is_admin = db.Column(db.Boolean, default=False)
+    is_active = db.Column(db.Boolean, default=True)
+    is_banned = db.Column(db.Boolean, default=False)
+    full_name = db.Column(db.String(150))
+    phone = db.Column(db.String(20))  # Private, only visible to admin
+    phone_visible = db.Column(db.Boolean, default=False)  # Admin can toggle
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    last_login = db.Column(db.DateTime)
+    tokens_valid_after = db.Column(db.DateTime)  # Earlier tokens are rejected; see utils.revocation
+    search_text = db.Column(db.Text)  # Normalized email, username and full_name; see utils.user_search
     
     # Relationships
     designs = db.relationship('Design', backref='client', lazy=True)
     requests = db.relationship('DesignRequest', backref='client', lazy=True)
 
 class Service(db.Model):
+    __table_args__ = (
+        db.Index('ix_service_active_order', 'is_active', 'order_num'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(100), nullable=False)
     title_ar = db.Column(db.String(100), nullable=False)
@@ -28,7 +45,23 @@ class Service(db.Model):
     is_active = db.Column(db.Boolean, default=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+class Tag(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(50), nullable=False)
+    slug = db.Column(db.String(50), unique=True, nullable=False)  # Normalized name, see utils.tags
+
+portfolio_tags = db.Table(
+    'portfolio_tags',
+    db.Column('portfolio_id', db.Integer, db.ForeignKey('portfolio.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('tag_id', db.Integer, db.ForeignKey('tag.id', ondelete='CASCADE'), primary_key=True),
+    db.Index('ix_portfolio_tags_tag_portfolio', 'tag_id', 'portfolio_id')
+)
+
 class Portfolio(db.Model):
+    __table_args__ = (
+        db.Index('ix_portfolio_active_category_order', 'is_active', 'category', 'order_num'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
     title_ar = db.Column(db.String(200))
@@ -37,15 +70,22 @@ class Portfolio(db.Model):
     category = db.Column(db.String(50), nullable=False)
     image_url = db.Column(db.String(500), nullable=False)
     thumbnail_url = db.Column(db.String(500))
+    images = db.Column(db.JSON, default=[])  # Responsive variants: [{url, width, type}]
     client_name = db.Column(db.String(100))
     project_date = db.Column(db.Date)
-    tags = db.Column(db.String(200))  # Comma-separated tags
+    legacy_tags = db.Column('tags', db.String(200))  # Comma-separated, superseded by tags; see utils.migrations
     is_featured = db.Column(db.Boolean, default=False)
     is_active = db.Column(db.Boolean, default=True)
     order_num = db.Column(db.Integer, default=0)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    tags = db.relationship('Tag', secondary=portfolio_tags, lazy='selectin', order_by='Tag.name')
 
 class DesignRequest(db.Model):
+    __table_args__ = (
+        db.Index('ix_design_request_status_created', 'status', 'created_at'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
     email = db.Column(db.String(120), nullable=False)
@@ -56,9 +96,10 @@ class DesignRequest(db.Model):
     budget_range = db.Column(db.String(50))
     deadline = db.Column(db.Date)
     status = db.Column(db.String(20), default='pending')  # pending, in_progress, completed, cancelled
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True, index=True)
     notes = db.Column(db.Text)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    reference_files = db.Column(db.JSON, default=[])  # Stored upload URLs
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
 class Design(db.Model):
@@ -81,6 +122,60 @@ class ContactMessage(db.Model):
     phone = db.Column(db.String(20))
     subject = db.Column(db.String(200))
     message = db.Column(db.Text, nullable=False)
-    is_read = db.Column(db.Boolean, default=False)
+    is_read = db.Column(db.Boolean, default=False, index=True)
     is_replied = db.Column(db.Boolean, default=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
\ No newline at end of file
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+class AuditLog(db.Model):
+    __table_args__ = (
+        db.Index('ix_audit_log_user_created', 'user_id', 'created_at'),
+        db.Index('ix_audit_log_action_created', 'action', 'created_at'),
+        db.Index('ix_audit_log_created_at_id', 'created_at', 'id'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
+    action = db.Column(db.String(100), nullable=False)
+    resource_type = db.Column(db.String(50))  # user, design_request, settings, etc.
+    resource_id = db.Column(db.Integer)
+    details = db.Column(db.JSON)
+    ip_address = db.Column(db.String(45))
+    user_agent = db.Column(db.String(255))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    user = db.relationship('User', backref='audit_logs')
+
+class EmailOutbox(db.Model):
+    __table_args__ = (
+        db.Index('ix_email_outbox_status_next_attempt', 'status', 'next_attempt_at'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    dedup_key = db.Column(db.String(150), unique=True, nullable=False)
+    recipients = db.Column(db.JSON, nullable=False)
+    subject = db.Column(db.String(255), nullable=False)
+    body_text = db.Column(db.Text)
+    body_html = db.Column(db.Text)
+    status = db.Column(db.String(20), default='pending')  # pending, sending, sent, failed
+    attempts = db.Column(db.Integer, default=0)
+    last_error = db.Column(db.Text)
+    claim_token = db.Column(db.String(32), index=True)
+    locked_until = db.Column(db.DateTime)
+    next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime)
+
+class SystemSettings(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    key = db.Column(db.String(100), unique=True, nullable=False)
+    value = db.Column(db.JSON)
+    description = db.Column(db.String(255))
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class StoredFile(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    sha256 = db.Column(db.String(64), unique=True, nullable=False)
+    path = db.Column(db.String(255), nullable=False)  # Relative to UPLOAD_FOLDER
+    size = db.Column(db.Integer, nullable=False)
+    ref_count = db.Column(db.Integer, default=0, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -0,0 +1,34 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# The app reads its configuration at import, so point it at a scratch database first
+_tmp = tempfile.mkdtemp(prefix='nawi-tests-')
+os.environ['DATABASE_URL'] = f'sqlite:///{os.path.join(_tmp, "test.db")}'
+os.environ['MAIL_USERNAME'] = ''
+os.environ['RATELIMIT_ENABLED'] = 'False'
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app as flask_app, init_db
+from models import User
+from utils.auth import generate_tokens
+
+@pytest.fixture(scope='session')
+def app():
+    flask_app.config['TESTING'] = True
+    init_db()
+    return flask_app
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+@pytest.fixture
+def admin_headers(app):
+    with app.app_context():
+        admin = User.query.filter_by(email=app.config['ADMIN_EMAIL']).one()
+        tokens = generate_tokens(admin)
+    return {'Authorization': f'Bearer {tokens["access_token"]}'}
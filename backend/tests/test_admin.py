@@ -0,0 +1,168 @@
+import pytest
+
+from models import db, User, DesignRequest, ContactMessage
+
+@pytest.fixture(scope='module')
+def members(app):
+    with app.app_context():
+        users = [
+            User(email=f'member{i}@example.com', username=f'member{i}', password_hash='x',
+                 full_name=f'Member {i}', user_role='student' if i % 2 else 'company', phone=f'0100{i}')
+            for i in range(5)
+        ]
+        users[4].is_banned = True
+        db.session.add_all(users)
+        db.session.flush()
+        db.session.add(DesignRequest(
+            name='Member 0', email='member0@example.com', service_type='logo',
+            project_description='A new logo', user_id=users[0].id
+        ))
+        db.session.add(ContactMessage(name='Member 0', email='member0@example.com', message='Hello'))
+        db.session.commit()
+        return [user.id for user in users]
+
+def test_requires_admin(client, members):
+    assert client.get('/api/admin/users').status_code == 401
+
+def test_list_users_pages(client, admin_headers, members):
+    response = client.get('/api/admin/users?per_page=2', headers=admin_headers)
+    
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data['total'] >= 6
+    assert data['per_page'] == 2
+    assert len(data['users']) == 2
+    assert {'email', 'user_role', 'phone', 'is_banned'} <= set(data['users'][0])
+
+def test_list_users_cursor_walks_every_row(client, admin_headers, members):
+    seen, cursor = [], ''
+    while True:
+        response = client.get(f'/api/admin/users?per_page=2&with_total=0&cursor={cursor}', headers=admin_headers)
+        data = response.get_json()
+        seen.extend(user['id'] for user in data['users'])
+        cursor = data['next_cursor']
+        if not cursor:
+            break
+    
+    assert set(members) <= set(seen)
+    assert len(seen) == len(set(seen))
+
+def test_list_users_fields_and_filters(client, admin_headers, members):
+    response = client.get('/api/admin/users?fields=id,username&role=company&status=active', headers=admin_headers)
+    users = response.get_json()['users']
+    
+    assert {user['username'] for user in users} == {'member0', 'member2'}
+    assert set(users[0]) == {'id', 'username'}
+    
+    response = client.get('/api/admin/users?fields=nope', headers=admin_headers)
+    assert response.status_code == 400
+
+def test_user_details(client, admin_headers, members):
+    response = client.get(f'/api/admin/users/{members[0]}', headers=admin_headers)
+    
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data['username'] == 'member0'
+    assert [r['service_type'] for r in data['design_requests']] == ['logo']
+    assert [m['message'] for m in data['contact_messages']] == ['Hello']
+    
+    assert client.get('/api/admin/users/999999', headers=admin_headers).status_code == 404
+
+def test_update_user_bans(client, admin_headers, members):
+    response = client.put(f'/api/admin/users/{members[1]}', json={'is_banned': True}, headers=admin_headers)
+    
+    assert response.status_code == 200
+    assert response.get_json()['user']['is_banned'] is True
+    
+    response = client.get('/api/admin/users?status=banned&fields=id', headers=admin_headers)
+    assert {members[1], members[4]} <= {user['id'] for user in response.get_json()['users']}
+
+def test_design_requests(client, admin_headers, members):
+    response = client.get('/api/admin/design-requests?status=pending', headers=admin_headers)
+    
+    assert response.status_code == 200
+    requests = response.get_json()['requests']
+    assert any(r['user'] == 'member0' for r in requests)
+    
+    request_id = requests[0]['id']
+    response = client.put(f'/api/admin/design-requests/{request_id}', json={'status': 'in_progress'}, headers=admin_headers)
+    assert response.get_json()['request']['status'] == 'in_progress'
+
+def test_export_streams_csv(client, admin_headers, members, monkeypatch):
+    import csv
+    import io
+    from api import admin
+    
+    # Several chunks even for a handful of rows
+    monkeypatch.setattr(admin, 'EXPORT_BATCH_SIZE', 2)
+    response = client.get('/api/admin/users/export?role=student', headers=admin_headers, buffered=False)
+    
+    assert response.status_code == 200
+    assert response.is_streamed
+    assert response.mimetype == 'text/csv'
+    assert response.headers['Content-Disposition'].startswith('attachment; filename=users_export_')
+    
+    chunks = list(response.response)
+    rows = list(csv.reader(io.StringIO(''.join(
+        chunk.decode() if isinstance(chunk, bytes) else chunk for chunk in chunks
+    ))))
+    assert len(chunks) > 1
+    assert rows[0][:3] == ['ID', 'Username', 'Email']
+    assert {row[1] for row in rows[1:]} == {'member1', 'member3'}
+    assert all(row[4] == 'student' for row in rows[1:])
+
+def test_dashboard_stats(client, admin_headers, members):
+    response = client.get('/api/admin/dashboard/stats', headers=admin_headers)
+    
+    assert response.status_code == 200
+    stats = response.get_json()
+    assert stats['users']['total'] >= 6
+    assert stats['users']['by_role']['student'] >= 2
+    assert stats['design_requests']['total'] >= 1
+    assert stats['messages']['unread'] >= 1
+    
+    # Admin-only data must not be kept by shared caches
+    assert response.cache_control.private
+    assert not response.cache_control.public
+    
+    cached = client.get('/api/admin/dashboard/stats', headers=admin_headers)
+    assert cached.headers['X-Cache'] == 'HIT'
+    assert cached.cache_control.private
+    
+    assert client.get('/api/admin/dashboard/stats').status_code == 401
+
+def test_search_users(client, admin_headers, members):
+    response = client.get('/api/admin/users?search=MEMBER 3&fields=id,username', headers=admin_headers)
+    assert [user['username'] for user in response.get_json()['users']] == ['member3']
+    
+    # Prefix matches on email, username and full name
+    response = client.get('/api/admin/users?search=membe&per_page=50', headers=admin_headers)
+    assert {user['id'] for user in response.get_json()['users']} >= set(members)
+    
+    # Cursor mode filters the same way but keeps (created_at, id) order
+    response = client.get('/api/admin/users?search=member2&cursor=', headers=admin_headers)
+    assert [user['username'] for user in response.get_json()['users']] == ['member2']
+
+def test_search_follows_updates(app, client, admin_headers, members):
+    with app.app_context():
+        user = db.session.get(User, members[2])
+        user.full_name = 'Renamed Person'
+        db.session.commit()
+    
+    response = client.get('/api/admin/users?search=renamed&fields=id', headers=admin_headers)
+    assert [user['id'] for user in response.get_json()['users']] == [members[2]]
+
+def test_audit_log_fields(app, client, admin_headers, members):
+    from utils.audit import audit_writer
+    
+    client.get(f'/api/admin/users/{members[0]}', headers=admin_headers)
+    audit_writer.shutdown()
+    
+    response = client.get('/api/admin/audit-logs?action=view_user_details&fields=user,action', headers=admin_headers)
+    logs = response.get_json()['logs']
+    assert logs and set(logs[0]) == {'user', 'action'}
+    assert logs[0]['user'] == 'admin'
+    
+    response = client.get('/api/admin/design-requests?fields=id,service_type,user', headers=admin_headers)
+    requests = response.get_json()['requests']
+    assert all(set(r) == {'id', 'service_type', 'user'} for r in requests)
@@ -0,0 +1,47 @@
+from flask import request
+
+from models import AuditLog
+from utils.audit import audit_writer
+from utils.auth import log_user_action
+
+def test_queued_entry_is_persisted(app):
+    with app.test_request_context('/api/admin/users/7', environ_base={'REMOTE_ADDR': '203.0.113.9'}):
+        log_user_action(None, 'test_queued_write', 'user', 7, {'field': 'is_banned'}, request)
+    
+    # Stops the writer thread after flushing the queue; the next entry restarts it
+    audit_writer.shutdown()
+    
+    with app.app_context():
+        entry = AuditLog.query.filter_by(action='test_queued_write').one()
+        assert entry.resource_type == 'user'
+        assert entry.resource_id == 7
+        assert entry.details == {'field': 'is_banned'}
+        assert entry.ip_address == '203.0.113.9'
+
+def test_sync_mode_writes_immediately(app):
+    app.config['AUDIT_ASYNC'] = False
+    try:
+        with app.test_request_context('/'):
+            log_user_action(None, 'test_sync_write', request=request)
+        
+        with app.app_context():
+            assert AuditLog.query.filter_by(action='test_sync_write').count() == 1
+    finally:
+        app.config['AUDIT_ASYNC'] = True
+
+def test_long_values_are_truncated_to_their_columns(app):
+    with app.app_context():
+        audit_writer._flush([{'action': 'test_truncated_' + 'x' * 200, 'user_agent': 'Agent/' + 'y' * 400}])
+        
+        entry = AuditLog.query.filter(AuditLog.action.like('test_truncated_%')).one()
+        assert len(entry.action) == 100
+        assert len(entry.user_agent) == 255
+
+def test_bad_entry_does_not_drop_the_batch(app):
+    dropped = audit_writer.dropped
+    with app.app_context():
+        # action is NOT NULL: this row fails, the others must still be written
+        audit_writer._flush([{'action': 'test_batch_a'}, {'action': None}, {'action': 'test_batch_b'}])
+        
+        assert AuditLog.query.filter(AuditLog.action.in_(['test_batch_a', 'test_batch_b'])).count() == 2
+    assert audit_writer.dropped == dropped + 1
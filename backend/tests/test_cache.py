@@ -0,0 +1,57 @@
+import pytest
+
+from models import db, Service
+from utils import compression
+from utils.cache import response_cache
+
+@pytest.fixture(autouse=True)
+def fresh_cache(app):
+    response_cache.clear()
+    yield
+    response_cache.clear()
+
+def add_service(app, title):
+    with app.app_context():
+        db.session.add(Service(title=title, title_ar=title, description='Cached', description_ar='Cached'))
+        db.session.commit()
+
+def test_if_none_match_is_answered_before_the_view(app, client, monkeypatch):
+    # Nothing is kept: the ETag is a version stamp, not a digest of a warm entry
+    monkeypatch.setitem(app.config, 'RESPONSE_CACHE_MAX_BYTES', 0)
+    add_service(app, 'Branding')
+    etag = client.get('/api/services').headers['ETag']
+    
+    response = client.get('/api/services', headers={'If-None-Match': etag})
+    
+    assert response.status_code == 304
+    assert response.headers['X-Query-Count'] == '0'
+    assert response.headers['ETag'] == etag
+
+def test_write_changes_the_etag(app, client):
+    etag = client.get('/api/services').headers['ETag']
+    
+    add_service(app, 'Packaging')
+    response = client.get('/api/services', headers={'If-None-Match': etag})
+    
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+    assert 'Packaging' in response.get_data(as_text=True)
+
+def test_compressed_variant_is_cached(app, client, monkeypatch):
+    monkeypatch.setitem(app.config, 'COMPRESS_MIN_SIZE', 0)
+    calls = []
+    compress = compression.compress
+    monkeypatch.setattr(compression, 'compress', lambda *args: calls.append(args[1]) or compress(*args))
+    add_service(app, 'Signage')
+    
+    first = client.get('/api/services', headers={'Accept-Encoding': 'gzip'})
+    second = client.get('/api/services', headers={'Accept-Encoding': 'gzip'})
+    
+    assert second.headers['X-Cache'] == 'HIT'
+    assert second.headers['Content-Encoding'] == 'gzip'
+    assert second.get_data() == first.get_data()
+    assert calls == ['gzip']
+    
+    plain = client.get('/api/services')
+    assert 'Content-Encoding' not in plain.headers
+    assert 'Signage' in plain.get_data(as_text=True)
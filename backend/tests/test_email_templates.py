@@ -0,0 +1,28 @@
+from utils.email_templates import email_templates
+
+def _contact(i, **extra):
+    return dict(name=f'Sender {i}', email=f's{i}@example.com', phone=None, subject=None, message=f'<b>Hi {i}</b>', **extra)
+
+def test_render_batch_matches_render(app):
+    contexts = [_contact(i) for i in range(3)]
+    
+    batch = list(email_templates.render_batch('contact_form', contexts, 'en'))
+    
+    assert batch == [email_templates.render('contact_form', 'en', **_contact(i)) for i in range(3)]
+    # HTML bodies are autoescaped, text bodies are not
+    assert '&lt;b&gt;Hi 0&lt;/b&gt;' in batch[0][1]
+    assert '<b>Hi 0</b>' in batch[0][0]
+
+def test_render_batch_looks_templates_up_once_per_language(app, monkeypatch):
+    lookups = []
+    original = email_templates._get
+    monkeypatch.setattr(email_templates, '_get', lambda *args: lookups.append(args) or original(*args))
+    contexts = [_contact(i, lang='ar' if i % 2 else 'en') for i in range(1000)]
+    
+    bodies = list(email_templates.render_batch('contact_form', contexts))
+    
+    assert len(bodies) == 1000
+    assert sorted(lookups) == sorted([
+        ('contact_form', lang, extension) for lang in ('ar', 'en') for extension in ('txt', 'html')
+    ])
+    assert 'Sender 1' in bodies[1][0] and 'Sender 2' in bodies[2][0]
@@ -0,0 +1,18 @@
+from sqlalchemy import create_engine
+
+from models import db
+from utils.index_benchmark import QUERIES, create_indexes, run_queries, seed
+
+def test_every_benchmarked_query_uses_an_index(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'benchmark.db'}")
+    seed(engine, db.metadata, 2000)
+    
+    before = run_queries(engine, repeat=1)
+    create_indexes(engine, db.metadata)
+    after = run_queries(engine, repeat=1)
+    engine.dispose()
+    
+    assert set(after) == {label for label, _, _ in QUERIES}
+    for label, (plan, _) in after.items():
+        assert any('USING' in line and 'INDEX' in line for line in plan), (label, plan)
+    assert any(plan != after[label][0] for label, (plan, _) in before.items())
@@ -0,0 +1,173 @@
+import smtplib
+import time
+
+import pytest
+
+from models import db, EmailOutbox
+from utils import email
+from utils.outbox import outbox_worker, queue_email
+
+class FakeConnection:
+    def __init__(self, server):
+        self.server = server
+    
+    def __enter__(self):
+        self.server.connections += 1
+        self.server.open += 1
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.server.open -= 1
+        return False
+    
+    def send(self, message):
+        if self.server.failures:
+            raise self.server.failures.pop(0)
+        refused = {r: (550, b'No such user') for r in message.recipients if r in self.server.refused}
+        if refused:
+            raise smtplib.SMTPRecipientsRefused(refused)
+        self.server.sent.append(message)
+
+class FakeServer:
+    def __init__(self):
+        self.sent = []
+        self.failures = []
+        self.refused = set()
+        self.connections = 0
+        self.open = 0
+        self.down = False
+    
+    def connect(self):
+        if self.down:
+            raise ConnectionRefusedError('Connection refused')
+        return FakeConnection(self)
+
+@pytest.fixture
+def server(app, monkeypatch):
+    # Drained by hand below, not by the background thread
+    outbox_worker.shutdown()
+    server = FakeServer()
+    monkeypatch.setattr(email.mail, 'connect', server.connect)
+    monkeypatch.setitem(app.config, 'MAIL_RETRY_BACKOFF', 0)
+    with app.app_context():
+        EmailOutbox.query.update({'status': 'sent'})
+        db.session.commit()
+    return server
+
+def test_drain_sends_batch_over_one_connection(app, server):
+    with app.app_context():
+        for i in range(3):
+            queue_email(f'Subject {i}', f'to{i}@example.com', 'Body', dedup_key=f'drain-{i}')
+        db.session.commit()
+        
+        assert outbox_worker.drain() == 3
+        
+        assert [m.recipients for m in server.sent] == [[f'to{i}@example.com'] for i in range(3)]
+        assert server.connections == 1
+        assert EmailOutbox.query.filter(EmailOutbox.dedup_key.like('drain-%'), EmailOutbox.status == 'sent').count() == 3
+
+def test_drain_retries_transient_and_reschedules_permanent(app, server):
+    server.failures = [smtplib.SMTPServerDisconnected('dropped')]
+    server.refused = {'bad@example.com'}
+    with app.app_context():
+        queue_email('Retried', 'ok@example.com', 'Body', dedup_key='retry-ok')
+        queue_email('Refused', 'bad@example.com', 'Body', dedup_key='retry-bad')
+        db.session.commit()
+        
+        assert outbox_worker.drain() == 2
+        
+        assert EmailOutbox.query.filter_by(dedup_key='retry-ok').one().status == 'sent'
+        refused = EmailOutbox.query.filter_by(dedup_key='retry-bad').one()
+        assert refused.status == 'pending'
+        assert refused.last_error
+        # One reconnect after the dropped connection
+        assert server.connections == 2
+
+def test_session_is_reused_across_drains_until_idle(app, server, monkeypatch):
+    with app.app_context():
+        for i in range(2):
+            queue_email('One at a time', 'solo@example.com', 'Body', dedup_key=f'reuse-{i}')
+            db.session.commit()
+            assert outbox_worker.drain() == 1
+        
+        assert len(server.sent) == 2
+        assert server.connections == 1
+        assert server.open == 1
+        
+        outbox_worker.close_idle_session()
+        assert server.open == 1
+        
+        monkeypatch.setitem(app.config, 'MAIL_IDLE_TIMEOUT', 0)
+        outbox_worker.close_idle_session()
+        assert server.open == 0
+
+def test_dropped_idle_connection_is_reopened_without_backoff(app, server, monkeypatch):
+    monkeypatch.setitem(app.config, 'MAIL_RETRY_BACKOFF', 60)
+    with app.app_context():
+        queue_email('First', 'a@example.com', 'Body', dedup_key='dropped-1')
+        db.session.commit()
+        outbox_worker.drain()
+        
+        # The server closed the kept-open connection in the meantime
+        server.failures = [smtplib.SMTPServerDisconnected('idle timeout')]
+        queue_email('Second', 'b@example.com', 'Body', dedup_key='dropped-2')
+        db.session.commit()
+        started = time.monotonic()
+        outbox_worker.drain()
+        
+        assert time.monotonic() - started < 5
+        assert [m.subject for m in server.sent] == ['First', 'Second']
+        assert server.connections == 2
+
+def test_outage_stops_batch_and_releases_remaining_rows(app, server):
+    server.down = True
+    with app.app_context():
+        for i in range(3):
+            queue_email(f'Outage {i}', f'to{i}@example.com', 'Body', dedup_key=f'outage-{i}')
+        db.session.commit()
+        
+        assert outbox_worker.drain() == 3
+        
+        first, *rest = EmailOutbox.query.filter(EmailOutbox.dedup_key.like('outage-%')).order_by(EmailOutbox.id).all()
+        assert first.status == 'pending'
+        assert first.attempts == 1
+        assert 'refused' in first.last_error
+        # Never attempted: handed back unchanged apart from the retry time
+        for row in rest:
+            assert row.status == 'pending'
+            assert row.attempts == 0
+            assert row.claim_token is None
+            assert row.last_error is None
+            assert row.next_attempt_at == first.next_attempt_at
+
+def test_expired_lease_releases_rows_unsent(app, server, monkeypatch):
+    monkeypatch.setitem(app.config, 'MAIL_OUTBOX_LEASE', 0)
+    with app.app_context():
+        queue_email('Late', 'late@example.com', 'Body', dedup_key='lease-expired')
+        db.session.commit()
+        
+        outbox_worker.drain()
+        
+        row = EmailOutbox.query.filter_by(dedup_key='lease-expired').one()
+        assert server.sent == []
+        assert (row.status, row.attempts, row.claim_token) == ('pending', 0, None)
+
+def test_drain_leaves_rows_reclaimed_by_another_worker(app, server, monkeypatch):
+    with app.app_context():
+        queue_email('Reclaimed', 'again@example.com', 'Body', dedup_key='reclaimed')
+        db.session.commit()
+        
+        send = email.SMTPSession.send
+        
+        def send_after_reclaim(session, message):
+            # Another worker takes the row over while this one is sending
+            EmailOutbox.query.filter_by(dedup_key='reclaimed').update({'claim_token': 'other-worker'})
+            db.session.commit()
+            return send(session, message)
+        monkeypatch.setattr(email.SMTPSession, 'send', send_after_reclaim)
+        
+        outbox_worker.drain()
+        
+        row = EmailOutbox.query.filter_by(dedup_key='reclaimed').one()
+        assert row.status == 'sending'
+        assert row.claim_token == 'other-worker'
@@ -0,0 +1,28 @@
+from datetime import datetime
+
+from models import db, User
+from utils.pagination import decode_cursor, encode_cursor, keyset_paginate
+
+def test_cursor_round_trips_missing_created_at():
+    assert decode_cursor(encode_cursor(None, 7)) == (None, 7)
+    assert decode_cursor(encode_cursor(datetime(2024, 5, 1, 12), 7)) == (datetime(2024, 5, 1, 12), 7)
+
+def test_keyset_walks_rows_without_created_at(app):
+    with app.app_context():
+        users = [User(email=f'undated{i}@example.com', username=f'undated{i}', password_hash='x') for i in range(5)]
+        db.session.add_all(users)
+        db.session.commit()
+        ids = [user.id for user in users]
+        User.query.filter(User.id.in_(ids[:3])).update({'created_at': None}, synchronize_session=False)
+        db.session.commit()
+        
+        query = User.query.filter(User.email.like('undated%'))
+        seen, cursor = [], None
+        while True:
+            items, cursor = keyset_paginate(query, User.created_at, User.id, 2, cursor)
+            seen.extend(user.id for user in items)
+            if not cursor:
+                break
+        
+        # Dated rows first, then the undated ones newest id first
+        assert seen == sorted(ids[3:], reverse=True) + sorted(ids[:3], reverse=True)
@@ -0,0 +1,46 @@
+import pytest
+from flask import Flask
+from werkzeug.security import generate_password_hash
+
+from utils.passwords import PasswordHasher
+
+@pytest.fixture
+def hasher():
+    app = Flask(__name__)
+    app.config['PASSWORD_HASH_METHOD'] = 'pbkdf2:sha256:600000'
+    hasher = PasswordHasher(app)
+    yield hasher
+    hasher.shutdown()
+
+@pytest.mark.parametrize('stored, expected', [
+    ('pbkdf2:sha256:600000$salt$hash', False),
+    # Stronger than configured: never downgraded
+    ('pbkdf2:sha256:1000000$salt$hash', False),
+    ('pbkdf2:sha256:260000$salt$hash', True),
+    ('pbkdf2:sha512:600000$salt$hash', True),
+    ('pbkdf2:sha256$salt$hash', True),
+    ('scrypt:32768:8:1$salt$hash', True),
+])
+def test_needs_rehash_pbkdf2(hasher, stored, expected):
+    assert hasher.needs_rehash(stored) is expected
+
+@pytest.mark.parametrize('stored, expected', [
+    ('scrypt:32768:8:1$salt$hash', False),
+    ('scrypt:65536:8:1$salt$hash', False),
+    ('scrypt:16384:8:1$salt$hash', True),
+    ('scrypt:32768:4:1$salt$hash', True),
+    ('pbkdf2:sha256:1000000$salt$hash', True),
+])
+def test_needs_rehash_scrypt(hasher, stored, expected):
+    hasher.app.config['PASSWORD_HASH_METHOD'] = 'scrypt:32768:8:1'
+    assert hasher.needs_rehash(stored) is expected
+
+def test_verify_and_upgrade(hasher):
+    hasher.app.config['PASSWORD_HASH_METHOD'] = 'pbkdf2:sha256:2000'
+    weak = generate_password_hash('secret', 'pbkdf2:sha256:1000')
+    strong = generate_password_hash('secret', 'pbkdf2:sha256:3000')
+    
+    valid, new_hash = hasher.verify_and_upgrade(weak, 'secret')
+    assert valid and new_hash.startswith('pbkdf2:sha256:2000$')
+    assert hasher.verify_and_upgrade(strong, 'secret') == (True, None)
+    assert hasher.verify_and_upgrade(weak, 'wrong') == (False, None)
@@ -0,0 +1,75 @@
+import pytest
+
+from models import db, User, Portfolio, Tag, DesignRequest, ContactMessage
+from utils.auth import generate_tokens
+from utils.query_counter import QueryBudgetExceeded, count_queries, query_budget
+
+@pytest.fixture(scope='module')
+def seeded(app):
+    """Enough rows that a per-row query would show up in the counts."""
+    with app.app_context():
+        owner = User(email='budget@example.com', username='budget', password_hash='x')
+        db.session.add(owner)
+        tags = [Tag(name=f'Budget {i}', slug=f'budget-{i}') for i in range(3)]
+        for i in range(5):
+            db.session.add(Portfolio(
+                title=f'Item {i}', category='branding', image_url=f'/static/uploads/{i}.png', tags=tags[:i % 3 + 1]
+            ))
+            db.session.add(DesignRequest(
+                name='Budget', email='budget@example.com', service_type='logo',
+                project_description=f'Request {i}', client=owner
+            ))
+            db.session.add(ContactMessage(name='Budget', email='budget@example.com', message=f'Message {i}'))
+        db.session.commit()
+        return {'Authorization': f'Bearer {generate_tokens(owner)["access_token"]}'}
+
+@pytest.fixture(autouse=True)
+def uncached(app, monkeypatch):
+    # A cache hit runs no statements at all
+    monkeypatch.setitem(app.config, 'RESPONSE_CACHE_ENABLED', False)
+
+def query_count(response):
+    assert response.status_code == 200, response.get_data(as_text=True)
+    return int(response.headers['X-Query-Count'])
+
+@pytest.mark.parametrize('path, expected', [
+    ('/api/services', 1),
+    ('/api/portfolio', 2),
+])
+def test_public_routes(client, seeded, path, expected):
+    assert query_count(client.get(path)) == expected
+
+def test_own_requests(client, seeded):
+    assert query_count(client.get('/api/requests', headers=seeded)) == 1
+
+@pytest.mark.parametrize('path, expected', [
+    ('/api/admin/requests', 1),
+    ('/api/admin/messages', 1),
+    ('/api/admin/dashboard/stats', 3),
+    ('/api/admin/users', 2),
+    ('/api/admin/users?search=budget', 2),
+    ('/api/admin/users?cursor=&with_total=0', 1),
+    ('/api/admin/design-requests', 2),
+    ('/api/admin/audit-logs', 2),
+])
+def test_admin_routes(client, admin_headers, seeded, path, expected):
+    assert query_count(client.get(path, headers=admin_headers)) == expected
+
+def test_user_details(app, client, admin_headers, seeded):
+    with app.app_context():
+        user_id = User.query.filter_by(username='budget').one().id
+    assert query_count(client.get(f'/api/admin/users/{user_id}', headers=admin_headers)) == 3
+
+def test_count_queries(app, seeded):
+    with app.app_context(), count_queries() as queries:
+        User.query.filter_by(is_banned=True).all()
+    assert len(queries) == 1
+
+def test_over_budget_raises_when_testing(app, seeded):
+    @query_budget(1)
+    def view():
+        return str(User.query.count() + Portfolio.query.count())
+    
+    with app.test_request_context():
+        with pytest.raises(QueryBudgetExceeded):
+            view()
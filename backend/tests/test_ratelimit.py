@@ -0,0 +1,50 @@
+from utils.ratelimit import rate_limiter
+
+def test_rate_limit_keys_on_forwarded_client(app, client, monkeypatch):
+    monkeypatch.setitem(app.config, 'RATELIMIT_ENABLED', True)
+    
+    client.post(
+        '/api/auth/login',
+        json={'email': 'nobody@example.com', 'password': 'wrong'},
+        headers={'X-Forwarded-For': '203.0.113.7'},
+        environ_base={'REMOTE_ADDR': '10.0.0.2'}
+    )
+    
+    keys = list(rate_limiter.store._buckets)
+    assert any(key.endswith('ip:203.0.113.7') for key in keys)
+    assert not any('10.0.0.2' in key for key in keys)
+
+def test_only_the_trusted_hop_is_used(app, client, monkeypatch):
+    monkeypatch.setitem(app.config, 'RATELIMIT_ENABLED', True)
+    
+    # A client-supplied X-Forwarded-For is prepended to, never trusted
+    client.post(
+        '/api/auth/login',
+        json={'email': 'nobody@example.com', 'password': 'wrong'},
+        headers={'X-Forwarded-For': '198.51.100.1, 203.0.113.8'},
+        environ_base={'REMOTE_ADDR': '10.0.0.2'}
+    )
+    
+    keys = list(rate_limiter.store._buckets)
+    assert any(key.endswith('ip:203.0.113.8') for key in keys)
+    assert not any('198.51.100.1' in key for key in keys)
+
+def test_database_store_prunes_refilled_buckets(tmp_path, monkeypatch):
+    from utils import ratelimit
+    
+    store = ratelimit.DatabaseStore(f"sqlite:///{tmp_path / 'buckets.db'}")
+    now = [1000.0]
+    monkeypatch.setattr(ratelimit.time, 'time', lambda: now[0])
+    
+    # 2 tokens per 10 seconds: one spent refills in 5s, two in 10s
+    store.consume('one', 0.2, 2)
+    store.consume('two', 0.2, 2)
+    store.consume('two', 0.2, 2)
+    
+    now[0] += 6
+    assert store.prune() == 1
+    now[0] += 5
+    assert store.prune() == 1
+    
+    # A pruned key starts again with a full bucket
+    assert store.consume('two', 0.2, 2) == (True, 0)
@@ -0,0 +1,31 @@
+from models import db, Service
+from utils.search import catalog_index
+
+def test_commit_during_build_is_applied(app, monkeypatch):
+    source = catalog_index._sources[Service]
+    document = source.document
+    committed = []
+    
+    def document_and_commit(obj):
+        if not committed:
+            # Another request commits after the build has read the table
+            committed.append(True)
+            session = db.Session(db.engine)
+            session.add(Service(title='Lettering', title_ar='Lettering', description='-', description_ar='-'))
+            session.commit()
+            session.close()
+        return document(obj)
+    monkeypatch.setattr(source, 'document', document_and_commit)
+    
+    with app.app_context():
+        catalog_index.build()
+    
+    assert committed
+    assert [r['title'] for r in catalog_index.search('lettering')['results']] == ['Lettering']
+
+def test_search_limit_is_at_least_one(client):
+    for limit in (-5, 0):
+        response = client.get(f'/api/search?type=service&limit={limit}')
+        
+        assert response.status_code == 200
+        assert len(response.get_json()['results']) == 1
@@ -0,0 +1,13 @@
+from flask import jsonify
+
+def test_json_is_compact_unless_pretty_printing(app, monkeypatch):
+    with app.test_request_context('/'):
+        assert jsonify({'b': 1, 'a': [1]}).get_data(as_text=True).strip() == '{"a":[1],"b":1}'
+        
+        monkeypatch.setattr(app.json, 'compact', False)
+        assert jsonify({'b': 1, 'a': [1]}).get_data(as_text=True).strip() == '{\n  "a": [\n    1\n  ],\n  "b": 1\n}'
+        
+        # Flask's default: indented in debug mode
+        monkeypatch.setattr(app.json, 'compact', None)
+        monkeypatch.setattr(app, 'debug', True)
+        assert '\n  "a"' in jsonify({'a': 1}).get_data(as_text=True)
@@ -0,0 +1,11 @@
+from utils import settings
+
+def test_public_settings_etag_follows_defaults(client, monkeypatch):
+    etag = client.get('/api/settings/public').headers['ETag']
+    assert client.get('/api/settings/public', headers={'If-None-Match': etag}).status_code == 304
+    
+    # A deploy that changes a default must not be answered with 304
+    monkeypatch.setattr(settings, 'DEFAULTS_DIGEST', 'changed')
+    response = client.get('/api/settings/public', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
@@ -0,0 +1,52 @@
+import time
+
+from models import db, User
+from utils.auth import generate_tokens
+from utils.revocation import token_revocations
+
+def _login(app, username):
+    with app.app_context():
+        user = User(email=f'{username}@example.com', username=username, password_hash='x', is_admin=True, user_role='teacher')
+        db.session.add(user)
+        db.session.commit()
+        return user.id, generate_tokens(user)
+
+def test_refresh_rebuilds_claims_from_user(app, client):
+    user_id, tokens = _login(app, 'demoted')
+    
+    with app.app_context():
+        user = db.session.get(User, user_id)
+        user.is_admin = False
+        db.session.commit()
+    
+    response = client.post('/api/auth/refresh', headers={'Authorization': f'Bearer {tokens["refresh_token"]}'})
+    assert response.status_code == 200
+    
+    access = response.get_json()['access_token']
+    response = client.get('/api/admin/users', headers={'Authorization': f'Bearer {access}'})
+    assert response.status_code == 403
+
+def test_refresh_rejects_banned_user(app, client):
+    user_id, tokens = _login(app, 'refreshbanned')
+    
+    with app.app_context():
+        db.session.get(User, user_id).is_banned = True
+        db.session.commit()
+    
+    response = client.post('/api/auth/refresh', headers={'Authorization': f'Bearer {tokens["refresh_token"]}'})
+    assert response.status_code == 401
+
+def test_role_change_cutoff_reaches_other_workers(app, client, admin_headers, monkeypatch):
+    user_id, tokens = _login(app, 'rolechange')
+    time.sleep(1)  # iat has one-second resolution
+    
+    response = client.put(f'/api/admin/users/{user_id}', json={'user_role': 'student'}, headers=admin_headers)
+    assert response.status_code == 200
+    
+    # Another worker has no local cut-off and learns it from the database
+    monkeypatch.setattr(token_revocations, '_not_before', {})
+    monkeypatch.setattr(token_revocations, '_loaded_at', None)
+    
+    response = client.post('/api/auth/refresh', headers={'Authorization': f'Bearer {tokens["refresh_token"]}'})
+    assert response.status_code == 401
+    assert str(user_id) in token_revocations._not_before
@@ -0,0 +1,161 @@
+import hashlib
+import io
+import os
+
+import pytest
+from PIL import Image
+
+import app as app_module
+from utils.images import strip_metadata
+
+GPS_IFD = 0x8825
+ORIENTATION = 0x0112
+
+def photo(orientation=1):
+    """A small JPEG carrying camera, GPS and XMP metadata."""
+    exif = Image.Exif()
+    exif[0x010F] = 'PhoneMaker'
+    exif[ORIENTATION] = orientation
+    exif[GPS_IFD] = {1: 'N', 2: (48.0, 51.0, 24.0)}
+    buffer = io.BytesIO()
+    Image.new('RGB', (60, 30), 'navy').save(
+        buffer, 'JPEG', exif=exif.tobytes(), xmp=b'<x:xmpmeta>GPSLatitude</x:xmpmeta>'
+    )
+    return buffer.getvalue()
+
+@pytest.fixture
+def upload_root(app, tmp_path, monkeypatch):
+    monkeypatch.setitem(app.config, 'UPLOAD_FOLDER', str(tmp_path))
+    # Variants are not under test here
+    monkeypatch.setattr(app_module, 'submit_image_processing', lambda *args, **kwargs: None)
+    return tmp_path
+
+def stored_bytes(upload_root, path):
+    with open(os.path.join(upload_root, path), 'rb') as stored:
+        return stored.read()
+
+def test_upload_strips_exif_and_gps(client, admin_headers, upload_root):
+    response = client.post(
+        '/api/upload',
+        data={'file': (io.BytesIO(photo()), 'holiday.jpg')},
+        headers=admin_headers
+    )
+    
+    assert response.status_code == 200
+    path = response.get_json()['filename']
+    data = stored_bytes(upload_root, path)
+    assert b'PhoneMaker' not in data and b'GPSLatitude' not in data
+    with Image.open(io.BytesIO(data)) as image:
+        assert not image.getexif()
+        assert image.size == (60, 30)
+    
+    # Addressed by the sanitized content, so re-uploads still deduplicate
+    assert hashlib.sha256(data).hexdigest() in path
+    again = client.post('/api/upload', data={'file': (io.BytesIO(photo()), 'again.jpg')}, headers=admin_headers)
+    assert again.get_json()['filename'] == path
+    assert again.get_json()['duplicate'] is True
+
+def test_upload_applies_orientation(client, admin_headers, upload_root):
+    response = client.post(
+        '/api/upload',
+        data={'file': (io.BytesIO(photo(orientation=6)), 'rotated.jpg')},
+        headers=admin_headers
+    )
+    
+    with Image.open(io.BytesIO(stored_bytes(upload_root, response.get_json()['filename']))) as image:
+        assert image.size == (30, 60)
+        assert ORIENTATION not in image.getexif()
+
+def test_upload_rejects_invalid_image(client, admin_headers, upload_root):
+    response = client.post(
+        '/api/upload',
+        data={'file': (io.BytesIO(b'not an image'), 'fake.png')},
+        headers=admin_headers
+    )
+    
+    assert response.status_code == 400
+    assert not any(name for _, _, names in os.walk(upload_root) for name in names)
+
+def test_chunked_upload_strips_metadata(app, client, admin_headers, upload_root, tmp_path, monkeypatch):
+    monkeypatch.setattr(app_module, 'chunked_upload_root', lambda: str(tmp_path / 'chunks'))
+    data = photo()
+    
+    upload = client.post('/api/uploads', json={'filename': 'brief.jpg', 'size': len(data)}, headers=admin_headers)
+    upload_id = upload.get_json()['upload_id']
+    client.put(f'/api/uploads/{upload_id}/chunks/0', data=data, headers=admin_headers)
+    response = client.post(f'/api/uploads/{upload_id}/complete', headers=admin_headers)
+    
+    assert response.status_code == 200
+    stored = stored_bytes(upload_root, response.get_json()['filename'])
+    assert b'PhoneMaker' not in stored and b'GPSLatitude' not in stored
+
+def test_strip_metadata_keeps_jpeg_data_unchanged(tmp_path):
+    data = photo()
+    path = tmp_path / 'photo.jpg'
+    path.write_bytes(data)
+    
+    strip_metadata(str(path))
+    
+    stripped = path.read_bytes()
+    assert b'PhoneMaker' not in stripped and b'GPSLatitude' not in stripped
+    # Not re-encoded: the compressed scan is byte for byte the original
+    scan = data[data.index(b'\xff\xda'):]
+    assert stripped.endswith(scan)
+
+@pytest.mark.parametrize('image_format', ['PNG', 'WEBP'])
+def test_strip_metadata_drops_exif_and_text_chunks(tmp_path, image_format):
+    exif = Image.Exif()
+    exif[0x010F] = 'PhoneMaker'
+    options = {'exif': exif.tobytes()}
+    if image_format == 'PNG':
+        from PIL.PngImagePlugin import PngInfo
+        options['pnginfo'] = PngInfo()
+        options['pnginfo'].add_text('Comment', 'GPSLatitude')
+    else:
+        options.update(xmp=b'<x:xmpmeta>GPSLatitude</x:xmpmeta>', lossless=True)
+    original = Image.new('RGB', (20, 10), 'teal')
+    path = tmp_path / f'image.{image_format.lower()}'
+    original.save(path, image_format, **options)
+    
+    strip_metadata(str(path))
+    
+    stripped = path.read_bytes()
+    assert b'PhoneMaker' not in stripped and b'GPSLatitude' not in stripped
+    with Image.open(path) as image:
+        assert not image.getexif()
+        assert image.convert('RGB').tobytes() == original.tobytes()
+
+
+def test_design_request_only_accepts_stored_upload_urls(client, admin_headers, upload_root):
+    url = client.post(
+        '/api/upload',
+        data={'file': (io.BytesIO(photo()), 'reference.jpg')},
+        headers=admin_headers
+    ).get_json()['url']
+    request = {'name': 'Client', 'email': 'client@example.com', 'service_type': 'logo', 'project_description': 'Brief'}
+    
+    accepted = client.post('/api/requests', json=dict(request, reference_files=[url]))
+    assert accepted.status_code == 201
+    
+    digest = url.rsplit('/', 1)[1].split('.')[0]
+    unknown = url.replace(digest, 'f' * 64).replace(f'/{digest[:2]}/{digest[2:4]}/', '/ff/ff/')
+    for reference in (f'https://attacker.example{url}', unknown, url.replace(f'/{digest[:2]}/', '/00/')):
+        rejected = client.post('/api/requests', json=dict(request, reference_files=[reference]))
+        assert rejected.status_code == 400, reference
+
+def test_chunked_uploads_are_capped_per_user(app, client, admin_headers, tmp_path, monkeypatch):
+    monkeypatch.setattr(app_module, 'chunked_upload_root', lambda: str(tmp_path / 'chunks'))
+    monkeypatch.setitem(app.config, 'UPLOAD_MAX_SESSIONS', 2)
+    monkeypatch.setitem(app.config, 'UPLOAD_MAX_RESERVED', 1000)
+    
+    def start(size):
+        return client.post('/api/uploads', json={'filename': 'brief.pdf', 'size': size}, headers=admin_headers)
+    
+    assert start(600).status_code == 201
+    assert start(500).status_code == 429
+    assert start(400).status_code == 201
+    assert start(1).status_code == 429
+    
+    # Abandoned sessions stop counting once they expire
+    monkeypatch.setitem(app.config, 'UPLOAD_SESSION_TTL', -1)
+    assert start(1000).status_code == 201
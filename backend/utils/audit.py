@@ -0,0 +1,178 @@
+from datetime import datetime
+import atexit
+import os
+import queue
+import threading
+import time
+
+class AuditWriter:
+    """Background writer that batches audit log entries.
+
+    log_user_action enqueues plain dicts on a bounded in-memory queue; a
+    daemon thread inserts them with one executemany per batch, flushing when
+    AUDIT_BATCH_SIZE entries are waiting or AUDIT_FLUSH_INTERVAL seconds
+    have passed. When the queue is full AUDIT_QUEUE_POLICY decides what
+    happens: 'block' waits up to AUDIT_BLOCK_TIMEOUT seconds and then writes
+    synchronously, 'sync' writes synchronously at once and 'drop' discards
+    the entry. Pending entries are flushed at interpreter shutdown.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._queue = None
+        self._thread = None
+        self._pid = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self.written = 0
+        self.dropped = 0
+        self.flushes = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('AUDIT_ASYNC', True)
+        app.config.setdefault('AUDIT_QUEUE_SIZE', 10000)
+        app.config.setdefault('AUDIT_BATCH_SIZE', 100)
+        app.config.setdefault('AUDIT_FLUSH_INTERVAL', 2.0)
+        app.config.setdefault('AUDIT_QUEUE_POLICY', 'block')
+        app.config.setdefault('AUDIT_BLOCK_TIMEOUT', 1.0)
+        app.extensions['audit_writer'] = self
+        self.app = app
+        atexit.register(self.shutdown)
+
+    def _ensure_started(self):
+        # Started lazily, and again after a fork, so preloaded gunicorn
+        # workers each get their own thread
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._queue = queue.Queue(maxsize=self.app.config['AUDIT_QUEUE_SIZE'])
+            self._stop.clear()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='audit-writer', daemon=True)
+            self._thread.start()
+
+    def enqueue(self, entry):
+        """Queue an audit log row (a dict of AuditLog column values)."""
+        if self.app is None or not self.app.config['AUDIT_ASYNC']:
+            self._write([entry])
+            return
+
+        self._ensure_started()
+        policy = self.app.config['AUDIT_QUEUE_POLICY']
+        try:
+            if policy == 'block':
+                self._queue.put(entry, timeout=self.app.config['AUDIT_BLOCK_TIMEOUT'])
+            else:
+                self._queue.put_nowait(entry)
+        except queue.Full:
+            if policy == 'drop':
+                self.dropped += 1
+            else:
+                self._write([entry])
+
+    def _run(self):
+        batch_size = self.app.config['AUDIT_BATCH_SIZE']
+        interval = self.app.config['AUDIT_FLUSH_INTERVAL']
+        batch = []
+        deadline = time.monotonic() + interval
+
+        while not self._stop.is_set() or not self._queue.empty():
+            timeout = 0 if self._stop.is_set() else max(0.0, deadline - time.monotonic())
+            try:
+                batch.append(self._queue.get(timeout=timeout))
+            except queue.Empty:
+                pass
+
+            if len(batch) >= batch_size or time.monotonic() >= deadline or self._stop.is_set():
+                if batch:
+                    self._flush(batch)
+                    batch = []
+                deadline = time.monotonic() + interval
+
+        if batch:
+            self._flush(batch)
+
+    def _flush(self, batch):
+        with self.app.app_context():
+            try:
+                self._write(batch)
+                return
+            except Exception as e:
+                if len(batch) == 1:
+                    self.dropped += 1
+                    self.app.logger.error(f"Audit log flush failed: {str(e)}")
+                    return
+                self.app.logger.warning(f"Audit log batch failed, retrying row by row: {str(e)}")
+
+            # One bad entry must not take the rest of the batch with it
+            for row in batch:
+                try:
+                    self._write([row])
+                except Exception as e:
+                    self.dropped += 1
+                    self.app.logger.error(f"Audit log entry dropped ({row.get('action')}): {str(e)}")
+
+    def _write(self, rows):
+        """Insert rows in a single statement and transaction."""
+        from models import AuditLog, db
+
+        table = AuditLog.__table__
+        rows = [_fit_columns(table, row) for row in rows]
+        started = time.perf_counter()
+        with db.engine.begin() as connection:
+            connection.execute(table.insert(), rows)
+        elapsed = (time.perf_counter() - started) * 1000
+
+        self.written += len(rows)
+        self.flushes += 1
+        self.last_flush_ms = elapsed
+        self.max_flush_ms = max(self.max_flush_ms, elapsed)
+
+    def shutdown(self, timeout=5.0):
+        """Stop the writer thread after flushing everything queued."""
+        if self._thread is None or self._pid != os.getpid():
+            return
+        self._stop.set()
+        self._thread.join(timeout)
+        self._thread = None
+
+    def metrics(self):
+        """Return queue depth and flush statistics."""
+        return {
+            'queue_depth': self._queue.qsize() if self._queue is not None else 0,
+            'written': self.written,
+            'dropped': self.dropped,
+            'flushes': self.flushes,
+            'last_flush_ms': round(self.last_flush_ms, 2),
+            'max_flush_ms': round(self.max_flush_ms, 2)
+        }
+
+def _fit_columns(table, row):
+    """Truncate string values to their column's length."""
+    fitted = dict(row)
+    for name, value in row.items():
+        length = getattr(table.c[name].type, 'length', None) if name in table.c else None
+        if length and isinstance(value, str) and len(value) > length:
+            fitted[name] = value[:length]
+    return fitted
+
+def build_audit_entry(user_id, action, resource_type=None, resource_id=None, details=None, request=None):
+    """Capture an audit row while the request is still available."""
+    return {
+        'user_id': user_id,
+        'action': action,
+        'resource_type': resource_type,
+        'resource_id': resource_id,
+        'details': details,
+        'ip_address': request.remote_addr if request else None,
+        'user_agent': request.user_agent.string if request else None,
+        'created_at': datetime.utcnow()
+    }
+
+audit_writer = AuditWriter()
@@ -1,32 +1,49 @@
 from functools import wraps
 from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity, get_jwt, create_access_token, create_refresh_token
-from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import timedelta
 import secrets
 import string
 from flask import jsonify, current_app
 import requests
-from google.oauth2 import id_token
-from google.auth.transport import requests as google_requests
+from utils.google_certs import google_certs
+from utils.passwords import password_hasher
 
 def hash_password(password):
-    """Hash a password for storing."""
-    return generate_password_hash(password, method='pbkdf2:sha256')
+    """Hash a password for storing. Raises HasherBusy when overloaded."""
+    return password_hasher.hash(password)
 
 def verify_password(stored_password, provided_password):
-    """Check a stored password against a provided password."""
-    return check_password_hash(stored_password, provided_password)
+    """Check a stored password against a provided password. Raises HasherBusy when overloaded."""
+    return password_hasher.verify(stored_password, provided_password)
 
-def generate_tokens(identity, is_admin=False, user_role=None, additional_claims=None):
-    """Generate access and refresh tokens."""
-    claims = {
-        'is_admin': is_admin,
-        'user_role': user_role
+def user_claims(user):
+    """Claims carried in a user's tokens so views can authorize without a query."""
+    return {
+        'is_admin': bool(user.is_admin),
+        'user_role': getattr(user, 'user_role', None)
     }
+
+def generate_tokens(identity, is_admin=False, user_role=None, additional_claims=None):
+    """Generate access and refresh tokens.
+    
+    identity may be a User, whose id becomes the subject and whose admin
+    flag and role become claims, or a user id with explicit claims.
+    """
+    if hasattr(identity, 'id'):
+        claims = user_claims(identity)
+        identity = identity.id
+    else:
+        claims = {
+            'is_admin': is_admin,
+            'user_role': user_role
+        }
     
     if additional_claims:
         claims.update(additional_claims)
     
+    # JWT subjects must be strings; current_user_id() converts back
+    identity = str(identity)
+    
     access_token = create_access_token(
         identity=identity,
         expires_delta=timedelta(hours=24),
@@ -45,6 +62,11 @@ def generate_tokens(identity, is_admin=False, user_role=None, additional_claims=
         'token_type': 'Bearer'
     }
 
+def current_user_id():
+    """The verified token's user id as an int, or None without a token."""
+    identity = get_jwt_identity()
+    return int(identity) if identity is not None else None
+
 def admin_required(f):
     """Decorator to require admin privileges."""
     @wraps(f)
@@ -105,12 +127,8 @@ def verify_google_token(token):
         if not client_id:
             return None, 'Google OAuth not configured'
         
-        # Verify the token with Google
-        idinfo = id_token.verify_oauth2_token(
-            token, 
-            google_requests.Request(), 
-            client_id
-        )
+        # Verify the signature locally against the cached Google certificates
+        idinfo = google_certs.verify(token, client_id)
         
         # Token is valid, extract user information
         if idinfo['iss'] not in ['accounts.google.com', 'https://accounts.google.com']:
@@ -166,7 +184,7 @@ def exchange_google_code(code):
         return None, 'Google OAuth not configured'
     
     # Exchange code for tokens
-    token_url = 'https://oauth2.googleapis.com/token'
+    token_url = current_app.config['GOOGLE_TOKEN_URL']
     
     data = {
         'code': code,
@@ -177,7 +195,7 @@ def exchange_google_code(code):
     }
     
     try:
-        response = requests.post(token_url, data=data)
+        response = google_certs.session.post(token_url, data=data, timeout=current_app.config['GOOGLE_HTTP_TIMEOUT'])
         response.raise_for_status()
         
         tokens = response.json()
@@ -235,20 +253,14 @@ def check_user_permissions(user_id, resource_type, action):
     return False
 
 def log_user_action(user_id, action, resource_type=None, resource_id=None, details=None, request=None):
-    """Log user actions for audit trail."""
-    from models import AuditLog, db
-    
-    log_entry = AuditLog(
-        user_id=user_id,
-        action=action,
-        resource_type=resource_type,
-        resource_id=resource_id,
-        details=details,
-        ip_address=request.remote_addr if request else None,
-        user_agent=request.user_agent.string if request else None
-    )
+    """Log user actions for audit trail.
+    
+    The entry is queued for the background audit writer, so the calling
+    request does not pay for a second transaction.
+    """
+    from utils.audit import audit_writer, build_audit_entry
     
-    db.session.add(log_entry)
-    db.session.commit()
+    log_entry = build_audit_entry(user_id, action, resource_type, resource_id, details, request)
+    audit_writer.enqueue(log_entry)
     
-    return log_entry
\ No newline at end of file
+    return log_entry
@@ -0,0 +1,263 @@
+from functools import wraps
+from collections import OrderedDict
+from flask import request, current_app, make_response
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+import hashlib
+import threading
+import time
+import uuid
+
+class _CacheEntry:
+    """A serialized response body held by the cache.
+
+    encoded keeps the compressed variants of body, one per content coding,
+    built the first time a client accepting that coding is served.
+    """
+    __slots__ = ('namespace', 'body', 'mimetype', 'etag', 'last_modified',
+                 'created_at', 'expires_at', 'size', 'encoded')
+
+    def __init__(self, namespace, body, mimetype, etag, expires_at):
+        self.namespace = namespace
+        self.body = body
+        self.mimetype = mimetype
+        self.etag = etag
+        self.created_at = time.time()
+        self.last_modified = self.created_at
+        self.expires_at = expires_at
+        self.size = len(body)
+        self.encoded = {}
+
+class ResponseCache:
+    """Per-process cache of serialized GET responses.
+
+    Entries are keyed by namespace, path and query args, expire after a TTL
+    and are evicted least-recently-used once the memory cap is reached.
+    Writes to watched models invalidate their namespaces when the session
+    commits. Responses carry an ETag derived from the namespace's
+    invalidation counter rather than the body, so If-None-Match is answered
+    with a 304 before the view runs, whether or not the entry is still
+    cached. Each worker keeps its own cache and counters, so ETags embed a
+    per-process token and change every TTL window; the TTL bounds how long
+    another worker can serve a response, or a 304, that predates a write.
+    """
+
+    def __init__(self, app=None):
+        self._entries = OrderedDict()
+        self._watched = {}
+        self._generations = {}
+        self._lock = threading.Lock()
+        self._size = 0
+        # ETags from another process or before a restart never match
+        self._epoch = uuid.uuid4().hex[:8]
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._listening = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('RESPONSE_CACHE_ENABLED', True)
+        app.config.setdefault('RESPONSE_CACHE_TTL', 300)
+        app.config.setdefault('RESPONSE_CACHE_MAX_BYTES', 8 * 1024 * 1024)
+        app.extensions['response_cache'] = self
+        self._listen()
+
+    def _listen(self):
+        if self._listening:
+            return
+        event.listen(Session, 'after_flush', self._after_flush)
+        event.listen(Session, 'after_commit', self._after_commit)
+        event.listen(Session, 'after_soft_rollback', self._after_rollback)
+        self._listening = True
+
+    def watch(self, model, *namespaces):
+        """Invalidate the given namespaces whenever a row of model is written."""
+        self._watched.setdefault(model, set()).update(namespaces)
+        self._listen()
+
+    def _after_flush(self, session, flush_context):
+        pending = session.info.setdefault('response_cache_pending', set())
+        for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+            pending.update(self._watched.get(type(obj), ()))
+
+    def _after_commit(self, session):
+        pending = session.info.pop('response_cache_pending', None)
+        if pending:
+            self.invalidate(*pending)
+
+    def _after_rollback(self, session, previous_transaction):
+        session.info.pop('response_cache_pending', None)
+
+    def invalidate(self, *namespaces):
+        """Drop every entry belonging to the given namespaces."""
+        with self._lock:
+            for namespace in namespaces:
+                self._generations[namespace] = self._generations.get(namespace, 0) + 1
+            for key in [k for k, e in self._entries.items() if e.namespace in namespaces]:
+                self._size -= self._entries.pop(key).size
+            self.invalidations += 1
+
+    def clear(self):
+        """Drop every entry."""
+        with self._lock:
+            for namespace in {e.namespace for e in self._entries.values()}:
+                self._generations[namespace] = self._generations.get(namespace, 0) + 1
+            self._entries.clear()
+            self._size = 0
+
+    def _get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry.expires_at <= time.time():
+                # Left in place so an unchanged rebuild keeps its Last-Modified
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def _set(self, key, entry, generation):
+        max_bytes = current_app.config['RESPONSE_CACHE_MAX_BYTES']
+        if entry.size > max_bytes:
+            return False
+        with self._lock:
+            # A write committed while the response was being built
+            if self._generations.get(entry.namespace, 0) != generation:
+                return False
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= old.size
+                if old.body == entry.body:
+                    entry.last_modified = old.last_modified
+            self._entries[key] = entry
+            self._size += entry.size
+            while self._size > max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= evicted.size
+                self.evictions += 1
+        return True
+
+    def _etag(self, key, generation, window):
+        """Version stamp for key: changes on invalidation and each TTL window."""
+        stamp = repr((self._epoch, key, generation, window)).encode()
+        return hashlib.sha1(stamp).hexdigest()
+
+    def _encoded(self, key, entry, compressor, encoding):
+        """entry's body in encoding, compressed once and kept with the entry."""
+        body = entry.encoded.get(encoding)
+        if body is not None:
+            return body
+
+        body = compressor.encode(entry.body, encoding)
+        with self._lock:
+            if encoding not in entry.encoded:
+                entry.encoded[encoding] = body
+                entry.size += len(body)
+                if self._entries.get(key) is entry:
+                    self._size += len(body)
+        return body
+
+    def _cache_headers(self, response, status, private):
+        # Responses behind authentication must not be stored by shared caches
+        if private:
+            response.cache_control.private = True
+        else:
+            response.cache_control.public = True
+        response.cache_control.no_cache = True
+        response.headers['X-Cache'] = status
+
+    def _build_response(self, key, entry, status, private=False):
+        body = entry.body
+        encoding = None
+        compressor = current_app.extensions.get('response_compressor')
+        if compressor is not None and key is not None:
+            encoding = compressor.encoding_for(entry.mimetype, len(entry.body))
+            if encoding is not None:
+                body = self._encoded(key, entry, compressor, encoding)
+
+        response = current_app.response_class(body, mimetype=entry.mimetype)
+        if encoding is not None:
+            response.headers['Content-Encoding'] = encoding
+        response.set_etag(entry.etag)
+        response.last_modified = entry.last_modified
+        response.age = int(time.time() - entry.created_at)
+        self._cache_headers(response, status, private)
+        return response.make_conditional(request)
+
+    def _not_modified(self, etag, private):
+        # Cached views serve JSON; lets the compressor weaken the ETag as on a 200
+        response = current_app.response_class(status=304, mimetype='application/json')
+        response.set_etag(etag)
+        self._cache_headers(response, 'HIT', private)
+        return response
+
+    def cached(self, namespace, ttl=None, private=False):
+        """Decorator caching successful responses of a GET view.
+
+        ttl overrides RESPONSE_CACHE_TTL and may be a callable evaluated per
+        request, e.g. to read another config key. Set private=True for views
+        that require authentication, so proxies and CDNs do not store the
+        response; it is still shared by every caller in this process, so
+        only use it for responses that do not depend on who is asking.
+        """
+        def decorator(f):
+            @wraps(f)
+            def decorated_function(*args, **kwargs):
+                enabled = current_app.config['RESPONSE_CACHE_ENABLED']
+                key = (namespace, request.path, tuple(sorted(request.args.items(multi=True))))
+                if ttl is None:
+                    entry_ttl = current_app.config['RESPONSE_CACHE_TTL']
+                else:
+                    entry_ttl = ttl() if callable(ttl) else ttl
+
+                generation = self._generations.get(namespace, 0)
+                if enabled:
+                    # Entries end with their TTL window so they never outlive their ETag
+                    window = int(time.time() // entry_ttl) if entry_ttl > 0 else time.time()
+                    etag = self._etag(key, generation, window)
+                    if request.if_none_match.contains_weak(etag):
+                        with self._lock:
+                            self.not_modified += 1
+                        return self._not_modified(etag, private)
+
+                    entry = self._get(key)
+                    if entry is not None and entry.etag == etag:
+                        return self._build_response(key, entry, 'HIT', private)
+
+                response = make_response(f(*args, **kwargs))
+                if response.status_code != 200 or response.direct_passthrough:
+                    return response
+
+                body = response.get_data()
+                if not enabled:
+                    entry = _CacheEntry(namespace, body, response.mimetype, hashlib.sha1(body).hexdigest(), 0)
+                    return self._build_response(None, entry, 'MISS', private)
+
+                expires_at = (window + 1) * entry_ttl if entry_ttl > 0 else 0
+                entry = _CacheEntry(namespace, body, response.mimetype, etag, expires_at)
+                self._set(key, entry, generation)
+                return self._build_response(key, entry, 'MISS', private)
+            return decorated_function
+        return decorator
+
+    def stats(self):
+        """Return hit/miss counters and current memory usage."""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'not_modified': self.not_modified,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'entries': len(self._entries),
+                'bytes': self._size
+            }
+
+response_cache = ResponseCache()
@@ -0,0 +1,222 @@
+"""
+Resumable chunked uploads.
+
+A client opens an upload with the file's name, size and optionally its
+SHA-256, then PUTs fixed-size chunks by index in any order, retrying any
+that fail, and finally asks for the upload to be completed. Each chunk is
+a short request streamed straight to its offset in a preallocated file, so
+memory use is bounded by CHUNK_SIZE and no worker is held for the whole
+transfer. Completed files are verified and moved into content-addressed
+storage.
+
+Sessions live on disk under the instance folder:
+
+    chunked_uploads/<upload_id>/meta.json   declared name, size, owner
+    chunked_uploads/<upload_id>/data        the file being assembled
+    chunked_uploads/<upload_id>/chunks/<n>  sha256 of each received chunk
+"""
+from datetime import datetime
+import hashlib
+import json
+import os
+import re
+import secrets
+import shutil
+import time
+
+from utils.storage import CHUNK_SIZE, file_sha256, move_to_storage
+
+_UPLOAD_ID = re.compile(r'^[0-9a-f]{32}$')
+_SHA256 = re.compile(r'^[0-9a-f]{64}$')
+
+class UploadLimitExceeded(ValueError):
+    """A user already holds as many open sessions or reserved bytes as allowed."""
+
+class ChunkedUpload:
+    """An upload session stored on disk."""
+
+    def __init__(self, directory, meta):
+        self.directory = directory
+        self.meta = meta
+
+    @property
+    def upload_id(self):
+        return self.meta['upload_id']
+
+    @property
+    def chunk_count(self):
+        return max(1, -(-self.meta['size'] // self.meta['chunk_size']))
+
+    @classmethod
+    def create(cls, root, user_id, filename, size, chunk_size, sha256=None, max_sessions=None, max_bytes=None):
+        """Open a session and preallocate the file being assembled.
+
+        max_sessions and max_bytes cap the sessions a user may have open at
+        once and the disk space they reserve between them; going over
+        raises UploadLimitExceeded.
+        """
+        if sha256 is not None and not _SHA256.match(sha256):
+            raise ValueError('sha256 must be a lowercase hex digest')
+
+        if max_sessions is not None or max_bytes is not None:
+            sizes = [meta['size'] for meta in open_uploads(root, user_id)]
+            if max_sessions is not None and len(sizes) >= max_sessions:
+                raise UploadLimitExceeded(f'At most {max_sessions} uploads may be open at once')
+            if max_bytes is not None and sum(sizes) + size > max_bytes:
+                raise UploadLimitExceeded(f'Open uploads may reserve at most {max_bytes} bytes')
+
+        upload_id = secrets.token_hex(16)
+        directory = os.path.join(root, upload_id)
+        os.makedirs(os.path.join(directory, 'chunks'))
+
+        meta = {
+            'upload_id': upload_id,
+            'user_id': user_id,
+            'filename': filename,
+            'extension': filename.rsplit('.', 1)[1].lower(),
+            'size': size,
+            'chunk_size': chunk_size,
+            'sha256': sha256,
+            'created_at': datetime.utcnow().isoformat()
+        }
+        with open(os.path.join(directory, 'data'), 'wb') as data:
+            data.truncate(size)
+        with open(os.path.join(directory, 'meta.json'), 'w') as meta_file:
+            json.dump(meta, meta_file)
+
+        return cls(directory, meta)
+
+    @classmethod
+    def load(cls, root, upload_id, user_id):
+        """Return the session, or raise LookupError if it is unknown to user_id."""
+        directory = os.path.join(root, upload_id)
+        if not _UPLOAD_ID.match(upload_id) or not os.path.isdir(directory):
+            raise LookupError('Upload not found')
+
+        with open(os.path.join(directory, 'meta.json')) as meta_file:
+            meta = json.load(meta_file)
+        if meta['user_id'] != user_id:
+            raise LookupError('Upload not found')
+
+        return cls(directory, meta)
+
+    def _chunk_marker(self, index):
+        return os.path.join(self.directory, 'chunks', str(index))
+
+    def received(self):
+        """Indexes of the chunks stored so far."""
+        return sorted(int(name) for name in os.listdir(os.path.join(self.directory, 'chunks')) if name.isdigit())
+
+    def write_chunk(self, index, stream, expected_sha256=None):
+        """Stream one chunk into place.
+
+        Re-sending a chunk overwrites it, so a client that is unsure
+        whether a PUT arrived can simply retry it.
+        """
+        if not 0 <= index < self.chunk_count:
+            raise ValueError(f'Chunk index must be between 0 and {self.chunk_count - 1}')
+
+        offset = index * self.meta['chunk_size']
+        expected_length = min(self.meta['chunk_size'], self.meta['size'] - offset)
+        marker = self._chunk_marker(index)
+        if os.path.exists(marker):
+            os.remove(marker)
+
+        hasher = hashlib.sha256()
+        length = 0
+        with open(os.path.join(self.directory, 'data'), 'r+b') as data:
+            data.seek(offset)
+            while True:
+                piece = stream.read(min(CHUNK_SIZE, expected_length + 1 - length))
+                if not piece:
+                    break
+                length += len(piece)
+                if length > expected_length:
+                    raise ValueError(f'Chunk {index} must be {expected_length} bytes')
+                hasher.update(piece)
+                data.write(piece)
+
+        if length != expected_length:
+            raise ValueError(f'Chunk {index} must be {expected_length} bytes, got {length}')
+
+        digest = hasher.hexdigest()
+        if expected_sha256 and expected_sha256.lower() != digest:
+            raise ValueError(f'Chunk {index} checksum mismatch')
+
+        # Marker written last and atomically: it only exists for complete chunks
+        with open(marker + '.tmp', 'w') as marker_file:
+            marker_file.write(digest)
+        os.replace(marker + '.tmp', marker)
+
+    def complete(self, upload_root, sanitize=None):
+        """Verify the assembled file and move it into upload storage.
+
+        sanitize is applied after the checksum is verified, as in
+        stream_to_storage. Returns the stream_to_storage tuple. The session
+        is removed.
+        """
+        missing = sorted(set(range(self.chunk_count)) - set(self.received()))
+        if missing:
+            raise ValueError(f'Missing chunks: {missing[:20]}')
+
+        data_path = os.path.join(self.directory, 'data')
+        digest = file_sha256(data_path)
+        if self.meta['sha256'] and self.meta['sha256'] != digest:
+            raise ValueError('File checksum mismatch')
+
+        if sanitize is not None:
+            sanitize(data_path)
+            digest = None
+
+        result = move_to_storage(data_path, upload_root, self.meta['extension'], digest)
+        self.discard()
+        return result
+
+    def discard(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def status(self):
+        received = self.received()
+        return {
+            'upload_id': self.upload_id,
+            'filename': self.meta['filename'],
+            'size': self.meta['size'],
+            'chunk_size': self.meta['chunk_size'],
+            'chunk_count': self.chunk_count,
+            'received': received,
+            'complete': len(received) == self.chunk_count
+        }
+
+def open_uploads(root, user_id):
+    """Metadata of the sessions user_id has open."""
+    if not os.path.isdir(root):
+        return []
+
+    uploads = []
+    for upload_id in os.listdir(root):
+        try:
+            with open(os.path.join(root, upload_id, 'meta.json')) as meta_file:
+                meta = json.load(meta_file)
+        except (OSError, ValueError):
+            continue
+        if meta.get('user_id') == user_id:
+            uploads.append(meta)
+    return uploads
+
+def expire_uploads(root, ttl):
+    """Remove sessions untouched for ttl seconds. Returns the number removed."""
+    if not os.path.isdir(root):
+        return 0
+
+    cutoff = time.time() - ttl
+    removed = 0
+    for upload_id in os.listdir(root):
+        directory = os.path.join(root, upload_id)
+        chunks = os.path.join(directory, 'chunks')
+        try:
+            if os.path.getmtime(chunks if os.path.isdir(chunks) else directory) < cutoff:
+                shutil.rmtree(directory, ignore_errors=True)
+                removed += 1
+        except OSError:
+            continue
+    return removed
@@ -0,0 +1,155 @@
+"""
+Response compression.
+
+precompress() writes .br and .gz siblings for the Vite build so static
+files are compressed once at build time; StaticFiles picks the sibling
+matching the request's Accept-Encoding. ResponseCompressor compresses
+large JSON API responses on the fly.
+
+Brotli is optional: without the brotli package only gzip is produced.
+
+Usage: python -m utils.compression [build_dir]
+"""
+from flask import request
+import gzip
+import os
+import sys
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Text formats worth compressing; images and fonts are already compressed
+COMPRESSIBLE_EXTENSIONS = {'.js', '.mjs', '.css', '.html', '.svg', '.json', '.map', '.txt', '.xml', '.webmanifest'}
+
+ENCODING_SUFFIXES = (('br', '.br'), ('gzip', '.gz'))
+
+def accepted_encodings():
+    """Encodings the current request accepts, most preferred first."""
+    encodings = []
+    for encoding, _ in ENCODING_SUFFIXES:
+        if encoding == 'br' and brotli is None:
+            continue
+        if request.accept_encodings[encoding]:
+            encodings.append(encoding)
+    return encodings
+
+def compress(data, encoding, level):
+    if encoding == 'br':
+        return brotli.compress(data, quality=level)
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+def precompress(root, min_size=1024):
+    """Write .br/.gz siblings for compressible files under root.
+
+    Siblings that are up to date are skipped and ones that would not be
+    smaller than the original are removed. Returns the number written.
+    """
+    written = 0
+    for directory, _, filenames in os.walk(root):
+        for filename in filenames:
+            path = os.path.join(directory, filename)
+            if os.path.splitext(filename)[1] not in COMPRESSIBLE_EXTENSIONS:
+                continue
+
+            stat = os.stat(path)
+            if stat.st_size < min_size:
+                continue
+
+            with open(path, 'rb') as source:
+                data = None
+                for encoding, suffix in ENCODING_SUFFIXES:
+                    if encoding == 'br' and brotli is None:
+                        continue
+                    target = path + suffix
+                    if os.path.exists(target) and os.stat(target).st_mtime >= stat.st_mtime:
+                        continue
+
+                    if data is None:
+                        data = source.read()
+                    compressed = compress(data, encoding, 11 if encoding == 'br' else 9)
+                    if len(compressed) >= len(data):
+                        if os.path.exists(target):
+                            os.remove(target)
+                        continue
+
+                    with open(target, 'wb') as output:
+                        output.write(compressed)
+                    written += 1
+    return written
+
+class ResponseCompressor:
+    """Compresses JSON responses above COMPRESS_MIN_SIZE bytes.
+
+    Brotli is preferred when installed and accepted, otherwise gzip.
+    Streamed responses (CSV exports, files) are left alone. A strong ETag
+    is downgraded to weak, since the encoded bytes differ per encoding.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('COMPRESS_ENABLED', True)
+        app.config.setdefault('COMPRESS_MIN_SIZE', 1024)
+        app.config.setdefault('COMPRESS_LEVEL', 6)
+        app.config.setdefault('COMPRESS_BR_QUALITY', 4)
+        app.extensions['response_compressor'] = self
+        self.app = app
+        app.after_request(self.compress_response)
+
+    def encoding_for(self, mimetype, size):
+        """The encoding compress_response would give a body, or None."""
+        config = self.app.config
+        if not config['COMPRESS_ENABLED'] or mimetype != 'application/json' or request.method == 'HEAD':
+            return None
+        if size < config['COMPRESS_MIN_SIZE']:
+            return None
+        encodings = accepted_encodings()
+        return encodings[0] if encodings else None
+
+    def encode(self, data, encoding):
+        config = self.app.config
+        return compress(data, encoding, config['COMPRESS_BR_QUALITY'] if encoding == 'br' else config['COMPRESS_LEVEL'])
+
+    def compress_response(self, response):
+        config = self.app.config
+        if not config['COMPRESS_ENABLED'] or response.mimetype != 'application/json':
+            return response
+        if response.direct_passthrough or response.is_streamed:
+            return response
+
+        response.vary.add('Accept-Encoding')
+        encodings = accepted_encodings()
+        if not encodings:
+            return response
+
+        # Weakened whenever the body may be encoded, 304s included, so the
+        # validator a client holds matches the one it is sent
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+
+        # Already encoded, e.g. a variant kept by the response cache
+        if 'Content-Encoding' in response.headers:
+            return response
+        if response.status_code < 200 or response.status_code in (204, 304) or request.method == 'HEAD':
+            return response
+
+        data = response.get_data()
+        encoding = self.encoding_for(response.mimetype, len(data))
+        if encoding is None:
+            return response
+
+        response.set_data(self.encode(data, encoding))
+        response.headers['Content-Encoding'] = encoding
+        return response
+
+response_compressor = ResponseCompressor()
+
+if __name__ == '__main__':
+    root = sys.argv[1] if len(sys.argv) > 1 else os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'build')
+    print(f'Precompressed {precompress(root)} file(s) in {root}' + ('' if brotli else ' (gzip only: brotli not installed)'))
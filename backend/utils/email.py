@@ -1,134 +1,119 @@
-from flask_mail import Message, Mail
-from flask import current_app, render_template_string
-import threading
+from flask_mail import Mail
+from flask import current_app
+import smtplib
+import time
+from utils.outbox import queue_email
+from utils.email_templates import email_templates
 
 mail = Mail()
 
-def send_async_email(app, msg):
-    """Send email asynchronously"""
-    with app.app_context():
-        mail.send(msg)
+def _is_transient(error):
+    """Whether a delivery error is worth retrying on a fresh connection."""
+    if isinstance(error, smtplib.SMTPServerDisconnected):
+        return True
+    if isinstance(error, smtplib.SMTPResponseException):
+        return 400 <= error.smtp_code < 500
+    # SMTPException subclasses OSError; only socket-level errors remain here
+    return isinstance(error, OSError) and not isinstance(error, smtplib.SMTPException)
 
-def send_email(subject, recipient, body_text, body_html=None):
-    """Send an email to a recipient"""
-    try:
-        msg = Message(
-            subject=subject,
-            recipients=[recipient] if isinstance(recipient, str) else recipient,
-            body=body_text,
-            html=body_html or body_text
-        )
-        
-        # Send asynchronously
-        thread = threading.Thread(
-            target=send_async_email,
-            args=(current_app._get_current_object(), msg)
-        )
-        thread.start()
+def is_connection_error(error):
+    """Whether error means the SMTP server could not be reached at all."""
+    if isinstance(error, (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError)):
         return True
-    except Exception as e:
-        current_app.logger.error(f"Error sending email: {str(e)}")
-        return False
+    return isinstance(error, OSError) and not isinstance(error, smtplib.SMTPException)
 
-def send_contact_form_email(name, email, phone, subject, message):
-    """Send contact form email to admin"""
-    admin_email = current_app.config['ADMIN_EMAIL']
-    
-    email_subject = f"New Contact Form Submission: {subject or 'No Subject'}"
-    
-    body_html = f"""
-    <html>
-        <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
-            <div style="max-width: 600px; margin: 0 auto; padding: 20px; background-color: #f5f5f5;">
-                <h2 style="color: #5B21B6; border-bottom: 2px solid #3B82F6; padding-bottom: 10px;">
-                    New Contact Form Submission
-                </h2>
-                
-                <div style="background-color: white; padding: 20px; border-radius: 8px; margin-top: 20px;">
-                    <h3 style="color: #5B21B6;">Contact Details:</h3>
-                    <p><strong>Name:</strong> {name}</p>
-                    <p><strong>Email:</strong> <a href="mailto:{email}">{email}</a></p>
-                    <p><strong>Phone:</strong> {phone or 'Not provided'}</p>
-                    <p><strong>Subject:</strong> {subject or 'Not provided'}</p>
-                    
-                    <h3 style="color: #5B21B6; margin-top: 20px;">Message:</h3>
-                    <div style="background-color: #f8f9fa; padding: 15px; border-radius: 5px; border-left: 3px solid #3B82F6;">
-                        {message}
-                    </div>
-                </div>
-                
-                <div style="text-align: center; margin-top: 30px; color: #666; font-size: 12px;">
-                    <p>This email was sent from Nawi website contact form</p>
-                </div>
-            </div>
-        </body>
-    </html>
-    """
-    
-    body_text = f"""
-    New Contact Form Submission
-    
-    Name: {name}
-    Email: {email}
-    Phone: {phone or 'Not provided'}
-    Subject: {subject or 'Not provided'}
-    
-    Message:
-    {message}
-    """
-    
-    return send_email(email_subject, admin_email, body_text, body_html)
+class SMTPSession:
+    """A Flask-Mail connection kept open across messages.
 
-def send_design_request_confirmation(name, email, service_type):
-    """Send confirmation email for design request"""
-    subject = "Your Design Request Has Been Received - Nawi"
-    
-    body_html = f"""
-    <html>
-        <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
-            <div style="max-width: 600px; margin: 0 auto; padding: 20px; background-color: #f5f5f5;">
-                <h2 style="color: #5B21B6; text-align: center;">Thank You for Your Request!</h2>
-                
-                <div style="background-color: white; padding: 20px; border-radius: 8px; margin-top: 20px;">
-                    <p>Dear {name},</p>
-                    
-                    <p>We have received your design request for <strong>{service_type}</strong>.</p>
-                    
-                    <p>Our team will review your requirements and get back to you within 24 hours with a detailed proposal and timeline.</p>
-                    
-                    <h3 style="color: #5B21B6;">What's Next?</h3>
-                    <ul>
-                        <li>Our design team will analyze your requirements</li>
-                        <li>We'll prepare a customized proposal for your project</li>
-                        <li>You'll receive a detailed quote and timeline</li>
-                        <li>Once approved, we'll start working on your design</li>
-                    </ul>
-                    
-                    <p>If you have any urgent questions, feel free to contact us:</p>
-                    <p>📧 Email: nawycompany@gmail.com</p>
-                    <p>📱 WhatsApp: +201206315886</p>
-                    
-                    <div style="text-align: center; margin-top: 30px;">
-                        <p style="color: #5B21B6; font-weight: bold;">Thank you for choosing Nawi!</p>
-                        <p style="color: #666;">We're excited to bring your vision to life</p>
-                    </div>
-                </div>
-            </div>
-        </body>
-    </html>
+    Transient failures (dropped connections, 4xx replies) close the
+    connection and retry on a new one with exponential backoff; permanent
+    failures are returned to the caller. A kept-open connection the server
+    dropped while idle is reopened at once, without backoff. Must be used
+    from one thread and inside an app context.
     """
+
+    def __init__(self, max_retries, backoff):
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.connection = None
+        self.last_used = time.monotonic()
+
+    def send(self, message):
+        """Send message, returning None on success or the final error."""
+        error = None
+        reused = self.connection is not None
+        for attempt in range(self.max_retries + 1):
+            try:
+                if self.connection is None:
+                    self.connection = mail.connect().__enter__()
+                self.connection.send(message)
+                self.last_used = time.monotonic()
+                return None
+            except Exception as e:
+                self.close()
+                error = e
+                if not _is_transient(e):
+                    break
+                if attempt == 0 and reused:
+                    continue
+                if attempt < self.max_retries:
+                    time.sleep(self.backoff * (2 ** attempt))
+        return error
+
+    def idle_for(self):
+        """Seconds since the last message was sent."""
+        return time.monotonic() - self.last_used
+
+    def close(self):
+        if self.connection is not None:
+            try:
+                self.connection.__exit__(None, None, None)
+            except Exception:
+                pass
+            self.connection = None
+
+# Subject lines per template and language
+EMAIL_SUBJECTS = {
+    'contact_form': {
+        'en': 'New Contact Form Submission: {subject}',
+        'ar': 'رسالة تواصل جديدة: {subject}'
+    },
+    'design_request_confirmation': {
+        'en': 'Your Design Request Has Been Received - Nawi',
+        'ar': 'تم استلام طلب التصميم الخاص بك - ناوي'
+    }
+}
+
+def send_contact_form_email(name, email, phone, subject, message, dedup_key=None, language=None):
+    """Queue contact form email to admin in the outbox (caller commits)"""
+    admin_email = current_app.config['ADMIN_EMAIL']
+    language = email_templates.resolve_language(language or current_app.config.get('ADMIN_EMAIL_LANGUAGE'))
     
-    body_text = f"""
-    Dear {name},
-    
-    Thank you for your design request!
-    
-    We have received your request for {service_type}.
+    email_subject = EMAIL_SUBJECTS['contact_form'][language].format(
+        subject=subject or ('بدون موضوع' if language == 'ar' else 'No Subject')
+    )
+    body_text, body_html = email_templates.render(
+        'contact_form',
+        language,
+        name=name,
+        email=email,
+        phone=phone,
+        subject=subject,
+        message=message
+    )
     
-    Our team will review your requirements and get back to you within 24 hours.
+    return queue_email(email_subject, admin_email, body_text, body_html, dedup_key=dedup_key)
+
+def send_design_request_confirmation(name, email, service_type, dedup_key=None, language=None):
+    """Queue confirmation email for design request in the outbox (caller commits)"""
+    language = email_templates.resolve_language(language)
     
-    Best regards,
-    Nawi Team
-    """
+    subject = EMAIL_SUBJECTS['design_request_confirmation'][language]
+    body_text, body_html = email_templates.render(
+        'design_request_confirmation',
+        language,
+        name=name,
+        service_type=service_type
+    )
     
-    return send_email(subject, email, body_text, body_html)
\ No newline at end of file
+    return queue_email(subject, email, body_text, body_html, dedup_key=dedup_key)
@@ -0,0 +1,75 @@
+from jinja2 import Environment, FileSystemLoader, FileSystemBytecodeCache, select_autoescape
+import os
+
+class EmailTemplates:
+    """Email templates compiled once at startup.
+
+    Templates live in templates/email as ``<name>.<lang>.html`` and
+    ``<name>.<lang>.txt``. HTML variants are autoescaped; compiled bytecode
+    is cached under the instance folder so other workers and restarts skip
+    the Jinja compile step.
+    """
+
+    def __init__(self, app=None):
+        self.env = None
+        self._templates = {}
+        self.languages = ('ar', 'en')
+        self.default_language = 'en'
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('EMAIL_DEFAULT_LANGUAGE', 'en')
+        app.extensions['email_templates'] = self
+        self.default_language = app.config['EMAIL_DEFAULT_LANGUAGE']
+
+        cache_dir = os.path.join(app.instance_path, 'jinja_cache')
+        os.makedirs(cache_dir, exist_ok=True)
+
+        self.env = Environment(
+            loader=FileSystemLoader(os.path.join(app.root_path, 'templates', 'email')),
+            autoescape=select_autoescape(['html']),
+            bytecode_cache=FileSystemBytecodeCache(cache_dir),
+            auto_reload=app.debug
+        )
+
+        # Compile everything now rather than on the first email
+        self._templates = {name: self.env.get_template(name) for name in self.env.list_templates()}
+
+    def resolve_language(self, language):
+        """Map a language preference such as 'ar' or 'en-US' to a template language."""
+        language = (language or '').split('-')[0].lower()
+        return language if language in self.languages else self.default_language
+
+    def _get(self, name, language, extension):
+        template_name = f'{name}.{language}.{extension}'
+        template = self._templates.get(template_name)
+        if template is None:
+            template = self._templates[template_name] = self.env.get_template(template_name)
+        return template
+
+    def render(self, template, language=None, /, **context):
+        """Render a template pair, returning (body_text, body_html)."""
+        language = self.resolve_language(language)
+        context['lang'] = language
+        return (
+            self._get(template, language, 'txt').render(context),
+            self._get(template, language, 'html').render(context)
+        )
+
+    def render_batch(self, template, contexts, language=None):
+        """Render a template pair for many contexts.
+
+        Each context may carry its own 'lang'; templates are looked up once
+        per language. Yields (body_text, body_html) in input order.
+        """
+        compiled = {}
+        for context in contexts:
+            lang = self.resolve_language(context.get('lang', language))
+            if lang not in compiled:
+                compiled[lang] = (self._get(template, lang, 'txt'), self._get(template, lang, 'html'))
+            text_template, html_template = compiled[lang]
+            context = dict(context, lang=lang)
+            yield text_template.render(context), html_template.render(context)
+
+email_templates = EmailTemplates()
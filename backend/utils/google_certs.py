@@ -0,0 +1,135 @@
+from google.auth import jwt as google_jwt
+from requests.adapters import HTTPAdapter
+import re
+import requests
+import threading
+import time
+
+_MAX_AGE = re.compile(r'max-age=(\d+)')
+
+# Unknown key ids refetch at most this often, so forged tokens cannot hammer Google
+MIN_REFETCH_INTERVAL = 60
+
+class GoogleCerts:
+    """Cached Google signing certificates and a pooled HTTP session.
+
+    Certificates are fetched from GOOGLE_CERTS_URL and kept for the
+    max-age Google sends in Cache-Control (GOOGLE_CERTS_DEFAULT_TTL when
+    absent), so verifying an ID token is a local signature check. In the
+    last GOOGLE_CERTS_REFRESH_AHEAD seconds before expiry a background
+    thread refetches them while the current set keeps being served. If
+    Google is unreachable, expired certificates are used for up to
+    GOOGLE_CERTS_MAX_STALE seconds. A token signed with an unknown key id
+    (after a key rotation) triggers one immediate refetch.
+
+    Point GOOGLE_CERTS_URL and GOOGLE_TOKEN_URL at a local stub server in
+    tests.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._session = None
+        self._certs = None
+        self._expires_at = 0
+        self._fetched_at = 0
+        self._refreshing = False
+        self._lock = threading.Lock()
+        self.fetches = 0
+        self.failures = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('GOOGLE_CERTS_URL', 'https://www.googleapis.com/oauth2/v1/certs')
+        app.config.setdefault('GOOGLE_TOKEN_URL', 'https://oauth2.googleapis.com/token')
+        app.config.setdefault('GOOGLE_HTTP_TIMEOUT', 5)
+        app.config.setdefault('GOOGLE_CERTS_DEFAULT_TTL', 3600)
+        app.config.setdefault('GOOGLE_CERTS_REFRESH_AHEAD', 300)
+        app.config.setdefault('GOOGLE_CERTS_MAX_STALE', 86400)
+        app.config.setdefault('GOOGLE_CLOCK_SKEW', 10)
+        app.extensions['google_certs'] = self
+        self.app = app
+
+    @property
+    def session(self):
+        """Shared requests session with pooled keep-alive connections to Google."""
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    session = requests.Session()
+                    session.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=10, max_retries=2))
+                    session.mount('http://', HTTPAdapter(pool_connections=4, pool_maxsize=10, max_retries=2))
+                    self._session = session
+        return self._session
+
+    def _fetch(self):
+        config = self.app.config
+        try:
+            response = self.session.get(config['GOOGLE_CERTS_URL'], timeout=config['GOOGLE_HTTP_TIMEOUT'])
+            response.raise_for_status()
+            certs = response.json()
+        except (requests.RequestException, ValueError):
+            self.failures += 1
+            raise
+
+        match = _MAX_AGE.search(response.headers.get('Cache-Control', ''))
+        ttl = int(match.group(1)) if match else config['GOOGLE_CERTS_DEFAULT_TTL']
+        with self._lock:
+            self._certs = certs
+            self._fetched_at = time.monotonic()
+            self._expires_at = self._fetched_at + ttl
+            self.fetches += 1
+        return certs
+
+    def _background_refresh(self):
+        try:
+            self._fetch()
+        except Exception as e:
+            self.app.logger.error(f"Google certificate refresh failed: {str(e)}")
+        finally:
+            self._refreshing = False
+
+    def certs(self, force=False):
+        """Return {key id: PEM certificate}, fetching only when needed."""
+        now = time.monotonic()
+        if self._certs is None or force:
+            return self._fetch()
+
+        if now >= self._expires_at:
+            try:
+                return self._fetch()
+            except Exception as e:
+                if now - self._expires_at > self.app.config['GOOGLE_CERTS_MAX_STALE']:
+                    raise
+                self.app.logger.warning(f"Using expired Google certificates: {str(e)}")
+                return self._certs
+
+        if now >= self._expires_at - self.app.config['GOOGLE_CERTS_REFRESH_AHEAD'] and not self._refreshing:
+            self._refreshing = True
+            threading.Thread(target=self._background_refresh, name='google-certs', daemon=True).start()
+        return self._certs
+
+    def verify(self, token, audience):
+        """Verify an ID token's signature, expiry and audience; return its claims.
+
+        Raises ValueError for an invalid token.
+        """
+        skew = self.app.config['GOOGLE_CLOCK_SKEW']
+        try:
+            return google_jwt.decode(token, certs=self.certs(), audience=audience, clock_skew_in_seconds=skew)
+        except ValueError as e:
+            if 'Certificate for key id' not in str(e) or time.monotonic() - self._fetched_at < MIN_REFETCH_INTERVAL:
+                raise
+            # Google rotated its keys since the last fetch
+            return google_jwt.decode(token, certs=self.certs(force=True), audience=audience, clock_skew_in_seconds=skew)
+
+    def stats(self):
+        """Return cache state and counters for this process."""
+        return {
+            'cached': self._certs is not None,
+            'expires_in': round(self._expires_at - time.monotonic()) if self._certs is not None else None,
+            'fetches': self.fetches,
+            'failures': self.failures
+        }
+
+google_certs = GoogleCerts()
@@ -0,0 +1,302 @@
+from PIL import Image, ImageOps
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import os
+import threading
+
+# Formats the pipeline re-encodes; GIFs are kept as uploaded to preserve animation
+PROCESSABLE_EXTENSIONS = {'png', 'jpg', 'jpeg', 'webp'}
+
+_ORIENTATION = 0x0112
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+def avif_supported():
+    """Whether this Pillow build can encode AVIF."""
+    Image.init()
+    return 'AVIF' in Image.SAVE
+
+def variant_names(stem, widths, source_width=None):
+    """Filenames produced for an upload, keyed by purpose.
+
+    Without source_width every configured width is listed; process_image
+    skips widths larger than the source, so the list is trimmed once the
+    real size is known.
+    """
+    sizes = [w for w in sorted(widths) if source_width is None or w < source_width]
+    if source_width is not None:
+        sizes.append(source_width)
+    avif = avif_supported()
+    return {
+        'thumbnail': f'{stem}-thumb.webp',
+        'thumbnail_jpeg': f'{stem}-thumb.jpg',
+        'sizes': [
+            {
+                'width': width,
+                'webp': f'{stem}-{width}w.webp',
+                'avif': f'{stem}-{width}w.avif' if avif else None
+            }
+            for width in sizes
+        ]
+    }
+
+# Segments and chunks kept when stripping; everything else that can carry
+# metadata (EXIF, XMP, IPTC, comments, text chunks) is dropped
+_JPEG_KEEP = {0xE0: (b'JFIF\x00', b'JFXX\x00'), 0xE2: (b'ICC_PROFILE\x00',), 0xEE: (b'Adobe',)}
+_PNG_DROP = {b'tEXt', b'zTXt', b'iTXt', b'eXIf', b'tIME'}
+_WEBP_DROP = {b'EXIF', b'XMP '}
+# VP8X header flags announcing EXIF and XMP chunks
+_WEBP_METADATA_FLAGS = 0x08 | 0x04
+
+def _read_exactly(source, size):
+    data = source.read(size)
+    if len(data) != size:
+        raise ValueError('Invalid image file')
+    return data
+
+def _copy(source, target, size):
+    while size:
+        chunk = _read_exactly(source, min(size, 64 * 1024))
+        target.write(chunk)
+        size -= len(chunk)
+
+def _strip_jpeg(source, target):
+    exif = None
+    target.write(_read_exactly(source, 2))
+    while True:
+        marker = _read_exactly(source, 2)
+        if marker[0] != 0xFF:
+            raise ValueError('Invalid image file')
+        while marker[1] == 0xFF:
+            # Fill bytes before a marker
+            marker = marker[1:] + _read_exactly(source, 1)
+        code = marker[1]
+        if code == 0xD9 or 0xD0 <= code <= 0xD7 or code == 0x01:
+            target.write(marker)
+            continue
+        length = int.from_bytes(_read_exactly(source, 2), 'big')
+        payload = _read_exactly(source, length - 2)
+        if code == 0xE1 and payload.startswith(b'Exif\x00\x00') and exif is None:
+            exif = payload
+        if code in _JPEG_KEEP:
+            keep = payload.startswith(_JPEG_KEEP[code])
+        else:
+            keep = not (0xE0 <= code <= 0xEF or code == 0xFE)
+        if keep:
+            target.write(marker + length.to_bytes(2, 'big') + payload)
+        if code == 0xDA:
+            # Entropy-coded data and any trailing frames follow unchanged
+            for chunk in iter(lambda: source.read(64 * 1024), b''):
+                target.write(chunk)
+            return exif
+
+def _strip_png(source, target):
+    exif = None
+    target.write(_read_exactly(source, 8))
+    while True:
+        header = source.read(8)
+        if not header:
+            return exif
+        if len(header) != 8:
+            raise ValueError('Invalid image file')
+        length = int.from_bytes(header[:4], 'big')
+        kind = header[4:]
+        if kind in _PNG_DROP:
+            data = _read_exactly(source, length + 4)
+            if kind == b'eXIf':
+                exif = data[:-4]
+            continue
+        target.write(header)
+        _copy(source, target, length + 4)
+        if kind == b'IEND':
+            return exif
+
+def _strip_webp(source, target):
+    exif = None
+    header = _read_exactly(source, 12)
+    end = 8 + int.from_bytes(header[4:8], 'little')
+    target.write(header)
+    position = 12
+    while position < end:
+        kind = _read_exactly(source, 4)
+        size = int.from_bytes(_read_exactly(source, 4), 'little')
+        padded = size + (size & 1)
+        position += 8 + padded
+        if kind in _WEBP_DROP:
+            data = _read_exactly(source, padded)
+            if kind == b'EXIF':
+                exif = data[:size]
+            continue
+        target.write(kind + size.to_bytes(4, 'little'))
+        if kind == b'VP8X':
+            flags = _read_exactly(source, 1)[0] & ~_WEBP_METADATA_FLAGS
+            target.write(bytes([flags]))
+            _copy(source, target, padded - 1)
+        else:
+            _copy(source, target, padded)
+    # RIFF size covers everything after the size field
+    size = target.tell() - 8
+    target.seek(4)
+    target.write(size.to_bytes(4, 'little'))
+    return exif
+
+def _image_stripper(header):
+    if header.startswith(b'\xff\xd8\xff'):
+        return _strip_jpeg
+    if header.startswith(b'\x89PNG\r\n\x1a\n'):
+        return _strip_png
+    if header[:4] == b'RIFF' and header[8:12] == b'WEBP':
+        return _strip_webp
+    return None
+
+def _orientation(exif):
+    if not exif:
+        return 1
+    try:
+        tags = Image.Exif()
+        tags.load(exif)
+        return tags.get(_ORIENTATION, 1)
+    except Exception:
+        return 1
+
+def _is_multi_frame_jpeg(path):
+    with Image.open(path) as image:
+        return image.format == 'MPO'
+
+def strip_metadata(path, workers=1):
+    """Rewrite an uploaded image in place without EXIF, GPS, XMP or text chunks.
+
+    Metadata segments are cut out of the file without decoding it, so the
+    pixels and compressed data are kept byte for byte and the ICC profile
+    survives. Only a photo whose EXIF orientation rotates it (and
+    multi-frame JPEGs) needs re-encoding to stay upright; that happens in
+    the image process pool. Raises ValueError if the file is not a
+    readable image.
+    """
+    temp_path = f'{path}.strip'
+    try:
+        with open(path, 'rb') as source:
+            strip = _image_stripper(source.read(12))
+            if strip is None:
+                raise ValueError('Invalid image file')
+            source.seek(0)
+            with open(temp_path, 'wb') as target:
+                exif = strip(source, target)
+        # Header check only: nothing is decoded here
+        reencode = _orientation(exif) != 1 or (strip is _strip_jpeg and _is_multi_frame_jpeg(path))
+        with Image.open(temp_path):
+            pass
+    except (OSError, SyntaxError, ValueError, Image.DecompressionBombError) as e:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise ValueError('Invalid image file') from e
+
+    if reencode:
+        os.remove(temp_path)
+        _get_executor(workers).submit(reencode_without_metadata, path).result()
+    else:
+        os.replace(temp_path, path)
+
+def reencode_without_metadata(path):
+    """Re-encode an image in place with its orientation applied and no metadata.
+
+    Runs in a worker process for the files strip_metadata cannot clean
+    losslessly.
+    """
+    temp_path = f'{path}.strip'
+    try:
+        with Image.open(path) as original:
+            image_format = 'JPEG' if original.format == 'MPO' else original.format
+            # Pillow copies some metadata from the source unless told otherwise
+            options = {'icc_profile': original.info.get('icc_profile'), 'exif': b'', 'xmp': b''}
+            image = ImageOps.exif_transpose(original)
+            image.load()
+            if image_format in ('JPEG', 'WEBP'):
+                options['quality'] = 95
+
+            image.save(temp_path, image_format, **options)
+    except (OSError, SyntaxError, Image.DecompressionBombError) as e:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise ValueError('Invalid image file') from e
+
+    os.replace(temp_path, path)
+
+def process_image(source_path, output_dir, stem, widths, thumbnail_size, quality):
+    """Write thumbnail and responsive variants of source_path.
+
+    Runs in a worker process. EXIF orientation is applied and all metadata
+    (EXIF, GPS, ICC comments) is dropped from the variants. Widths wider
+    than the source are not upscaled; the source width itself is always
+    emitted. Returns the variant_names() mapping for what was written.
+    """
+    with Image.open(source_path) as original:
+        image = ImageOps.exif_transpose(original)
+        image.load()
+
+    has_alpha = image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info)
+    image = image.convert('RGBA' if has_alpha else 'RGB')
+    image.info = {}
+
+    names = variant_names(stem, widths, image.width)
+
+    thumbnail = image.copy()
+    thumbnail.thumbnail((thumbnail_size, thumbnail_size), Image.LANCZOS)
+    thumbnail.save(os.path.join(output_dir, names['thumbnail']), 'WEBP', quality=quality, method=6)
+    thumbnail.convert('RGB').save(
+        os.path.join(output_dir, names['thumbnail_jpeg']), 'JPEG', quality=quality, optimize=True, progressive=True
+    )
+
+    for size in names['sizes']:
+        width = size['width']
+        if width == image.width:
+            resized = image
+        else:
+            resized = image.resize((width, max(1, round(image.height * width / image.width))), Image.LANCZOS)
+        resized.save(os.path.join(output_dir, size['webp']), 'WEBP', quality=quality, method=6)
+        if size['avif']:
+            resized.save(os.path.join(output_dir, size['avif']), 'AVIF', quality=quality)
+
+    return names
+
+def _get_executor(max_workers):
+    global _executor, _executor_pid
+    with _executor_lock:
+        if _executor is None or _executor_pid != os.getpid():
+            # spawn: workers must not inherit the app's threads and DB connections
+            _executor = ProcessPoolExecutor(
+                max_workers=max_workers,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+            _executor_pid = os.getpid()
+        return _executor
+
+def submit_image_processing(app, source_path, stem, on_done=None):
+    """Queue variant generation in the process pool and return the future.
+
+    on_done(names) is called inside an app context once the variants exist.
+    """
+    output_dir = os.path.dirname(source_path)
+    future = _get_executor(app.config['IMAGE_WORKERS']).submit(
+        process_image,
+        source_path,
+        output_dir,
+        stem,
+        tuple(app.config['IMAGE_WIDTHS']),
+        app.config['IMAGE_THUMBNAIL_SIZE'],
+        app.config['IMAGE_QUALITY']
+    )
+
+    def callback(done):
+        try:
+            names = done.result()
+            if on_done is not None:
+                with app.app_context():
+                    on_done(names)
+        except Exception as e:
+            app.logger.error(f"Image processing failed for {source_path}: {str(e)}")
+
+    future.add_done_callback(callback)
+    return future
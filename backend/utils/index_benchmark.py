@@ -0,0 +1,193 @@
+"""
+Benchmark of the indexes declared on the models.
+
+Seeds a scratch SQLite database (never the app's) with about ``rows`` rows
+spread over the tables the API lists from, then runs the hot list queries
+twice: once with only primary keys and unique constraints, and once after
+creating every index declared on the models and running ANALYZE. Each run
+prints the EXPLAIN QUERY PLAN and the best of several timings.
+
+Usage: python -m utils.index_benchmark [rows]
+"""
+from datetime import datetime, timedelta
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.schema import CreateTable
+
+# Share of the seeded rows per table
+TABLE_SHARES = (
+    ('user', 0.10),
+    ('design_request', 0.30),
+    ('contact_message', 0.10),
+    ('audit_log', 0.45),
+    ('portfolio', 0.05),
+)
+
+STATUSES = ('pending', 'in_progress', 'completed', 'cancelled')
+ROLES = ('student', 'teacher', 'content_creator', 'company', 'other')
+CATEGORIES = ('branding', 'social', 'print', 'logo', 'packaging', 'web')
+ACTIONS = ('login', 'user.update', 'user.ban', 'request.status', 'settings.update', 'export.users')
+
+# (label, SQL, parameters) for the list queries the indexes were added for
+QUERIES = (
+    ('services, active by order',
+     'SELECT id, title FROM service WHERE is_active = 1 ORDER BY order_num', {}),
+    ('portfolio, active category',
+     'SELECT id, title FROM portfolio WHERE is_active = 1 AND category = :category '
+     'ORDER BY order_num, created_at DESC', {'category': 'print'}),
+    ('design requests, status newest first',
+     'SELECT id, name FROM design_request WHERE status = :status ORDER BY created_at DESC LIMIT 20',
+     {'status': 'pending'}),
+    ('design requests, one client',
+     'SELECT id, name FROM design_request WHERE user_id = :user_id ORDER BY created_at DESC', {'user_id': 42}),
+    ('design requests, cursor page',
+     'SELECT id, name FROM design_request WHERE created_at < :created_at '
+     'ORDER BY created_at DESC, id DESC LIMIT 20', {'created_at': '2024-06-01 00:00:00.000000'}),
+    ('contact messages, unread count',
+     'SELECT count(*) FROM contact_message WHERE is_read = 0', {}),
+    ('contact messages, newest first',
+     'SELECT id, name FROM contact_message ORDER BY created_at DESC LIMIT 50', {}),
+    ('users, cursor page',
+     'SELECT id, email FROM user ORDER BY created_at DESC, id DESC LIMIT 50', {}),
+    ('users, role count',
+     'SELECT count(*) FROM user WHERE user_role = :role', {'role': 'teacher'}),
+    ('audit log, one user',
+     'SELECT id, action FROM audit_log WHERE user_id = :user_id ORDER BY created_at DESC LIMIT 50',
+     {'user_id': 42}),
+    ('audit log, one action',
+     'SELECT id, user_id FROM audit_log WHERE action = :action ORDER BY created_at DESC LIMIT 50',
+     {'action': 'user.ban'}),
+    ('audit log, cursor page',
+     'SELECT id, action FROM audit_log ORDER BY created_at DESC, id DESC LIMIT 50', {}),
+)
+
+def _timestamps(count, rng, start=datetime(2022, 1, 1), days=1000):
+    span = days * 86400
+    for _ in range(count):
+        yield (start + timedelta(seconds=rng.randrange(span))).strftime('%Y-%m-%d %H:%M:%S.%f')
+
+def _rows(table, count, users, rng):
+    now = datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S.%f')
+    if table == 'user':
+        for i, created_at in enumerate(_timestamps(count, rng), start=1):
+            yield (f'user{i}@example.com', f'user{i}', 'x', rng.choice(ROLES), 0, 1, 0, created_at, now)
+    elif table == 'design_request':
+        for created_at in _timestamps(count, rng):
+            user_id = rng.randrange(1, users + 1) if rng.random() < 0.7 else None
+            yield ('Client', 'client@example.com', 'logo', 'Brief', rng.choice(STATUSES), user_id, created_at, now)
+    elif table == 'contact_message':
+        for created_at in _timestamps(count, rng):
+            yield ('Visitor', 'visitor@example.com', 'Hello', int(rng.random() < 0.9), 0, created_at)
+    elif table == 'audit_log':
+        for created_at in _timestamps(count, rng):
+            yield (rng.randrange(1, users + 1), rng.choice(ACTIONS), 'user', '203.0.113.7', created_at)
+    elif table == 'portfolio':
+        for i, created_at in enumerate(_timestamps(count, rng)):
+            yield (f'Item {i}', rng.choice(CATEGORIES), '/static/uploads/item.png', int(rng.random() < 0.8), i % 100, created_at)
+
+_INSERTS = {
+    'user': 'INSERT INTO user (email, username, password_hash, user_role, is_admin, is_active, is_banned, '
+            'created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+    'design_request': 'INSERT INTO design_request (name, email, service_type, project_description, status, '
+                      'user_id, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+    'contact_message': 'INSERT INTO contact_message (name, email, message, is_read, is_replied, created_at) '
+                       'VALUES (?, ?, ?, ?, ?, ?)',
+    'audit_log': 'INSERT INTO audit_log (user_id, action, resource_type, ip_address, created_at) '
+                 'VALUES (?, ?, ?, ?, ?)',
+    'portfolio': 'INSERT INTO portfolio (title, category, image_url, is_active, order_num, created_at) '
+                 'VALUES (?, ?, ?, ?, ?, ?)',
+}
+
+def seed(engine, metadata, rows, seed_value=0):
+    """Create the tables without secondary indexes and fill them. Returns row counts."""
+    rng = random.Random(seed_value)
+    with engine.begin() as connection:
+        for table in metadata.sorted_tables:
+            connection.execute(CreateTable(table))
+
+    counts = {table: max(1, int(rows * share)) for table, share in TABLE_SHARES}
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        for table, count in counts.items():
+            cursor.executemany(_INSERTS[table], _rows(table, count, counts['user'], rng))
+        cursor.executemany(
+            'INSERT INTO service (title, title_ar, description, description_ar, order_num, is_active) '
+            'VALUES (?, ?, ?, ?, ?, ?)',
+            ((f'Service {i}', f'Service {i}', '-', '-', i, 1) for i in range(20))
+        )
+        connection.commit()
+    finally:
+        connection.close()
+    return counts
+
+def create_indexes(engine, metadata):
+    """Create every index declared on the models, then refresh statistics."""
+    for table in metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine)
+    with engine.begin() as connection:
+        connection.execute(text('ANALYZE'))
+
+def run_queries(engine, repeat=5):
+    """Return {label: (plan lines, best seconds)} for QUERIES."""
+    results = {}
+    with engine.connect() as connection:
+        for label, sql, params in QUERIES:
+            plan = [row[-1] for row in connection.execute(text(f'EXPLAIN QUERY PLAN {sql}'), params)]
+            best = None
+            # The first run warms the page cache for both passes alike
+            connection.execute(text(sql), params).fetchall()
+            for _ in range(repeat):
+                started = time.perf_counter()
+                connection.execute(text(sql), params).fetchall()
+                elapsed = time.perf_counter() - started
+                best = elapsed if best is None else min(best, elapsed)
+            results[label] = (plan, best)
+    return results
+
+def _print_plans(title, results):
+    print(f'\n== {title} ==')
+    for label, (plan, elapsed) in results.items():
+        print(f'{label}: {elapsed * 1000:.2f} ms')
+        for line in plan:
+            print(f'    {line}')
+
+def main(rows=1_000_000):
+    from models import db
+
+    directory = tempfile.mkdtemp(prefix='index-benchmark-')
+    try:
+        engine = create_engine(f"sqlite:///{os.path.join(directory, 'benchmark.db')}")
+        started = time.perf_counter()
+        counts = seed(engine, db.metadata, rows)
+        print(f'Seeded {sum(counts.values()):,} rows in {time.perf_counter() - started:.1f}s: '
+              + ', '.join(f'{table} {count:,}' for table, count in counts.items()))
+
+        before = run_queries(engine)
+        _print_plans('Without secondary indexes', before)
+
+        started = time.perf_counter()
+        create_indexes(engine, db.metadata)
+        print(f'\nCreated indexes and ran ANALYZE in {time.perf_counter() - started:.1f}s')
+
+        after = run_queries(engine)
+        _print_plans('With model indexes', after)
+
+        print('\n== Summary ==')
+        width = max(len(label) for label, _, _ in QUERIES)
+        for label, _, _ in QUERIES:
+            old, new = before[label][1], after[label][1]
+            print(f'{label:<{width}}  {old * 1000:9.2f} ms -> {new * 1000:8.2f} ms  ({old / new:7.1f}x)')
+        engine.dispose()
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
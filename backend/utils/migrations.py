@@ -0,0 +1,81 @@
+"""
+Idempotent schema upgrades for databases created before a model change.
+
+db.create_all() only creates missing tables, so columns and indexes added
+to existing models never reach an existing instance/nawi.db. Run on startup from
+init_db, or by hand with ``python -m utils.migrations``.
+"""
+from sqlalchemy import inspect, text
+
+def ensure_columns(db):
+    """Add nullable columns declared on the models that the database lacks."""
+    inspector = inspect(db.engine)
+    preparer = db.engine.dialect.identifier_preparer
+    added = []
+    
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing or not column.nullable or column.primary_key:
+                continue
+            column_type = column.type.compile(dialect=db.engine.dialect)
+            with db.engine.begin() as connection:
+                connection.execute(text(
+                    f'ALTER TABLE {preparer.format_table(table)} '
+                    f'ADD COLUMN {preparer.format_column(column)} {column_type}'
+                ))
+            added.append(f'{table.name}.{column.name}')
+    
+    return added
+
+def ensure_indexes(db):
+    """Create every index declared on the models that the database lacks."""
+    inspector = inspect(db.engine)
+    created = []
+    
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {index['name'] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(bind=db.engine, checkfirst=True)
+                created.append(index.name)
+    
+    # Refresh planner statistics so SQLite starts using the new indexes
+    if created and db.engine.dialect.name == 'sqlite':
+        with db.engine.begin() as connection:
+            connection.execute(text('ANALYZE'))
+    
+    return created
+
+def migrate_portfolio_tags(db):
+    """Move comma-separated Portfolio.tags strings into the tag tables."""
+    from models import Portfolio
+    from utils.tags import get_or_create_tags
+    
+    items = Portfolio.query.filter(Portfolio.legacy_tags.isnot(None), Portfolio.legacy_tags != '').all()
+    for item in items:
+        existing = {tag.slug for tag in item.tags}
+        item.tags.extend(tag for tag in get_or_create_tags(item.legacy_tags) if tag.slug not in existing)
+        item.legacy_tags = None
+        # Flushed per item so get_or_create_tags sees tags created for earlier rows
+        db.session.flush()
+    
+    db.session.commit()
+    return len(items)
+
+if __name__ == '__main__':
+    from app import app
+    from models import db
+    
+    with app.app_context():
+        db.create_all()
+        added = ensure_columns(db)
+        print(f"Added {len(added)} column(s): {', '.join(added) or 'none'}")
+        created = ensure_indexes(db)
+        print(f"Created {len(created)} index(es): {', '.join(created) or 'none'}")
+        migrated = migrate_portfolio_tags(db)
+        print(f"Moved tags of {migrated} portfolio item(s) to the tag tables")
@@ -0,0 +1,234 @@
+from flask_mail import Message
+from datetime import datetime, timedelta
+import atexit
+import os
+import threading
+import uuid
+
+def queue_email(subject, recipient, body_text, body_html=None, dedup_key=None):
+    """Add an email to the outbox in the current session.
+
+    Nothing is sent here: the row is committed with the caller's
+    transaction and delivered later by the outbox worker. Returns None if
+    an email with the same dedup_key was already queued.
+    """
+    from models import EmailOutbox, db
+
+    if dedup_key and EmailOutbox.query.filter_by(dedup_key=dedup_key).first():
+        return None
+
+    entry = EmailOutbox(
+        dedup_key=dedup_key or uuid.uuid4().hex,
+        recipients=[recipient] if isinstance(recipient, str) else list(recipient),
+        subject=subject,
+        body_text=body_text,
+        body_html=body_html or body_text
+    )
+    db.session.add(entry)
+    return entry
+
+class OutboxWorker:
+    """Drains the email outbox with at-least-once delivery.
+
+    Rows are claimed with a single UPDATE that stamps a claim token and a
+    lease (MAIL_OUTBOX_LEASE seconds), so several workers or processes can
+    drain the same table without sending a row twice. A process that dies
+    mid-send leaves its claim to expire, after which the row is retried.
+    Failed sends are rescheduled with exponential backoff until
+    MAIL_OUTBOX_MAX_ATTEMPTS, then marked failed.
+
+    Mail goes out over one authenticated SMTP session kept open across
+    drains, so a single queued email does not pay for a new connection
+    and TLS handshake. It retries transient errors up to MAIL_MAX_RETRIES
+    times on a fresh connection and is closed once it has been idle for
+    MAIL_IDLE_TIMEOUT seconds (checked every poll).
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._thread = None
+        self._pid = None
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._session = None
+        self.sent = 0
+        self.failed = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('MAIL_OUTBOX_POLL_INTERVAL', 10)
+        app.config.setdefault('MAIL_OUTBOX_BATCH_SIZE', 50)
+        app.config.setdefault('MAIL_OUTBOX_MAX_ATTEMPTS', 8)
+        app.config.setdefault('MAIL_OUTBOX_LEASE', 300)
+        app.config.setdefault('MAIL_MAX_RETRIES', 3)
+        app.config.setdefault('MAIL_RETRY_BACKOFF', 2.0)
+        app.config.setdefault('MAIL_IDLE_TIMEOUT', 30)
+        app.extensions['outbox_worker'] = self
+        self.app = app
+        # Start on the first request so rows left by a restart are drained
+        app.before_request(self._ensure_started)
+        atexit.register(self.shutdown)
+
+    def _ensure_started(self):
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._stop.clear()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='mail-outbox', daemon=True)
+            self._thread.start()
+
+    def notify(self):
+        """Wake the worker after committing new outbox rows."""
+        self._ensure_started()
+        self._wake.set()
+
+    def _run(self):
+        interval = self.app.config['MAIL_OUTBOX_POLL_INTERVAL']
+        while not self._stop.is_set():
+            self._wake.wait(interval)
+            self._wake.clear()
+            try:
+                with self.app.app_context():
+                    while self.drain() and not self._stop.is_set():
+                        pass
+            except Exception as e:
+                self.app.logger.error(f"Outbox drain failed: {str(e)}")
+            self.close_idle_session()
+        self.close_session()
+
+    def _claim(self, token, now):
+        from models import EmailOutbox, db
+
+        claimable = db.or_(
+            db.and_(EmailOutbox.status == 'pending', EmailOutbox.next_attempt_at <= now),
+            db.and_(EmailOutbox.status == 'sending', EmailOutbox.locked_until < now)
+        )
+        batch = db.select(EmailOutbox.id).where(claimable).order_by(
+            EmailOutbox.id
+        ).limit(self.app.config['MAIL_OUTBOX_BATCH_SIZE'])
+
+        EmailOutbox.query.filter(EmailOutbox.id.in_(batch), claimable).update({
+            'status': 'sending',
+            'claim_token': token,
+            'locked_until': now + timedelta(seconds=self.app.config['MAIL_OUTBOX_LEASE']),
+            'attempts': EmailOutbox.attempts + 1
+        }, synchronize_session=False)
+        db.session.commit()
+
+        return EmailOutbox.query.filter_by(claim_token=token, status='sending').all()
+
+    def drain(self):
+        """Send one claimed batch. Returns the number of rows processed.
+
+        Outcomes are only written while this drain still holds the row's
+        claim, so a row another worker re-claimed after the lease ran out
+        is left to that worker. When the SMTP server cannot be reached, or
+        the lease is about to expire, the rest of the batch is handed back
+        unattempted instead of being sent late.
+        """
+        from models import db
+        from utils.email import is_connection_error
+
+        token = uuid.uuid4().hex
+        rows = self._claim(token, datetime.utcnow())
+        if not rows:
+            return 0
+
+        # Read up front: each commit below expires the loaded rows
+        claimed = [
+            (row.id, row.attempts, row.locked_until, Message(
+                subject=row.subject,
+                recipients=row.recipients,
+                body=row.body_text,
+                html=row.body_html
+            ))
+            for row in rows
+        ]
+
+        # Kept open after the batch; closed by the worker once idle
+        session = self._get_session()
+        max_attempts = self.app.config['MAIL_OUTBOX_MAX_ATTEMPTS']
+        for row_id, attempts, locked_until, message in claimed:
+            if datetime.utcnow() >= locked_until:
+                self._release(token, datetime.utcnow())
+                break
+
+            error = session.send(message)
+            if error is None:
+                self._finish(row_id, token, status='sent', sent_at=datetime.utcnow(), last_error=None)
+                self.sent += 1
+            elif attempts >= max_attempts:
+                self._finish(row_id, token, status='failed', last_error=str(error))
+                self.failed += 1
+            else:
+                retry_at = datetime.utcnow() + timedelta(seconds=min(3600, 30 * 2 ** (attempts - 1)))
+                self._finish(row_id, token, status='pending', last_error=str(error), next_attempt_at=retry_at)
+                if is_connection_error(error):
+                    # The server is down; the other rows would only sit through the same retries
+                    self._release(token, retry_at)
+                    break
+
+        return len(claimed)
+
+    def _finish(self, row_id, token, **values):
+        """Record a row's outcome if this drain still holds its claim."""
+        from models import EmailOutbox, db
+
+        values.update(claim_token=None, locked_until=None)
+        EmailOutbox.query.filter_by(id=row_id, claim_token=token).update(values, synchronize_session=False)
+        # Record each outcome immediately so a crash resends as little as possible
+        db.session.commit()
+
+    def _release(self, token, retry_at):
+        """Return claimed rows that were never attempted to the queue."""
+        from models import EmailOutbox, db
+
+        EmailOutbox.query.filter_by(claim_token=token, status='sending').update({
+            'status': 'pending',
+            'claim_token': None,
+            'locked_until': None,
+            'attempts': EmailOutbox.attempts - 1,
+            'next_attempt_at': retry_at
+        }, synchronize_session=False)
+        db.session.commit()
+
+    def _get_session(self):
+        from utils.email import SMTPSession
+
+        if self._session is None:
+            self._session = SMTPSession(self.app.config['MAIL_MAX_RETRIES'], self.app.config['MAIL_RETRY_BACKOFF'])
+        return self._session
+
+    def close_idle_session(self):
+        """Close the SMTP session if it has been idle for MAIL_IDLE_TIMEOUT."""
+        if self._session is not None and self._session.idle_for() >= self.app.config['MAIL_IDLE_TIMEOUT']:
+            self.close_session()
+
+    def close_session(self):
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+
+    def shutdown(self, timeout=5.0):
+        """Stop the worker thread and close its SMTP session."""
+        if self._thread is None or self._pid != os.getpid():
+            self.close_session()
+            return
+        self._stop.set()
+        self._wake.set()
+        self._thread.join(timeout)
+        self._thread = None
+
+    def metrics(self):
+        """Return delivery counters for this process."""
+        return {
+            'sent': self.sent,
+            'failed': self.failed
+        }
+
+outbox_worker = OutboxWorker()
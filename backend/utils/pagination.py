@@ -0,0 +1,86 @@
+from flask import current_app
+from datetime import datetime
+import base64
+import json
+import threading
+import time
+
+MAX_PER_PAGE = 100
+
+_count_cache = {}
+_count_lock = threading.Lock()
+
+def encode_cursor(created_at, row_id):
+    """Encode a (created_at, id) position as an opaque URL-safe token.
+
+    created_at may be None for rows without a timestamp; decode_cursor
+    returns it as None.
+    """
+    payload = json.dumps([created_at.isoformat() if created_at else None, row_id])
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+def decode_cursor(token):
+    """Decode a token produced by encode_cursor. Raises ValueError if invalid."""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(created_at) if created_at is not None else None, int(row_id)
+    except (TypeError, ValueError, json.JSONDecodeError) as e:
+        raise ValueError('Invalid cursor') from e
+
+def keyset_paginate(query, created_column, id_column, per_page, cursor=None):
+    """Return one page of query ordered newest first, seeking past cursor.
+
+    Rows are ordered by (created_at, id) descending and the page is located
+    with a WHERE clause on those columns instead of an OFFSET, so every page
+    costs the same regardless of depth. Rows without a created_at come
+    last. Returns (items, next_cursor) where next_cursor is None on the
+    last page.
+    """
+    per_page = max(1, min(per_page, MAX_PER_PAGE))
+    query = query.order_by(None).order_by(created_column.desc().nulls_last(), id_column.desc())
+
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        if created_at is None:
+            query = query.filter(created_column.is_(None), id_column < row_id)
+        else:
+            query = query.filter(
+                (created_column < created_at) |
+                ((created_column == created_at) & (id_column < row_id)) |
+                created_column.is_(None)
+            )
+
+    items = query.limit(per_page + 1).all()
+    next_cursor = None
+    if len(items) > per_page:
+        items = items[:per_page]
+        last = items[-1]
+        next_cursor = encode_cursor(getattr(last, created_column.key), getattr(last, id_column.key))
+
+    return items, next_cursor
+
+def cached_count(query, key):
+    """Return query's row count, reusing a recent result for the same key.
+
+    Counts are kept for PAGINATION_COUNT_TTL seconds, so paging through a
+    large filtered set runs COUNT(*) once instead of on every page.
+    """
+    ttl = current_app.config.get('PAGINATION_COUNT_TTL', 60)
+    now = time.time()
+
+    with _count_lock:
+        cached = _count_cache.get(key)
+        if cached and cached[1] > now:
+            return cached[0]
+
+    total = query.order_by(None).count()
+
+    with _count_lock:
+        _count_cache[key] = (total, now + ttl)
+        # Drop expired keys so filter combinations do not accumulate
+        if len(_count_cache) > 1000:
+            for stale in [k for k, v in _count_cache.items() if v[1] <= now]:
+                del _count_cache[stale]
+
+    return total
@@ -0,0 +1,180 @@
+from concurrent.futures import ThreadPoolExecutor
+from werkzeug.security import generate_password_hash, check_password_hash
+import atexit
+import os
+import threading
+
+class HasherBusy(Exception):
+    """No hashing slot freed up within PASSWORD_HASH_TIMEOUT."""
+
+def _parameters(prefix):
+    """Split a Werkzeug hash prefix into (algorithm, cost parameters).
+
+    'pbkdf2:sha256:600000' gives (('pbkdf2', 'sha256'), (600000,)) and
+    'scrypt:32768:8:1' gives (('scrypt',), (32768, 8, 1)). The cost is None
+    when it is missing or not numeric.
+    """
+    parts = prefix.split(':')
+    split = 2 if parts[0] == 'pbkdf2' else 1
+    try:
+        cost = tuple(int(part) for part in parts[split:]) or None
+    except ValueError:
+        cost = None
+    return tuple(parts[:split]), cost
+
+class PasswordHasher:
+    """Runs password hashing on a small, bounded thread pool.
+
+    PBKDF2 and scrypt release the GIL while hashing, so a thread pool gives
+    real parallelism without pickling passwords to another process. At most
+    PASSWORD_HASH_WORKERS hashes run at once and PASSWORD_HASH_QUEUE more
+    may wait; beyond that a caller waits up to PASSWORD_HASH_TIMEOUT
+    seconds for a slot and then gets HasherBusy, so a login burst is shed
+    with a 503 instead of starving every other endpoint of CPU.
+
+    The cost is set with PASSWORD_HASH_METHOD (any Werkzeug method string,
+    e.g. pbkdf2:sha256:600000 or scrypt:32768:8:1). needs_rehash() reports
+    stored hashes made with another algorithm or a lower cost so login can
+    upgrade them; hashes already stronger than the setting are kept.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._executor = None
+        self._pid = None
+        self._slots = None
+        self._lock = threading.Lock()
+        self._prefixes = {}
+        self.hashed = 0
+        self.verified = 0
+        self.rejected = 0
+        self.rehashed = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('PASSWORD_HASH_METHOD', 'pbkdf2:sha256:600000')
+        app.config.setdefault('PASSWORD_HASH_WORKERS', 2)
+        app.config.setdefault('PASSWORD_HASH_QUEUE', 16)
+        app.config.setdefault('PASSWORD_HASH_TIMEOUT', 5.0)
+        app.extensions['password_hasher'] = self
+        self.app = app
+        atexit.register(self.shutdown)
+
+    @property
+    def method(self):
+        return self.app.config['PASSWORD_HASH_METHOD'] if self.app else 'pbkdf2:sha256:600000'
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                workers = self.app.config['PASSWORD_HASH_WORKERS']
+                self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hash')
+                self._slots = threading.BoundedSemaphore(workers + self.app.config['PASSWORD_HASH_QUEUE'])
+                self._pid = os.getpid()
+            return self._executor
+
+    def _run(self, fn, *args):
+        if self.app is None:
+            return fn(*args)
+
+        executor = self._get_executor()
+        slots = self._slots
+        if not slots.acquire(timeout=self.app.config['PASSWORD_HASH_TIMEOUT']):
+            self.rejected += 1
+            raise HasherBusy('Password hashing is overloaded')
+        try:
+            future = executor.submit(fn, *args)
+        except Exception:
+            slots.release()
+            raise
+        future.add_done_callback(lambda done: slots.release())
+        return future.result()
+
+    def hash(self, password):
+        """Hash a password with PASSWORD_HASH_METHOD."""
+        self.hashed += 1
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, stored_password, provided_password):
+        """Check a stored hash against a provided password."""
+        self.verified += 1
+        return self._run(check_password_hash, stored_password, provided_password)
+
+    def _prefix(self, method):
+        # Werkzeug fills in default parameters, so compare against what it writes
+        if method not in self._prefixes:
+            self._prefixes[method] = generate_password_hash('', method).split('$', 1)[0]
+        return self._prefixes[method]
+
+    def needs_rehash(self, stored_password):
+        """Whether stored_password uses another algorithm or a lower cost than configured.
+
+        Each cost parameter (PBKDF2 iterations; scrypt N, r and p) is
+        compared separately, and any one below the configured value
+        triggers a rehash.
+        """
+        algorithm, cost = _parameters(self._prefix(self.method))
+        stored_algorithm, stored_cost = _parameters(stored_password.split('$', 1)[0])
+        if stored_algorithm != algorithm or stored_cost is None or len(stored_cost) != len(cost):
+            return True
+        return any(stored < configured for stored, configured in zip(stored_cost, cost))
+
+    def verify_and_upgrade(self, stored_password, provided_password):
+        """Verify a password and rehash it if the parameters changed.
+
+        Returns (valid, new_hash); new_hash is None unless the stored hash
+        should be replaced.
+        """
+        if not self.verify(stored_password, provided_password):
+            return False, None
+        if not self.needs_rehash(stored_password):
+            return True, None
+        self.rehashed += 1
+        return True, self.hash(provided_password)
+
+    def shutdown(self):
+        """Stop the pool threads of this process."""
+        if self._executor is not None and self._pid == os.getpid():
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def metrics(self):
+        """Return hashing counters for this process."""
+        return {
+            'hashed': self.hashed,
+            'verified': self.verified,
+            'rehashed': self.rehashed,
+            'rejected': self.rejected
+        }
+
+password_hasher = PasswordHasher()
+
+if __name__ == '__main__':
+    # Login throughput microbenchmark: python -m utils.passwords [method] [concurrency]
+    from concurrent.futures import ThreadPoolExecutor as Clients
+    from flask import Flask
+    import sys
+    import time
+
+    app = Flask(__name__)
+    app.config['PASSWORD_HASH_METHOD'] = sys.argv[1] if len(sys.argv) > 1 else 'pbkdf2:sha256:600000'
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+    stored = generate_password_hash('correct horse', app.config['PASSWORD_HASH_METHOD'])
+    attempts = concurrency * 4
+
+    started = time.perf_counter()
+    for _ in range(attempts):
+        check_password_hash(stored, 'correct horse')
+    inline = attempts / (time.perf_counter() - started)
+    print(f"{app.config['PASSWORD_HASH_METHOD']}: {inline:.1f} logins/s inline")
+
+    for workers in sorted({1, 2, os.cpu_count() or 1}):
+        app.config['PASSWORD_HASH_WORKERS'] = workers
+        hasher = PasswordHasher(app)
+        with Clients(max_workers=concurrency) as clients:
+            started = time.perf_counter()
+            list(clients.map(lambda _: hasher.verify(stored, 'correct horse'), range(attempts)))
+            elapsed = time.perf_counter() - started
+        hasher.shutdown()
+        print(f"{workers} worker(s), {concurrency} concurrent clients: {attempts / elapsed:.1f} logins/s")
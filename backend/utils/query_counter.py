@@ -0,0 +1,73 @@
+from functools import wraps
+from flask import current_app, g, has_app_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+_listening = False
+
+class QueryBudgetExceeded(AssertionError):
+    """An endpoint ran more SQL statements than its budget allows."""
+
+def _count_statement(conn, cursor, statement, parameters, context, executemany):
+    if has_app_context():
+        counter = g.get('_query_counter')
+        if counter is not None:
+            counter.append(statement)
+
+def _listen():
+    global _listening
+    if not _listening:
+        event.listen(Engine, 'before_cursor_execute', _count_statement)
+        _listening = True
+
+class count_queries:
+    """Context manager recording the SQL statements run in this app context.
+
+    Only statements run in the current app context are seen; a test client
+    request pushes its own context, so check a view's X-Query-Count header
+    instead.
+
+        with app.app_context(), count_queries() as queries:
+            User.query.filter_by(is_banned=True).all()
+        assert len(queries) == 1
+    """
+
+    def __enter__(self):
+        _listen()
+        self._previous = g.get('_query_counter')
+        self.statements = []
+        g._query_counter = self.statements
+        return self.statements
+
+    def __exit__(self, *exc_info):
+        g._query_counter = self._previous
+        if self._previous is not None:
+            self._previous.extend(self.statements)
+        return False
+
+def query_budget(max_queries):
+    """Decorator capping the SQL statements a view may run.
+
+    Statements are counted per request. Over budget, the view raises
+    QueryBudgetExceeded when the app is testing or QUERY_BUDGET_STRICT is
+    set, so an N+1 regression fails the test suite; otherwise the
+    statements are logged as a warning. The count is also exposed in an
+    X-Query-Count header when the app is in debug or testing mode.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            with count_queries() as queries:
+                response = current_app.make_response(f(*args, **kwargs))
+
+            if current_app.debug or current_app.testing:
+                response.headers['X-Query-Count'] = str(len(queries))
+
+            if len(queries) > max_queries:
+                message = f"{f.__name__} ran {len(queries)} SQL statements (budget {max_queries})"
+                if current_app.testing or current_app.config.get('QUERY_BUDGET_STRICT'):
+                    raise QueryBudgetExceeded(message + ':\n' + '\n'.join(queries))
+                current_app.logger.warning(message)
+            return response
+        return decorated_function
+    return decorator
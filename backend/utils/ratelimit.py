@@ -0,0 +1,236 @@
+from collections import OrderedDict
+from functools import wraps
+from flask import current_app, jsonify, request
+from sqlalchemy import Column, Float, MetaData, String, Table, case, create_engine, delete, inspect, literal, select, text, update
+from sqlalchemy.exc import IntegrityError
+import math
+import re
+import threading
+import time
+
+_PERIODS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+_LIMIT = re.compile(r'^\s*(\d+)\s*/\s*(\d*)\s*(second|minute|hour|day)s?\s*$')
+
+def parse_limit(rule):
+    """Parse '10/minute' or '100/5minutes' into (count, seconds)."""
+    match = _LIMIT.match(rule)
+    if not match or int(match.group(1)) < 1:
+        raise ValueError(f'Invalid rate limit: {rule}')
+    count, multiplier, unit = match.groups()
+    return int(count), int(multiplier or 1) * _PERIODS[unit]
+
+def _refill(tokens, elapsed, rate, capacity):
+    return min(capacity, tokens + elapsed * rate)
+
+class MemoryStore:
+    """Token buckets for this process, evicted least-recently-used.
+
+    Each key holds a (tokens, updated_at) pair, so memory is constant per
+    key and bounded by max_keys. An evicted key starts again with a full
+    bucket, which only ever errs towards allowing a request.
+    """
+
+    def __init__(self, max_keys=10000):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def consume(self, key, rate, capacity, cost=1):
+        """Take cost tokens from key's bucket. Returns (allowed, retry_after)."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.pop(key, (capacity, now))
+            tokens = _refill(tokens, now - updated_at, rate, capacity)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+                self.evictions += 1
+        return allowed, 0 if allowed else (cost - tokens) / rate
+
+    def __len__(self):
+        return len(self._buckets)
+
+class DatabaseStore:
+    """Token buckets in a SQL table shared by every worker.
+
+    A consume is one conditional UPDATE that refills and spends in the
+    database, so concurrent workers never spend the same token twice. Uses
+    its own engine and short transactions, independent of the request's
+    session. url may point at the app database or at a separate local
+    SQLite file.
+
+    Each row records when its bucket will be full again (full_at). Such a
+    bucket is indistinguishable from a missing one, so every
+    prune_interval seconds a write deletes the rows whose full_at has
+    passed, keeping the table to the keys limited recently.
+    """
+
+    def __init__(self, url, prune_interval=60):
+        self.engine = create_engine(url)
+        metadata = MetaData()
+        self.table = Table(
+            'rate_limit_buckets', metadata,
+            Column('key', String(255), primary_key=True),
+            Column('tokens', Float, nullable=False),
+            Column('updated_at', Float, nullable=False),
+            Column('full_at', Float)
+        )
+        metadata.create_all(self.engine, checkfirst=True)
+        # Tables created before full_at existed
+        if 'full_at' not in {column['name'] for column in inspect(self.engine).get_columns('rate_limit_buckets')}:
+            with self.engine.begin() as connection:
+                connection.execute(text('ALTER TABLE rate_limit_buckets ADD COLUMN full_at FLOAT'))
+        self.prune_interval = prune_interval
+        self._next_prune = 0.0
+        self.pruned = 0
+
+    def prune(self, now=None):
+        """Delete buckets that have refilled to capacity. Returns the number deleted."""
+        now = time.time() if now is None else now
+        self._next_prune = now + self.prune_interval
+        with self.engine.begin() as connection:
+            deleted = connection.execute(delete(self.table).where(self.table.c.full_at <= now)).rowcount
+        self.pruned += deleted
+        return deleted
+
+    def consume(self, key, rate, capacity, cost=1):
+        """Take cost tokens from key's bucket. Returns (allowed, retry_after)."""
+        table = self.table
+        # Wall clock: buckets are shared across processes
+        now = time.time()
+        refilled = table.c.tokens + (literal(now) - table.c.updated_at) * rate
+        available = case((refilled > capacity, literal(float(capacity))), else_=refilled)
+
+        if now >= self._next_prune:
+            self.prune(now)
+
+        with self.engine.begin() as connection:
+            spent = connection.execute(
+                update(table)
+                .where(table.c.key == key, available >= cost)
+                .values(
+                    tokens=available - cost,
+                    updated_at=now,
+                    full_at=literal(now) + (literal(float(capacity)) - (available - cost)) / rate
+                )
+            )
+            if spent.rowcount:
+                return True, 0
+
+            tokens = connection.execute(select(available).where(table.c.key == key)).scalar()
+            if tokens is not None:
+                return False, (cost - tokens) / rate
+
+        try:
+            with self.engine.begin() as connection:
+                connection.execute(table.insert().values(
+                    key=key, tokens=capacity - cost, updated_at=now, full_at=now + cost / rate
+                ))
+            return True, 0
+        except IntegrityError:
+            # Another worker created the bucket first
+            return self.consume(key, rate, capacity, cost)
+
+def client_ip():
+    """Rate limit key for the requesting address.
+
+    Behind a reverse proxy this relies on ProxyFix (PROXY_FIX_X_FOR) having
+    set remote_addr from X-Forwarded-For.
+    """
+    return f'ip:{request.remote_addr}'
+
+def account_from_body(field='email'):
+    """Key function reading the account (e.g. email) from the JSON body.
+
+    Returns None when the field is missing, which skips the rule.
+    """
+    def key():
+        data = request.get_json(silent=True)
+        value = data.get(field) if isinstance(data, dict) else None
+        if not isinstance(value, str) or not value.strip():
+            return None
+        return f'account:{value.strip().lower()}'
+    return key
+
+class RateLimiter:
+    """Token-bucket rate limiting for views.
+
+    Each rule is a limit string such as '5/minute' and a key function. A
+    bucket holds up to count tokens and refills at count per period, so
+    short bursts are allowed while the long-run rate is capped. Requests
+    over a limit get 429 with a Retry-After header.
+
+    Buckets live in process memory by default. Set RATELIMIT_STORAGE_URL
+    to a database URL (e.g. sqlite:////var/run/nawi-ratelimit.db) to
+    share them between gunicorn workers.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.store = None
+        self.limited = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('RATELIMIT_ENABLED', True)
+        app.config.setdefault('RATELIMIT_STORAGE_URL', None)
+        app.config.setdefault('RATELIMIT_MAX_KEYS', 10000)
+        app.config.setdefault('RATELIMIT_PRUNE_INTERVAL', 60)
+        app.extensions['rate_limiter'] = self
+        self.app = app
+        if app.config['RATELIMIT_STORAGE_URL']:
+            self.store = DatabaseStore(app.config['RATELIMIT_STORAGE_URL'], app.config['RATELIMIT_PRUNE_INTERVAL'])
+        else:
+            self.store = MemoryStore(app.config['RATELIMIT_MAX_KEYS'])
+
+    def hit(self, scope, rule, key):
+        """Spend one token for key under scope. Returns (allowed, retry_after)."""
+        count, seconds = parse_limit(rule)
+        return self.store.consume(f'{scope}:{rule}:{key}', count / seconds, count)
+
+    def limit(self, rule, key=client_ip, scope=None):
+        """Decorator applying rule to a view, keyed by key().
+
+        Stack several decorators for several limits, e.g. per IP and per
+        account. scope defaults to the view name, so each view has its own
+        buckets.
+        """
+        parse_limit(rule)
+
+        def decorator(f):
+            name = scope or f.__name__
+
+            @wraps(f)
+            def decorated_function(*args, **kwargs):
+                if not current_app.config['RATELIMIT_ENABLED']:
+                    return f(*args, **kwargs)
+
+                bucket = key()
+                if bucket is not None:
+                    allowed, retry_after = self.hit(name, rule, bucket)
+                    if not allowed:
+                        self.limited += 1
+                        response = jsonify({'message': 'Too many requests. Please try again later.'})
+                        response.status_code = 429
+                        response.headers['Retry-After'] = str(max(1, math.ceil(retry_after)))
+                        return response
+                return f(*args, **kwargs)
+            return decorated_function
+        return decorator
+
+    def stats(self):
+        """Return limiter counters for this process."""
+        return {
+            'limited': self.limited,
+            'store': type(self.store).__name__ if self.store else None,
+            'keys': len(self.store) if isinstance(self.store, MemoryStore) else None,
+            'evictions': getattr(self.store, 'evictions', None),
+            'pruned': getattr(self.store, 'pruned', None)
+        }
+
+rate_limiter = RateLimiter()
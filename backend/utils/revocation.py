@@ -0,0 +1,104 @@
+from datetime import datetime, timedelta, timezone
+import threading
+import time
+
+class TokenRevocations:
+    """In-memory token blocklist checked on every JWT-protected request.
+
+    A token is rejected when its subject is a banned user, or when it was
+    issued before the user's cut-off time (User.tokens_valid_after, set when
+    a role changes, so tokens with stale claims stop working). Both checks
+    are dictionary lookups with no database access.
+
+    update_user calls ban()/unban() and revoke_user_tokens() so the worker
+    handling the change cuts the user off immediately. Every worker reloads
+    banned users and cut-offs from the database with one query at most once
+    every JWT_REVOCATION_REFRESH seconds. Cut-offs older than
+    JWT_REVOCATION_WINDOW (the longest token lifetime) can no longer match
+    a valid token and are not loaded.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._banned = set()
+        self._not_before = {}
+        self._loaded_at = None
+        self._lock = threading.Lock()
+        self.rejected = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('JWT_REVOCATION_REFRESH', 30)
+        app.config.setdefault('JWT_REVOCATION_WINDOW', 30 * 86400)  # refresh token lifetime
+        app.extensions['token_revocations'] = self
+        self.app = app
+        # Registered on the JWTManager, which must be initialised first
+        app.extensions['flask-jwt-extended'].token_in_blocklist_loader(self.is_revoked)
+
+    def _refresh(self):
+        interval = self.app.config['JWT_REVOCATION_REFRESH']
+        if self._loaded_at is not None and time.monotonic() - self._loaded_at < interval:
+            return
+
+        from models import User, db
+
+        with self._lock:
+            if self._loaded_at is not None and time.monotonic() - self._loaded_at < interval:
+                return
+            since = datetime.utcnow() - timedelta(seconds=self.app.config['JWT_REVOCATION_WINDOW'])
+            oldest = since.replace(tzinfo=timezone.utc).timestamp()
+            rows = db.session.query(User.id, User.is_banned, User.tokens_valid_after).filter(
+                db.or_(User.is_banned == True, User.tokens_valid_after >= since)
+            ).all()
+            self._banned = {str(user_id) for user_id, banned, _ in rows if banned}
+            not_before = {
+                str(user_id): int(valid_after.replace(tzinfo=timezone.utc).timestamp())
+                for user_id, _, valid_after in rows if valid_after is not None
+            }
+            # Keep cut-offs made here whose commit the query did not see yet
+            for subject, cutoff in self._not_before.items():
+                if cutoff >= oldest and cutoff > not_before.get(subject, 0):
+                    not_before[subject] = cutoff
+            self._not_before = not_before
+            self._loaded_at = time.monotonic()
+
+    def is_revoked(self, jwt_header, jwt_payload):
+        """token_in_blocklist_loader callback."""
+        self._refresh()
+        subject = str(jwt_payload.get('sub'))
+        revoked = (
+            subject in self._banned
+            or jwt_payload.get('iat', 0) < self._not_before.get(subject, 0)
+        )
+        if revoked:
+            self.rejected += 1
+        return revoked
+
+    def ban(self, user_id):
+        """Reject every token of user_id until unban()."""
+        self._banned.add(str(user_id))
+
+    def unban(self, user_id):
+        self._banned.discard(str(user_id))
+
+    def revoke_user_tokens(self, user):
+        """Reject user's tokens issued before now, e.g. after a role change.
+
+        Sets user.tokens_valid_after; the caller commits it so other workers
+        pick the cut-off up on their next refresh.
+        """
+        # iat has one-second resolution; tokens issued in this second stay valid
+        now = datetime.utcnow().replace(microsecond=0)
+        user.tokens_valid_after = now
+        self._not_before[str(user.id)] = int(now.replace(tzinfo=timezone.utc).timestamp())
+
+    def stats(self):
+        """Return blocklist sizes and counters for this process."""
+        return {
+            'banned': len(self._banned),
+            'users_cut_off': len(self._not_before),
+            'rejected': self.rejected
+        }
+
+token_revocations = TokenRevocations()
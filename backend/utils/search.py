@@ -0,0 +1,298 @@
+from collections import Counter, defaultdict
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+import bisect
+import threading
+import time
+
+from utils.text import index_terms, normalize_text, strip_article, tokenize
+
+class _Source:
+    """How one model is indexed."""
+
+    # Weight of a match on one of the document's tags
+    TAG_WEIGHT = 2
+
+    def __init__(self, kind, model, fields, serialize, tags=None, visible=None, private=False):
+        self.kind = kind
+        self.model = model
+        self.fields = fields
+        self.serialize = serialize
+        self.tags = tags
+        self.visible = visible
+        self.private = private
+
+    def document(self, obj):
+        terms = Counter()
+        for attribute, weight in self.fields.items():
+            for token in set(index_terms(getattr(obj, attribute, None))):
+                terms[token] = max(terms[token], weight)
+
+        tags = self.tags(obj) if self.tags else []
+        for token in set(index_terms(' '.join(tags))):
+            terms[token] = max(terms[token], self.TAG_WEIGHT)
+        return {
+            'kind': self.kind,
+            'id': obj.id,
+            'private': self.private,
+            'tags': tags,
+            'terms': terms,
+            'payload': self.serialize(obj)
+        }
+
+class CatalogIndex:
+    """In-memory inverted index over the public catalog.
+
+    Each registered model contributes documents built from weighted text
+    fields. Tokens are normalized with utils.text, so Arabic queries match
+    regardless of diacritics, alef/yeh/teh marbuta spelling or a leading
+    definite article. Every query token is matched as a prefix, all tokens
+    must match, and results are ranked by the summed field weights.
+    Searches never touch the database.
+
+    The index is built at startup by build() (init_db calls it) and
+    updated from the session when a commit writes a registered model;
+    commits that land while a build is reading the tables are queued and
+    applied once it finishes. Other workers' writes are picked up by a
+    background rebuild every SEARCH_INDEX_REFRESH seconds.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._sources = {}
+        self._documents = {}
+        self._postings = defaultdict(dict)
+        self._vocabulary = []
+        self._tags = defaultdict(set)
+        self._lock = threading.RLock()
+        self._build_lock = threading.RLock()
+        self._built_at = None
+        self._rebuilding = False
+        self._replay = []
+        self.rebuilds = 0
+        self._listening = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('SEARCH_INDEX_REFRESH', 300)
+        app.config.setdefault('SEARCH_MAX_RESULTS', 50)
+        app.extensions['catalog_index'] = self
+        self.app = app
+        self._listen()
+
+    def _listen(self):
+        if self._listening:
+            return
+        event.listen(Session, 'after_flush', self._after_flush)
+        event.listen(Session, 'after_commit', self._after_commit)
+        event.listen(Session, 'after_soft_rollback', self._after_rollback)
+        self._listening = True
+
+    def register(self, kind, model, fields, serialize, tags=None, visible=None, private=False):
+        """Index rows of model under kind.
+
+        fields maps attribute names to weights. serialize(obj) returns the
+        result payload, tags(obj) the row's tags for faceting and
+        visible(obj) whether the row is searchable at all. Private kinds are
+        only returned to admins.
+        """
+        self._sources[model] = _Source(kind, model, fields, serialize, tags, visible, private)
+
+    def _after_flush(self, session, flush_context):
+        # Documents are captured now: after commit the rows are expired
+        pending = session.info.setdefault('catalog_index_pending', {})
+        for obj in list(session.new) + list(session.dirty):
+            source = self._sources.get(type(obj))
+            if source is not None:
+                visible = source.visible is None or source.visible(obj)
+                pending[(source.kind, obj.id)] = source.document(obj) if visible else None
+        for obj in session.deleted:
+            source = self._sources.get(type(obj))
+            if source is not None:
+                pending[(source.kind, obj.id)] = None
+
+    def _after_commit(self, session):
+        pending = session.info.pop('catalog_index_pending', None)
+        if not pending:
+            return
+        with self._lock:
+            if self._built_at is not None:
+                self._apply(pending)
+            if self._rebuilding:
+                # The build may have read these rows before the commit
+                self._replay.append(pending)
+
+    def _apply(self, changes):
+        for key, document in changes.items():
+            self._remove(key)
+            if document is not None:
+                self._add(key, document)
+
+    def _after_rollback(self, session, previous_transaction):
+        session.info.pop('catalog_index_pending', None)
+
+    def _add(self, key, document):
+        self._documents[key] = document
+        for token, weight in document['terms'].items():
+            postings = self._postings[token]
+            if not postings:
+                bisect.insort(self._vocabulary, token)
+            postings[key] = weight
+        for tag in document['tags']:
+            self._tags[normalize_text(tag)].add(key)
+
+    def _remove(self, key):
+        document = self._documents.pop(key, None)
+        if document is None:
+            return
+        for token in document['terms']:
+            postings = self._postings.get(token)
+            if postings is None:
+                continue
+            postings.pop(key, None)
+            if not postings:
+                del self._postings[token]
+                index = bisect.bisect_left(self._vocabulary, token)
+                if index < len(self._vocabulary) and self._vocabulary[index] == token:
+                    del self._vocabulary[index]
+        for tag in document['tags']:
+            keys = self._tags.get(normalize_text(tag))
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[normalize_text(tag)]
+
+    def rebuild(self):
+        """Reload every registered model. Needs an app context."""
+        documents = {}
+        for source in self._sources.values():
+            for obj in source.model.query.all():
+                if source.visible is None or source.visible(obj):
+                    documents[(source.kind, obj.id)] = source.document(obj)
+
+        with self._lock:
+            self._documents = {}
+            self._postings = defaultdict(dict)
+            self._vocabulary = []
+            self._tags = defaultdict(set)
+            for key, document in documents.items():
+                self._add(key, document)
+            for changes in self._replay:
+                self._apply(changes)
+            self._replay = []
+            self._rebuilding = False
+            self._built_at = time.monotonic()
+            self.rebuilds += 1
+
+    def build(self):
+        """Build the index now, e.g. at startup. Needs an app context."""
+        with self._build_lock:
+            with self._lock:
+                self._rebuilding = True
+                self._replay = []
+            try:
+                self.rebuild()
+            finally:
+                self._rebuilding = False
+
+    def _background_rebuild(self):
+        try:
+            with self.app.app_context():
+                self.rebuild()
+        except Exception as e:
+            self.app.logger.error(f"Search index rebuild failed: {str(e)}")
+        finally:
+            self._rebuilding = False
+
+    def _ensure_fresh(self):
+        if self._built_at is None:
+            # Only when this process skipped init_db
+            with self._build_lock:
+                if self._built_at is None:
+                    self.build()
+            return
+
+        stale = time.monotonic() - self._built_at >= self.app.config['SEARCH_INDEX_REFRESH']
+        if stale and not self._rebuilding:
+            # Keep answering from the current index while a new one is built
+            with self._lock:
+                self._rebuilding = True
+                self._replay = []
+            threading.Thread(target=self._background_rebuild, name='search-index', daemon=True).start()
+
+    def _match(self, token):
+        """Keys matching token as a prefix, with the best weight for each."""
+        matches = {}
+        index = bisect.bisect_left(self._vocabulary, token)
+        while index < len(self._vocabulary) and self._vocabulary[index].startswith(token):
+            for key, weight in self._postings[self._vocabulary[index]].items():
+                if weight > matches.get(key, 0):
+                    matches[key] = weight
+            index += 1
+        return matches
+
+    def search(self, query='', kinds=None, tags=None, include_private=False, limit=None):
+        """Return ranked results and facets for query.
+
+        kinds restricts result types; tags keeps documents carrying all of
+        the given tags. Facets count the matches before the tag filter is
+        applied, so the facet list stays useful while narrowing.
+        """
+        self._ensure_fresh()
+        if limit is None:
+            limit = self.app.config['SEARCH_MAX_RESULTS']
+        tokens = [strip_article(token) or token for token in tokenize(query)]
+
+        with self._lock:
+            if tokens:
+                scores = None
+                for token in tokens:
+                    matches = self._match(token)
+                    if scores is None:
+                        scores = Counter(matches)
+                    else:
+                        scores = Counter({key: scores[key] + weight for key, weight in matches.items() if key in scores})
+                    if not scores:
+                        break
+            else:
+                scores = Counter({key: 0 for key in self._documents})
+
+            candidates = [
+                self._documents[key] for key in scores
+                if (include_private or not self._documents[key]['private'])
+                and (not kinds or key[0] in kinds)
+            ]
+
+            tag_facets = Counter(tag for document in candidates for tag in document['tags'])
+            kind_facets = Counter(document['kind'] for document in candidates)
+
+            for tag in tags or ():
+                keys = self._tags.get(normalize_text(tag), set())
+                candidates = [document for document in candidates if (document['kind'], document['id']) in keys]
+
+        candidates.sort(key=lambda document: (-scores[(document['kind'], document['id'])], document['kind'], document['id']))
+
+        return {
+            'query': query,
+            'total': len(candidates),
+            'results': [
+                dict(document['payload'], type=document['kind'], score=scores[(document['kind'], document['id'])])
+                for document in candidates[:limit]
+            ],
+            'facets': {
+                'types': dict(kind_facets),
+                'tags': dict(tag_facets.most_common())
+            }
+        }
+
+    def stats(self):
+        """Return index size and rebuild counters."""
+        with self._lock:
+            return {
+                'documents': len(self._documents),
+                'terms': len(self._vocabulary),
+                'rebuilds': self.rebuilds
+            }
+
+catalog_index = CatalogIndex()
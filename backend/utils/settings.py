@@ -0,0 +1,171 @@
+from flask import current_app
+import hashlib
+import json
+import threading
+import time
+import uuid
+
+# Values used until an admin overrides them
+DEFAULT_SETTINGS = {
+    'particles_enabled': True,
+    'particles_max': 150,
+    'particles_per_second': 20,
+    'particles_decay_time': 5,
+    'registration_enabled': True,
+    'google_auth_enabled': True,
+    'email_notifications': True,
+    'contact_email': 'nawicompany@gmail.com',
+    'reply_within_hours': 48
+}
+
+# Unset keys fall back to the defaults, so a deploy changing them changes the ETag
+DEFAULTS_DIGEST = hashlib.sha1(json.dumps(DEFAULT_SETTINGS, sort_keys=True).encode()).hexdigest()[:12]
+
+# Settings the frontend may read without authenticating
+PUBLIC_SETTINGS = (
+    'particles_enabled',
+    'particles_max',
+    'particles_per_second',
+    'particles_decay_time',
+    'registration_enabled',
+    'google_auth_enabled'
+)
+
+# Row whose value changes on every write, polled by other workers
+VERSION_KEY = '_settings_version'
+
+class SettingsStore:
+    """Per-process cache of the system_settings table.
+
+    All rows are loaded once and merged with DEFAULT_SETTINGS, so reads are
+    dictionary lookups. Writes go through update(), which saves every key
+    and a new version stamp in one transaction. Other workers notice the
+    new stamp by reading the version row at most once every
+    SETTINGS_REFRESH_INTERVAL seconds and reload the table when it changed.
+    """
+
+    def __init__(self, app=None):
+        self._values = None
+        self._settings = None
+        self._public = None
+        self._version = None
+        self._checked_at = 0
+        self._lock = threading.Lock()
+        self.reloads = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('SETTINGS_REFRESH_INTERVAL', 5)
+        app.config.setdefault('SETTINGS_PUBLIC_MAX_AGE', 60)
+        app.extensions['settings_store'] = self
+
+    def _load(self):
+        from models import SystemSettings, db
+
+        rows = db.session.query(SystemSettings.key, SystemSettings.value, SystemSettings.description).all()
+        settings = {key: {'value': value, 'description': ''} for key, value in DEFAULT_SETTINGS.items()}
+        version = None
+        for key, value, description in rows:
+            if key == VERSION_KEY:
+                version = value
+            else:
+                settings[key] = {'value': value, 'description': description or ''}
+
+        self._settings = settings
+        self._values = {key: setting['value'] for key, setting in settings.items()}
+        self._public = {key: self._values[key] for key in PUBLIC_SETTINGS}
+        self._version = version
+        self._checked_at = time.monotonic()
+        self.reloads += 1
+
+    def _stored_version(self):
+        from models import SystemSettings, db
+
+        return db.session.query(SystemSettings.value).filter_by(key=VERSION_KEY).scalar()
+
+    def _ensure_fresh(self):
+        interval = current_app.config.get('SETTINGS_REFRESH_INTERVAL', 5)
+        if self._values is not None and time.monotonic() - self._checked_at < interval:
+            return
+
+        with self._lock:
+            if self._values is None:
+                self._load()
+            elif time.monotonic() - self._checked_at >= interval:
+                if self._stored_version() != self._version:
+                    self._load()
+                else:
+                    self._checked_at = time.monotonic()
+
+    def get(self, key, default=None):
+        """Return the value of key, falling back to its built-in default."""
+        self._ensure_fresh()
+        if key in self._values:
+            return self._values[key]
+        return default
+
+    def all(self):
+        """Every setting as {key: {'value': ..., 'description': ...}}."""
+        self._ensure_fresh()
+        return self._settings
+
+    def public(self):
+        """Settings listed in PUBLIC_SETTINGS as {key: value}."""
+        self._ensure_fresh()
+        return self._public
+
+    @property
+    def version(self):
+        """Stamp of the last write, or None before the first one."""
+        self._ensure_fresh()
+        return self._version
+
+    @property
+    def etag(self):
+        """Validator for responses built from the settings."""
+        return f"{self.version or 'defaults'}-{DEFAULTS_DIGEST}"
+
+    def update(self, values, descriptions=None):
+        """Save values in one transaction and bump the version stamp.
+
+        Raises ValueError for a non-dict payload or a reserved key.
+        """
+        from models import SystemSettings, db
+
+        if not isinstance(values, dict):
+            raise ValueError('Settings must be an object')
+        if VERSION_KEY in values:
+            raise ValueError(f'{VERSION_KEY} is reserved')
+        descriptions = descriptions or {}
+
+        keys = list(values) + [VERSION_KEY]
+        existing = {setting.key: setting for setting in SystemSettings.query.filter(SystemSettings.key.in_(keys)).all()}
+        stamped = dict(values, **{VERSION_KEY: uuid.uuid4().hex})
+
+        try:
+            for key, value in stamped.items():
+                setting = existing.get(key)
+                if setting is None:
+                    setting = SystemSettings(key=key)
+                    db.session.add(setting)
+                setting.value = value
+                if descriptions.get(key):
+                    setting.description = descriptions[key]
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        with self._lock:
+            self._load()
+
+    def stats(self):
+        """Return cache counters."""
+        return {
+            'loaded': self._values is not None,
+            'version': self._version,
+            'reloads': self.reloads
+        }
+
+settings_store = SettingsStore()
@@ -0,0 +1,148 @@
+from flask import abort, send_file
+import mimetypes
+import os
+import threading
+import time
+
+from utils.compression import ENCODING_SUFFIXES, accepted_encodings
+from utils.storage import stored_url_digest
+
+class StaticFiles:
+    """Serves the SPA build and uploaded files.
+
+    The build folder is listed once into memory and the listing is only
+    rebuilt when a directory's mtime changes (checked at most every
+    STATIC_REFRESH_INTERVAL seconds), so SPA navigations never touch the
+    filesystem to decide between a file and index.html.
+
+    Files go through send_file, which answers Range and conditional
+    requests and hands the file to the server's wsgi.file_wrapper (sendfile
+    under gunicorn) or to the proxy when USE_X_SENDFILE is set. Hashed Vite
+    assets and content-addressed uploads are marked immutable; index.html
+    is revalidated on every load so new deploys are picked up. Build files
+    with .br/.gz siblings (see utils.compression) are sent precompressed
+    when the client accepts the encoding.
+    """
+
+    IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+    def __init__(self, app=None):
+        self.build_root = None
+        self.upload_root = None
+        self.refresh_interval = 2.0
+        self.max_age = 3600
+        self._files = {}
+        self._directories = {}
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('STATIC_BUILD_FOLDER', 'build')
+        app.config.setdefault('STATIC_REFRESH_INTERVAL', 2.0)
+        app.config.setdefault('STATIC_MAX_AGE', 3600)
+        app.extensions['static_files'] = self
+        self.build_root = os.path.join(app.root_path, app.config['STATIC_BUILD_FOLDER'])
+        self.upload_root = os.path.join(app.root_path, app.config['UPLOAD_FOLDER'])
+        self.refresh_interval = app.config['STATIC_REFRESH_INTERVAL']
+        self.max_age = app.config['STATIC_MAX_AGE']
+        self._scan()
+
+    def _scan(self):
+        files = {}
+        directories = {}
+        for directory, _, filenames in os.walk(self.build_root):
+            directories[directory] = os.stat(directory).st_mtime_ns
+            relative = os.path.relpath(directory, self.build_root).replace(os.sep, '/')
+            prefix = '' if relative == '.' else relative + '/'
+            for filename in filenames:
+                files[prefix + filename] = os.path.join(directory, filename)
+
+        self._files = files
+        self._directories = directories
+        self._checked_at = time.monotonic()
+
+    def _changed(self):
+        if not self._directories:
+            return os.path.isdir(self.build_root)
+        for directory, mtime in self._directories.items():
+            try:
+                if os.stat(directory).st_mtime_ns != mtime:
+                    return True
+            except OSError:
+                return True
+        return False
+
+    def lookup(self, path):
+        """Absolute path of a build file, or None."""
+        if time.monotonic() - self._checked_at >= self.refresh_interval:
+            with self._lock:
+                if time.monotonic() - self._checked_at >= self.refresh_interval:
+                    if self._changed():
+                        self._scan()
+                    else:
+                        self._checked_at = time.monotonic()
+        return self._files.get(path)
+
+    def _send(self, path, max_age, immutable=False, mimetype=None):
+        response = send_file(path, mimetype=mimetype, conditional=True, max_age=max_age)
+        if immutable:
+            response.cache_control.immutable = True
+        elif not max_age:
+            response.cache_control.no_cache = True
+        return response
+
+    def _send_build(self, path, filepath, max_age, immutable=False):
+        siblings = {
+            encoding: self.lookup(path + suffix)
+            for encoding, suffix in ENCODING_SUFFIXES
+        }
+        if not any(siblings.values()):
+            return self._send(filepath, max_age, immutable)
+
+        for encoding in accepted_encodings():
+            if siblings[encoding]:
+                response = self._send(
+                    siblings[encoding], max_age, immutable, mimetype=mimetypes.guess_type(path)[0]
+                )
+                response.headers['Content-Encoding'] = encoding
+                break
+        else:
+            response = self._send(filepath, max_age, immutable)
+        response.vary.add('Accept-Encoding')
+        return response
+
+    def send_build_file(self, path):
+        """Serve a build file, falling back to index.html for client-side routes."""
+        filepath = self.lookup(path) if path else None
+        if filepath is not None:
+            if path.startswith('assets/'):
+                # Vite fingerprints everything under assets/
+                return self._send_build(path, filepath, self.IMMUTABLE_MAX_AGE, immutable=True)
+            if path != 'index.html':
+                return self._send_build(path, filepath, self.max_age)
+
+        # A missing script or stylesheet must not be answered with HTML
+        if path.startswith('assets/'):
+            abort(404)
+
+        index = self.lookup('index.html')
+        if index is None:
+            abort(404)
+        return self._send_build('index.html', index, 0)
+
+    def send_upload(self, path):
+        """Serve an uploaded file; content-addressed names never change."""
+        filepath = os.path.realpath(os.path.join(self.upload_root, path))
+        if not filepath.startswith(os.path.realpath(self.upload_root) + os.sep) or not os.path.isfile(filepath):
+            abort(404)
+        # In-progress uploads are written to dotfiles
+        if os.path.basename(filepath).startswith('.'):
+            abort(404)
+
+        if stored_url_digest('/' + path):
+            return self._send(filepath, self.IMMUTABLE_MAX_AGE, immutable=True)
+        return self._send(filepath, self.max_age)
+
+static_files = StaticFiles()
@@ -0,0 +1,211 @@
+"""
+Content-addressed upload storage.
+
+Uploads are streamed to disk in fixed-size chunks while their SHA-256 is
+computed, then stored as ``<UPLOAD_FOLDER>/ab/cd/<sha256>.<ext>``. Identical
+content maps to the same file, so duplicates are stored once and a URL never
+changes meaning, which lets it be cached forever.
+
+Each file has a StoredFile row whose ref_count follows the URLs held by the
+models registered with track_file_references (image URLs, JSON file lists).
+Files nobody references are removed by collect_garbage.
+"""
+from sqlalchemy import event, inspect
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from collections import Counter
+from datetime import datetime, timedelta
+import glob
+import hashlib
+import os
+import re
+import shutil
+import tempfile
+
+CHUNK_SIZE = 64 * 1024
+
+# Matches the digest in stored file URLs and their generated variants
+_DIGEST_PATTERN = re.compile(r'/[0-9a-f]{2}/[0-9a-f]{2}/([0-9a-f]{64})(?:-[\w]+)?\.\w+$')
+
+_tracked = {}
+
+def stream_to_storage(stream, upload_root, extension, sanitize=None):
+    """Copy stream into content-addressed storage.
+
+    sanitize, if given, is called with the path of the complete temporary
+    file and may rewrite it (e.g. utils.images.strip_metadata); the stored
+    file is then addressed by the hash of the rewritten content.
+
+    Returns (relative_path, sha256, size, created) where created is False
+    when identical content was already stored.
+    """
+    # A sanitized file is rewritten, so it is hashed afterwards instead
+    hasher = hashlib.sha256() if sanitize is None else None
+    size = 0
+
+    handle, temp_path = tempfile.mkstemp(dir=upload_root, prefix='.upload-')
+    try:
+        with os.fdopen(handle, 'wb') as temp_file:
+            while True:
+                chunk = stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                if hasher is not None:
+                    hasher.update(chunk)
+                temp_file.write(chunk)
+                size += len(chunk)
+
+        if sanitize is not None:
+            sanitize(temp_path)
+            return move_to_storage(temp_path, upload_root, extension)
+        return _place(temp_path, hasher.hexdigest(), size, upload_root, extension)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+def file_sha256(path):
+    """Hash a file on disk without reading it into memory."""
+    hasher = hashlib.sha256()
+    with open(path, 'rb') as source:
+        for chunk in iter(lambda: source.read(CHUNK_SIZE), b''):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+def move_to_storage(source_path, upload_root, extension, digest=None):
+    """Move a complete file on disk into content-addressed storage.
+
+    Returns the same tuple as stream_to_storage. digest may be passed
+    when the caller has already hashed the file.
+    """
+    digest = digest or file_sha256(source_path)
+    return _place(source_path, digest, os.path.getsize(source_path), upload_root, extension)
+
+def _place(source_path, digest, size, upload_root, extension):
+    relative_path = f'{digest[:2]}/{digest[2:4]}/{digest}.{extension.lower()}'
+    destination = os.path.join(upload_root, relative_path)
+
+    if os.path.exists(destination):
+        os.remove(source_path)
+        return relative_path, digest, size, False
+
+    os.makedirs(os.path.dirname(destination), exist_ok=True)
+    # A plain rename within the upload folder; copies if the source is on another device
+    shutil.move(source_path, destination)
+    return relative_path, digest, size, True
+
+def register_stored_file(relative_path, digest, size):
+    """Get or create the StoredFile row for stored content and commit it."""
+    from models import StoredFile, db
+
+    stored = StoredFile.query.filter_by(sha256=digest).first()
+    if stored:
+        return stored
+
+    stored = StoredFile(sha256=digest, path=relative_path, size=size)
+    db.session.add(stored)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # Same content registered concurrently by another request
+        db.session.rollback()
+        stored = StoredFile.query.filter_by(sha256=digest).first()
+    return stored
+
+def _digests(value):
+    """Yield stored-file digests referenced by a URL, list or list of dicts."""
+    if not value:
+        return
+    if isinstance(value, str):
+        match = _DIGEST_PATTERN.search(value)
+        if match:
+            yield match.group(1)
+    elif isinstance(value, dict):
+        for item in value.values():
+            yield from _digests(item)
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            yield from _digests(item)
+
+def stored_url_digest(url):
+    """Return the digest of a stored upload URL, or None for other URLs."""
+    match = _DIGEST_PATTERN.search(url)
+    return match.group(1) if match else None
+
+def track_file_references(model, *attributes):
+    """Keep StoredFile.ref_count in step with URLs held in model's attributes."""
+    _tracked[model] = attributes
+    for attribute in attributes:
+        # Load the old value on assignment so the flush can release it
+        event.listen(getattr(model, attribute), 'set', _keep_history, active_history=True)
+    if not event.contains(Session, 'before_flush', _before_flush):
+        event.listen(Session, 'before_flush', _before_flush)
+        event.listen(Session, 'after_flush', _after_flush)
+
+def _keep_history(target, value, oldvalue, initiator):
+    return value
+
+def _before_flush(session, flush_context, instances):
+    deltas = session.info.setdefault('stored_file_deltas', Counter())
+
+    for obj in session.new:
+        for attribute in _tracked.get(type(obj), ()):
+            deltas.update(_digests(getattr(obj, attribute)))
+
+    for obj in session.deleted:
+        for attribute in _tracked.get(type(obj), ()):
+            deltas.subtract(_digests(getattr(obj, attribute)))
+
+    for obj in session.dirty:
+        attributes = _tracked.get(type(obj))
+        if not attributes:
+            continue
+        state = inspect(obj)
+        for attribute in attributes:
+            history = state.attrs[attribute].history
+            if history.has_changes():
+                deltas.update(_digests(list(history.added)))
+                deltas.subtract(_digests(list(history.deleted)))
+
+def _after_flush(session, flush_context):
+    from models import StoredFile
+
+    deltas = session.info.pop('stored_file_deltas', None)
+    if not deltas:
+        return
+
+    table = StoredFile.__table__
+    connection = session.connection()
+    for digest, delta in deltas.items():
+        if delta:
+            connection.execute(
+                table.update().where(table.c.sha256 == digest).values(ref_count=table.c.ref_count + delta)
+            )
+
+def collect_garbage(upload_root, grace=timedelta(days=1)):
+    """Delete stored files, and their variants, that nothing references.
+
+    Files younger than grace are kept so a fresh upload is not removed
+    before the form that uses it is saved. Returns the number removed.
+    """
+    from models import StoredFile, db
+
+    cutoff = datetime.utcnow() - grace
+    orphans = StoredFile.query.filter(StoredFile.ref_count <= 0, StoredFile.created_at < cutoff).all()
+
+    for stored in orphans:
+        stem = os.path.splitext(os.path.join(upload_root, stored.path))[0]
+        for path in [stem + os.path.splitext(stored.path)[1]] + glob.glob(stem + '-*'):
+            if os.path.exists(path):
+                os.remove(path)
+        db.session.delete(stored)
+
+    db.session.commit()
+    return len(orphans)
+
+if __name__ == '__main__':
+    from app import app
+
+    with app.app_context():
+        removed = collect_garbage(os.path.join(app.root_path, app.config['UPLOAD_FOLDER']))
+        print(f'Removed {removed} unreferenced file(s)')
@@ -0,0 +1,75 @@
+import re
+
+from utils.text import normalize_text
+
+_WHITESPACE = re.compile(r'\s+')
+
+def tag_slug(name):
+    """Normalized key for a tag, so 'Logo', 'logo ' and 'LOGO' are one tag."""
+    return _WHITESPACE.sub('-', normalize_text(name).strip())[:50]
+
+def parse_tag_names(value):
+    """Accept a list of names or a comma-separated string; drop blanks and duplicates."""
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = value.split(',')
+
+    names = {}
+    for name in value:
+        name = str(name).strip()[:50]
+        if name and tag_slug(name) not in names:
+            names[tag_slug(name)] = name
+    return list(names.values())
+
+def get_or_create_tags(names):
+    """Return Tag rows for names, adding missing ones to the session."""
+    from models import Tag, db
+
+    names = parse_tag_names(names)
+    slugs = {tag_slug(name): name for name in names}
+    if not slugs:
+        return []
+
+    existing = {tag.slug: tag for tag in Tag.query.filter(Tag.slug.in_(slugs)).all()}
+    for slug, name in slugs.items():
+        if slug not in existing:
+            existing[slug] = Tag(name=name, slug=slug)
+            db.session.add(existing[slug])
+    return [existing[slug] for slug in slugs]
+
+def filter_by_tags(query, names, match_all=True):
+    """Restrict a Portfolio query to items tagged with names.
+
+    match_all requires every tag; otherwise any one of them is enough.
+    """
+    from models import Portfolio, Tag, db, portfolio_tags
+
+    slugs = {tag_slug(name) for name in parse_tag_names(names)}
+    if not slugs:
+        return query
+
+    tagged = db.select(portfolio_tags.c.portfolio_id).join(
+        Tag, Tag.id == portfolio_tags.c.tag_id
+    ).where(Tag.slug.in_(slugs))
+    if match_all:
+        tagged = tagged.group_by(portfolio_tags.c.portfolio_id).having(
+            db.func.count(portfolio_tags.c.tag_id) == len(slugs)
+        )
+    return query.filter(Portfolio.id.in_(tagged))
+
+def tag_counts(active_only=True):
+    """Tags with the number of portfolio items using them, most used first."""
+    from models import Portfolio, Tag, db, portfolio_tags
+
+    count = db.func.count(portfolio_tags.c.portfolio_id)
+    query = db.session.query(Tag.name, Tag.slug, count).join(
+        portfolio_tags, portfolio_tags.c.tag_id == Tag.id
+    )
+    if active_only:
+        query = query.join(Portfolio, Portfolio.id == portfolio_tags.c.portfolio_id).filter(Portfolio.is_active == True)
+
+    return [
+        {'name': name, 'slug': slug, 'count': total}
+        for name, slug, total in query.group_by(Tag.id).order_by(count.desc(), Tag.name)
+    ]
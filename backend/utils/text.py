@@ -0,0 +1,61 @@
+import re
+import unicodedata
+
+# Harakat, tanween, superscript alef and Quranic marks
+_ARABIC_DIACRITICS = re.compile('[\u0610-\u061a\u064b-\u065f\u0670\u06d6-\u06dc\u06df-\u06e8\u06ea-\u06ed]')
+
+_ARABIC_LETTERS = str.maketrans({
+    'أ': 'ا',  # alef with hamza above -> alef
+    'إ': 'ا',  # alef with hamza below -> alef
+    'آ': 'ا',  # alef with madda -> alef
+    'ٱ': 'ا',  # alef wasla -> alef
+    'ى': 'ي',  # alef maksura -> yeh
+    'ة': 'ه',  # teh marbuta -> heh
+    'ؤ': 'و',  # waw with hamza -> waw
+    'ئ': 'ي',  # yeh with hamza -> yeh
+    '\u0640': None,  # tatweel
+    **{chr(0x0660 + digit): str(digit) for digit in range(10)},  # Arabic-Indic digits
+    **{chr(0x06f0 + digit): str(digit) for digit in range(10)}   # Extended Arabic-Indic digits
+})
+
+_TOKEN = re.compile(r'\w+')
+
+# Definite article with its common attached particles, longest first
+_ARABIC_ARTICLES = ('وال', 'بال', 'كال', 'فال', 'لل', 'ال')
+
+def normalize_text(text):
+    """Fold text for search: case, Arabic diacritics and letter variants.
+
+    'أحمد', 'إحمد' and 'احمد' all normalize to the same string, as do
+    'مدرسة' and 'مدرسه'.
+    """
+    if not text:
+        return ''
+    text = unicodedata.normalize('NFKC', text).casefold()
+    text = _ARABIC_DIACRITICS.sub('', text)
+    return text.translate(_ARABIC_LETTERS)
+
+def tokenize(text):
+    """Split text into normalized search tokens."""
+    return _TOKEN.findall(normalize_text(text))
+
+def strip_article(token):
+    """Remove a leading Arabic definite article, or return None."""
+    for article in _ARABIC_ARTICLES:
+        if token.startswith(article) and len(token) - len(article) >= 2:
+            return token[len(article):]
+    return None
+
+def index_terms(text):
+    """Tokens of text plus Arabic tokens with the definite article removed.
+
+    Indexing both forms lets 'مدرسه' find 'للمدرسة', and a query with the
+    article stripped the same way still matches the full word.
+    """
+    terms = []
+    for token in tokenize(text):
+        terms.append(token)
+        stripped = strip_article(token)
+        if stripped:
+            terms.append(stripped)
+    return terms
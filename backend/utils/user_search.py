@@ -0,0 +1,173 @@
+"""
+Indexed user search for the admin panel.
+
+Each user row carries search_text: email, username and full_name split
+into tokens and normalized with utils.text (case, Arabic diacritics and
+alef/yeh/teh marbuta variants). It is kept current by mapper events on
+every ORM insert and update.
+
+The index behind it depends on the database:
+
+- SQLite: an external-content FTS5 table, synced by triggers, queried
+  with one prefix term per search token and ranked by bm25.
+- PostgreSQL: a pg_trgm GIN index on search_text, so substring matches
+  use the index; results are ranked by trigram similarity.
+- Anything else: LIKE on the single normalized column.
+
+The index is created, and existing rows backfilled, the first time a
+search runs against a database.
+"""
+from sqlalchemy import Float, Integer, bindparam, event, inspect, select, text
+import logging
+import threading
+
+from utils.migrations import ensure_columns
+from utils.text import normalize_text, tokenize
+
+logger = logging.getLogger(__name__)
+
+BACKFILL_BATCH_SIZE = 1000
+
+class UserSearch:
+    """Maintains and queries the search index for a user model."""
+
+    def __init__(self):
+        self.model = None
+        self._ready = set()
+        self._trigram = {}
+        self._lock = threading.Lock()
+
+    def register(self, model):
+        """Keep model.search_text current on ORM writes."""
+        self.model = model
+        event.listen(model, 'before_insert', self._update_search_text)
+        event.listen(model, 'before_update', self._update_search_text)
+
+    @staticmethod
+    def document(user):
+        return ' '.join(tokenize(' '.join(filter(None, (user.email, user.username, user.full_name)))))
+
+    def _update_search_text(self, mapper, connection, target):
+        target.search_text = self.document(target)
+
+    @property
+    def fts_table(self):
+        return f'{self.model.__table__.name}_fts'
+
+    def ensure_index(self, db):
+        """Create the search index for db's engine once per process."""
+        engine = db.engine
+        if engine.url in self._ready:
+            return
+        with self._lock:
+            if engine.url in self._ready:
+                return
+
+            if 'search_text' not in {c['name'] for c in inspect(engine).get_columns(self.model.__table__.name)}:
+                ensure_columns(db)
+            self._backfill(db)
+
+            if engine.dialect.name == 'sqlite':
+                self._ensure_fts(engine)
+            elif engine.dialect.name == 'postgresql':
+                self._trigram[engine.url] = self._ensure_trigram(engine)
+
+            self._ready.add(engine.url)
+
+    def _backfill(self, db):
+        table = self.model.__table__
+        update = table.update().where(table.c.id == bindparam('row_id')).values(search_text=bindparam('text'))
+        last_id = 0
+        while True:
+            with db.engine.begin() as connection:
+                # Walk the primary key so each batch is an index range scan
+                rows = connection.execute(
+                    select(table.c.id, table.c.email, table.c.username, table.c.full_name)
+                    .where(table.c.id > last_id, table.c.search_text.is_(None))
+                    .order_by(table.c.id)
+                    .limit(BACKFILL_BATCH_SIZE)
+                ).all()
+                if not rows:
+                    break
+                connection.execute(update, [{'row_id': row.id, 'text': self.document(row)} for row in rows])
+                last_id = rows[-1].id
+
+    def _ensure_fts(self, engine):
+        name = self.model.__table__.name
+        table = engine.dialect.identifier_preparer.quote(name)
+        fts = self.fts_table
+        with engine.begin() as connection:
+            exists = connection.execute(
+                text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {'name': fts}
+            ).first()
+
+            connection.execute(text(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+                f"search_text, content='{name}', content_rowid='id', "
+                f"tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+            ))
+            connection.execute(text(
+                f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN "
+                f"INSERT INTO {fts}(rowid, search_text) VALUES (new.id, new.search_text); END"
+            ))
+            connection.execute(text(
+                f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN "
+                f"INSERT INTO {fts}({fts}, rowid, search_text) VALUES ('delete', old.id, old.search_text); END"
+            ))
+            connection.execute(text(
+                f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF search_text ON {table} BEGIN "
+                f"INSERT INTO {fts}({fts}, rowid, search_text) VALUES ('delete', old.id, old.search_text); "
+                f"INSERT INTO {fts}(rowid, search_text) VALUES (new.id, new.search_text); END"
+            ))
+
+            if not exists:
+                connection.execute(text(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')"))
+
+    def _ensure_trigram(self, engine):
+        name = self.model.__table__.name
+        # "user" is a reserved word in PostgreSQL
+        table = engine.dialect.identifier_preparer.quote(name)
+        try:
+            with engine.begin() as connection:
+                connection.execute(text('CREATE EXTENSION IF NOT EXISTS pg_trgm'))
+                connection.execute(text(
+                    f'CREATE INDEX IF NOT EXISTS ix_{name}_search_trgm '
+                    f'ON {table} USING gin (search_text gin_trgm_ops)'
+                ))
+            return True
+        except Exception as e:
+            # Usually a role without permission to create extensions
+            logger.warning(f"pg_trgm unavailable, user search falls back to LIKE: {str(e)}")
+            return False
+
+    def filter(self, query, search, db):
+        """Restrict query to users matching search.
+
+        Returns (query, rank) where rank is an ORDER BY expression putting
+        the best matches first, or None when the backend cannot rank.
+        """
+        tokens = tokenize(search)
+        if not tokens:
+            return query, None
+
+        self.ensure_index(db)
+        model = self.model
+        dialect = db.engine.dialect.name
+
+        if dialect == 'sqlite':
+            # Every token must match as a prefix of some indexed word
+            match = ' '.join(f'"{token}"*' for token in tokens)
+            fts = self.fts_table
+            hits = text(
+                f'SELECT rowid AS id, bm25({fts}) AS rank FROM {fts} WHERE {fts} MATCH :match'
+            ).bindparams(match=match).columns(id=Integer, rank=Float).subquery()
+            return query.join(hits, hits.c.id == model.id), hits.c.rank.asc()
+
+        for token in tokens:
+            query = query.filter(model.search_text.contains(token, autoescape=True))
+
+        if dialect == 'postgresql' and self._trigram.get(db.engine.url):
+            return query, db.func.similarity(model.search_text, normalize_text(search)).desc()
+        return query, None
+
+user_search = UserSearch()
@@ -18,6 +18,12 @@ npm run build
 
 # The build will be output to backend/build as configured in vite.config.js
 
+# Write .br/.gz siblings so Flask can serve compressed bundles without compressing per request
+echo "🗜️  Precompressing build output..."
+cd ../backend
+python -m utils.compression build
+cd ../frontend
+
 echo "✅ Build complete! The application is ready for deployment."
 echo "📁 Build output location: backend/build/"
 